@@ -4,10 +4,12 @@ FileFlip API
 FastAPI application for PDF to CSV/XLSX conversion.
 """
 
-import io
+import json
 import tempfile
 import os
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Depends, BackgroundTasks
+import time
+import uuid
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Depends, BackgroundTasks, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
@@ -15,12 +17,25 @@ from typing import List, Dict, Any, Optional
 import logging
 
 # Import the PDF extraction and conversion modules
-from app.services.pdf_extractor import PDFExtractor, DataConverter
+from converter.pdf_converter import PDFExtractor, DataConverter
+from converter.executor import ExecutorBusy, ExtractionTimeout, get_extraction_executor
+from converter.ingest import UploadTooLarge, ingest_upload
+from converter.job_queue import QueueFull, get_conversion_queue
+from converter.models import ExtractedDocument, ExtractedTable
+from converter.page_window import MemoryCeilingExceeded
+from converter.parallel import shutdown_page_pool
+from converter.registry import get_registry
+from converter.store import get_document_store
+from converter.table import ARROW_AVAILABLE
+from converter.tabula_engine import get_tabula_engine
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Most PDFs accepted by one batch upload
+MAX_BATCH_FILES = int(os.environ.get("FILEFLIP_MAX_BATCH_FILES", 50))
+
 # Create the FastAPI app
 app = FastAPI(
     title="FileFlip API",
@@ -44,35 +59,124 @@ data_converter = DataConverter()
 # Models
 class TablePreview(BaseModel):
     table_id: str
+    file_id: Optional[str] = None
     page: int
     rows: int
     columns: int
     preview_data: List[Dict[str, Any]]
     has_multi_header: bool
     column_names: List[str]
+    engine: str
+    bbox: Optional[List[float]] = None
+    column_stats: List[Dict[str, Any]] = []
+    
+class BatchFileResult(BaseModel):
+    filename: str
+    tables: List[TablePreview] = []
+    error: Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    batch_id: Optional[str] = None
+    files: List[BatchFileResult]
     
 class ConversionRequest(BaseModel):
     table_id: str
     format: str
     options: Optional[Dict[str, Any]] = None
 
-# Temporary storage for uploaded files
-# In a production environment, use a proper storage solution
-temp_files = {}
+# Extracted tables by file ID, bounded in memory with cold documents
+# spilled to disk. Only the tables are kept, not the PDF itself.
+document_store = get_document_store()
+
+# Document and table metadata, shared by every API process
+registry = get_registry()
+
+def store_document(doc_id: str, document: ExtractedDocument):
+    """Keep a document's tables for conversion and register its metadata."""
+    document_store.put(doc_id, document)
+    registry.put_document(doc_id, document)
+    registry.prune()
+
+def new_file_id() -> str:
+    """
+    Generate the ID an upload's tables are stored under.
+    
+    Every upload gets its own ID, so two users uploading different files
+    with the same name never replace each other's tables.
+    """
+    return f"file_{uuid.uuid4().hex}"
+
+def table_preview(table: ExtractedTable, file_id: Optional[str] = None) -> TablePreview:
+    """Build the preview of an extracted table."""
+    return TablePreview(preview_data=table.preview(), file_id=file_id, **table.to_dict())
+
+def table_preview_json(table: ExtractedTable, file_id: Optional[str] = None) -> str:
+    """Serialize the preview of an extracted table straight to JSON."""
+    return json.dumps({**table.to_dict(), "file_id": file_id, "preview_data": table.preview()}, default=str)
+
+def sheet_names(tables: List[ExtractedTable]) -> List[str]:
+    """
+    Name the sheets of a workbook of extracted tables.
+    
+    Tables of a single PDF are Table_1, Table_2, ...; tables merged from
+    several PDFs are named after their file, e.g. march_2024_T1.
+    """
+    if len({table.filename for table in tables}) <= 1:
+        return [f"Table_{i+1}" for i in range(len(tables))]
+    
+    names, counts = [], {}
+    for table in tables:
+        stem = os.path.splitext(table.filename or "table")[0]
+        # Excel forbids []:*?/\ in sheet names and caps them at 31 characters
+        stem = "".join("_" if char in "[]:*?/\\" else char for char in stem)[:24]
+        counts[stem] = counts.get(stem, 0) + 1
+        names.append(f"{stem}_T{counts[stem]}")
+    return names
+
+def require_arrow(format: str):
+    """Reject Parquet/Arrow output with a 400 when pyarrow isn't installed."""
+    if format.lower() in ("parquet", "arrow") and not ARROW_AVAILABLE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{format} output is not available: pyarrow is not installed"
+        )
+
+async def ingest_pdf(file: UploadFile):
+    """Read an upload once, answering 413 if it is over the size limit."""
+    try:
+        return await ingest_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+def validate_extraction_method(method: Optional[str]):
+    """Reject unknown extraction method names with a 400."""
+    if method and method not in pdf_extractor.methods_by_name:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown extraction method: {method}. Use one of: {', '.join(pdf_extractor.methods_by_name)}"
+        )
 
 @app.post("/api/upload", response_model=List[TablePreview])
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(response: Response, file: UploadFile = File(...), method: Optional[str] = Form(None)):
     """
     Upload a PDF file for processing.
     
-    Returns table previews extracted from the PDF.
+    Optionally pick the extraction method (pdfplumber, text_layout or
+    tabula); by default each is tried in turn.
+    
+    Returns table previews extracted from the PDF. Each carries the
+    ``file_id`` of the upload, also sent in the X-File-ID header; pass it
+    to /api/batch-convert to convert all the tables at once.
     """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
+    validate_extraction_method(method)
+    upload = await ingest_pdf(file)
         
     try:
         # Extract tables from the PDF
-        tables = await pdf_extractor.extract_tables(file)
+        document = await pdf_extractor.extract_document(upload, method=method)
+        tables = document.tables
         
         if not tables:
             return JSONResponse(
@@ -80,34 +184,147 @@ async def upload_file(file: UploadFile = File(...)):
                 content={"message": "No tables found in the PDF", "tables": []}
             )
         
-        # Store file in memory for later conversion
-        contents = await file.read()
-        temp_file = io.BytesIO(contents)
-        temp_file_id = f"temp_{file.filename}"
-        temp_files[temp_file_id] = {
-            "file_obj": temp_file,
-            "filename": file.filename,
-            "tables": tables
-        }
+        # Store the tables for later conversion
+        file_id = new_file_id()
+        store_document(file_id, document)
+        response.headers["X-File-ID"] = file_id
         
         # Return previews of the tables
-        previews = []
-        for table in tables:
-            previews.append(TablePreview(
-                table_id=table["table_id"],
-                page=table["page"],
-                rows=table["rows"],
-                columns=table["columns"],
-                preview_data=table["preview_data"],
-                has_multi_header=table["has_multi_header"],
-                column_names=table["column_names"]
-            ))
-        
-        return previews
+        return [table_preview(table, file_id) for table in tables]
         
+    except MemoryCeilingExceeded as e:
+        logger.error(f"PDF too large to process: {str(e)}")
+        raise HTTPException(status_code=413, detail=f"PDF too large to process: {str(e)}")
+    except ExecutorBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many PDFs being processed, try again later.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except ExtractionTimeout as e:
+        raise HTTPException(status_code=504, detail=f"Error processing PDF: {str(e)}")
     except Exception as e:
         logger.error(f"Error processing PDF: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    finally:
+        upload.close()
+
+@app.post("/api/upload/batch", response_model=BatchUploadResponse)
+async def upload_batch(files: List[UploadFile] = File(...), method: Optional[str] = Form(None)):
+    """
+    Upload several PDF files at once and extract them in parallel.
+    
+    Each PDF is parsed in its own worker process. Returns the previews of
+    every file's tables, or the error that file hit, and a ``batch_id``:
+    pass it as ``file_id`` to /api/batch-convert to get all the tables in
+    one workbook (a sheet per table, named after its file) or one CSV.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files per batch")
+    for file in files:
+        if not file.filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail=f"File must be a PDF: {file.filename}")
+    validate_extraction_method(method)
+    
+    uploads = []
+    try:
+        for file in files:
+            uploads.append(await ingest_pdf(file))
+        
+        started = time.perf_counter()
+        results = await pdf_extractor.extract_documents(uploads, method=method)
+        
+        if all(isinstance(result, QueueFull) for result in results):
+            raise HTTPException(
+                status_code=503,
+                detail="Too many PDFs being processed, try again later.",
+                headers={"Retry-After": str(results[0].retry_after)}
+            )
+        
+        # Store the tables of all files as one document for merged conversion
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        file_results, tables = [], []
+        for upload, result in zip(uploads, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing {upload.filename} in batch: {str(result)}")
+                file_results.append(BatchFileResult(filename=upload.filename, error=f"Error processing PDF: {str(result)}"))
+            else:
+                tables.extend(result.tables)
+                file_results.append(BatchFileResult(
+                    filename=upload.filename,
+                    tables=[table_preview(table, batch_id) for table in result.tables]
+                ))
+        
+        if tables:
+            store_document(batch_id, ExtractedDocument(batch_id, tables, extract_seconds=time.perf_counter() - started))
+        else:
+            batch_id = None
+        
+        return BatchUploadResponse(batch_id=batch_id, files=file_results)
+    
+    finally:
+        for upload in uploads:
+            upload.close()
+
+@app.post("/api/upload/stream")
+async def upload_file_stream(file: UploadFile = File(...), method: Optional[str] = Form(None)):
+    """
+    Upload a PDF file and stream table previews as they are extracted.
+    
+    Returns newline-delimited JSON, one TablePreview per line, in page
+    order. Each line is sent as soon as its page has been parsed. The
+    ``file_id`` the tables are stored under is on every line and in the
+    X-File-ID header.
+    
+    Extraction runs on the extraction executor like /api/upload, under
+    the same bound and timeout; a stream it turns away or times out ends
+    with an error line.
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    validate_extraction_method(method)
+    
+    upload = await ingest_pdf(file)
+    filename = file.filename
+    file_id = new_file_id()
+    
+    async def stream_previews():
+        tables = []
+        started = time.perf_counter()
+        # Extraction is blocking, so step the iterator on the executor; the
+        # upload stays open until the step in flight is over, even if the
+        # client goes away and the close below runs first
+        previews = get_extraction_executor().iterate(
+            pdf_extractor.iter_tables(upload, method=method),
+            on_done=upload.retain().release
+        )
+        try:
+            async for table in previews:
+                tables.append(table)
+                yield table_preview_json(table, file_id) + "\n"
+        except ExecutorBusy as e:
+            yield json.dumps({"error": "Too many PDFs being processed, try again later.", "retry_after": e.retry_after}) + "\n"
+            return
+        except Exception as e:
+            logger.error(f"Error processing PDF: {str(e)}")
+            yield json.dumps({"error": f"Error processing PDF: {str(e)}"}) + "\n"
+            return
+        finally:
+            await previews.aclose()
+            upload.close()
+        
+        # Store tables for later conversion, as /api/upload does
+        if tables:
+            store_document(
+                file_id,
+                ExtractedDocument(filename, tables, upload.sha256, time.perf_counter() - started)
+            )
+    
+    return StreamingResponse(
+        stream_previews(),
+        media_type="application/x-ndjson",
+        headers={"X-File-ID": file_id}
+    )
 
 @app.post("/api/convert/{table_id}")
 async def convert_table(
@@ -124,7 +341,7 @@ async def convert_table(
     
     Args:
         table_id: ID of the table to convert
-        format: Output format (csv, xlsx, sage)
+        format: Output format (csv, xlsx, sage, parquet, arrow)
         output_filename: Custom filename for the output
         delimiter: Delimiter for CSV files
         sheet_name: Sheet name for Excel files
@@ -134,59 +351,78 @@ async def convert_table(
     Returns:
         The converted file as a download.
     """
-    # Find the table in our temporary storage
-    for temp_id, temp_data in temp_files.items():
-        for table in temp_data["tables"]:
-            if table["table_id"] == table_id:
-                try:
-                    # Get the table data
-                    data = table["data"]
-                    
-                    # Apply options
-                    if skip_rows > 0:
-                        data = data[skip_rows:]
-                    
-                    # Convert to the requested format
-                    if format.lower() == "csv":
-                        result = data_converter.to_csv(data, delimiter=delimiter)
-                        media_type = "text/csv"
-                        if not output_filename:
-                            output_filename = f"{table_id}.csv"
-                    
-                    elif format.lower() == "xlsx":
-                        result = data_converter.to_excel(data, sheet_name=sheet_name)
-                        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        if not output_filename:
-                            output_filename = f"{table_id}.xlsx"
-                    
-                    elif format.lower() == "sage":
-                        result = data_converter.to_sage_format(data)
-                        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        if not output_filename:
-                            output_filename = f"{table_id}_sage.xlsx"
-                    
-                    else:
-                        raise HTTPException(
-                            status_code=400, 
-                            detail=f"Unsupported format: {format}"
-                        )
-                    
-                    # Return the file as a download
-                    return StreamingResponse(
-                        result,
-                        media_type=media_type,
-                        headers={"Content-Disposition": f"attachment; filename={output_filename}"}
-                    )
-                
-                except Exception as e:
-                    logger.error(f"Error converting table: {str(e)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Error converting table: {str(e)}"
-                    )
-    
-    # If we get here, the table was not found
-    raise HTTPException(status_code=404, detail=f"Table not found: {table_id}")
+    require_arrow(format)
+    
+    # Find the table in the document store
+    found = document_store.find_table(table_id)
+    if found is None:
+        if registry.find_table(table_id) is not None:
+            # Extracted by another process, or its cells have since been dropped
+            raise HTTPException(status_code=410, detail=f"Table data no longer held, upload the PDF again: {table_id}")
+        raise HTTPException(status_code=404, detail=f"Table not found: {table_id}")
+    _, table = found
+    # Table IDs are hashes, name the download after the PDF instead
+    default_name = f"{table.filename.replace('.pdf', '')}_p{table.page}_t{table.table_index}"
+    
+    try:
+        # Get the table data
+        data = table.data
+    
+        # Apply options
+        if skip_rows > 0:
+            data = data.slice(skip_rows)
+    
+        # Convert to the requested format
+        if format.lower() == "csv":
+            # Streamed a chunk of rows at a time
+            result = data_converter.iter_csv(data, delimiter=delimiter, include_header=include_headers)
+            media_type = "text/csv"
+            if not output_filename:
+                output_filename = f"{default_name}.csv"
+    
+        elif format.lower() == "xlsx":
+            result = data_converter.to_excel(data, sheet_name=sheet_name)
+            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            if not output_filename:
+                output_filename = f"{default_name}.xlsx"
+    
+        elif format.lower() == "sage":
+            result = data_converter.to_sage_format(data)
+            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            if not output_filename:
+                output_filename = f"{default_name}_sage.xlsx"
+    
+        elif format.lower() == "parquet":
+            result = data_converter.to_parquet(data)
+            media_type = "application/vnd.apache.parquet"
+            if not output_filename:
+                output_filename = f"{default_name}.parquet"
+    
+        elif format.lower() == "arrow":
+            result = data_converter.to_arrow(data)
+            media_type = "application/vnd.apache.arrow.file"
+            if not output_filename:
+                output_filename = f"{default_name}.arrow"
+    
+        else:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Unsupported format: {format}"
+            )
+    
+        # Return the file as a download
+        return StreamingResponse(
+            result,
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename={output_filename}"}
+        )
+    
+    except Exception as e:
+        logger.error(f"Error converting table: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error converting table: {str(e)}"
+        )
 
 @app.post("/api/batch-convert")
 async def batch_convert(
@@ -200,8 +436,9 @@ async def batch_convert(
     Convert all tables in a file to a single output file.
     
     Args:
-        file_id: ID of the uploaded file
-        format: Output format (csv, xlsx, sage)
+        file_id: ID of the uploaded file, or the batch_id of a batch upload
+        format: Output format (csv, xlsx, parquet, arrow). Parquet and
+            Arrow produce a zipped dataset with one partition per table.
         output_filename: Custom filename for the output
         delimiter: Delimiter for CSV files
         sheet_name: Sheet name for Excel files
@@ -209,40 +446,29 @@ async def batch_convert(
     Returns:
         The converted file as a download.
     """
-    if file_id not in temp_files:
+    require_arrow(format)
+    
+    document = document_store.get(file_id)
+    if document is None:
+        if registry.get_document(file_id) is not None:
+            raise HTTPException(status_code=410, detail=f"File data no longer held, upload the PDF again: {file_id}")
         raise HTTPException(status_code=404, detail=f"File not found: {file_id}")
     
     try:
-        temp_data = temp_files[file_id]
-        tables = temp_data["tables"]
+        tables = document.tables
         
         if not tables:
             raise HTTPException(status_code=400, detail="No tables found in the file")
         
         # For Excel, we can combine multiple tables into multiple sheets
         if format.lower() == "xlsx":
-            output = io.BytesIO()
-            
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                for i, table in enumerate(tables):
-                    sheet_name = f"Table_{i+1}"
-                    data_df = pd.DataFrame(table["data"])
-                    data_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                    
-                    # Auto-adjust column widths
-                    worksheet = writer.sheets[sheet_name]
-                    for j, col in enumerate(data_df.columns):
-                        max_len = max(
-                            data_df[col].astype(str).map(len).max(),
-                            len(str(col))
-                        ) + 2
-                        
-                        col_letter = worksheet.cell(1, j + 1).column_letter
-                        worksheet.column_dimensions[col_letter].width = min(max_len, 50)
-            
-            output.seek(0)
+            # Rows are streamed into constant-memory sheets
+            output = data_converter.to_excel_tables(
+                tables,
+                sheet_names(tables)
+            )
             if not output_filename:
-                output_filename = f"{temp_data['filename'].replace('.pdf', '')}_all_tables.xlsx"
+                output_filename = f"{document.filename.replace('.pdf', '')}_all_tables.xlsx"
                 
             return StreamingResponse(
                 output,
@@ -252,15 +478,12 @@ async def batch_convert(
             
         # For CSV, we concatenate all tables
         elif format.lower() == "csv":
-            # Combine all tables (this is a simplistic approach - may not work for all cases)
-            all_data = []
-            for table in tables:
-                all_data.extend(table["data"])
-                
-            result = data_converter.to_csv(all_data, delimiter=delimiter)
+            # Combine all tables (this is a simplistic approach - may not work for all cases),
+            # streamed a chunk of rows at a time
+            result = data_converter.iter_csv_tables(tables, delimiter=delimiter)
             
             if not output_filename:
-                output_filename = f"{temp_data['filename'].replace('.pdf', '')}_all_tables.csv"
+                output_filename = f"{document.filename.replace('.pdf', '')}_all_tables.csv"
                 
             return StreamingResponse(
                 result,
@@ -268,6 +491,19 @@ async def batch_convert(
                 headers={"Content-Disposition": f"attachment; filename={output_filename}"}
             )
             
+        # For Parquet and Arrow, we write a dataset with one partition per table
+        elif format.lower() in ("parquet", "arrow"):
+            result = data_converter.to_dataset(tables, format=format.lower())
+            
+            if not output_filename:
+                output_filename = f"{document.filename.replace('.pdf', '')}_{format.lower()}_dataset.zip"
+                
+            return StreamingResponse(
+                result,
+                media_type="application/zip",
+                headers={"Content-Disposition": f"attachment; filename={output_filename}"}
+            )
+            
         else:
             raise HTTPException(
                 status_code=400,
@@ -281,10 +517,46 @@ async def batch_convert(
             detail=f"Error in batch conversion: {str(e)}"
         )
 
+@app.get("/api/files/{file_id}")
+async def file_metadata(file_id: str):
+    """
+    Return the metadata of an uploaded file and its tables.
+    
+    Served from the registry, so any API process can answer it.
+    """
+    document = registry.get_document(file_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"File not found: {file_id}")
+    return document
+
+@app.get("/api/store/stats")
+async def store_stats():
+    """Return occupancy and eviction stats of the document store."""
+    return document_store.stats()
+
+@app.get("/api/extraction/stats")
+async def extraction_stats():
+    """Return load, queue-wait and run times of the extraction executor."""
+    return get_extraction_executor().stats()
+
+@app.on_event("startup")
+def start_tabula_engine():
+    """Warm up the tabula JVM workers so uploads never pay JVM startup."""
+    get_tabula_engine().start()
+
+@app.on_event("startup")
+def prune_registry():
+    """Remove the jobs and documents left over past their TTL."""
+    registry.prune(force=True)
+
 @app.on_event("shutdown")
 def cleanup():
     """Clean up temporary files on shutdown."""
-    temp_files.clear()
+    document_store.clear()
+    get_tabula_engine().shutdown()
+    get_extraction_executor().shutdown()
+    get_conversion_queue().shutdown()
+    shutdown_page_pool()
 
 # For local development
 if __name__ == "__main__":
@@ -1,15 +1,28 @@
+import asyncio
+import json
 import os
 import shutil
 import tempfile
-from typing import List, Optional
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+import time
+from functools import partial
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import logging
 import uuid
 
 from converter.pdf_converter import PDFConverter
+from converter.cache import ExtractionCache, get_extraction_cache
+from converter.executor import ExecutorBusy, ExtractionTimeout, get_extraction_executor
+from converter.ingest import IngestedFile, UploadTooLarge, ingest_upload
+from converter.job_queue import QueueFull, QueuedJob, get_conversion_queue
+from converter.models import ExtractedTable
+from converter.progress import ProgressReporter
+from converter.registry import get_registry
+from converter.tabula_engine import get_tabula_engine
+from converter.triage import DEFAULT_TRIAGE_THRESHOLD
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +32,16 @@ logger = logging.getLogger(__name__)
 TEMP_DIR = os.path.join(tempfile.gettempdir(), "fileflip")
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Seconds after which a queued or processing job is taken for abandoned
+# (e.g. its process died) and identical submissions no longer attach to it
+DEDUP_INFLIGHT_TTL = float(os.environ.get("FILEFLIP_DEDUP_INFLIGHT_TTL", 3600))
+
+# Seconds between registry polls of a job's event stream
+EVENTS_POLL_INTERVAL = float(os.environ.get("FILEFLIP_EVENTS_POLL_INTERVAL", 0.5))
+
+# Seconds of silence after which an event stream sends a keep-alive comment
+EVENTS_KEEPALIVE = 15
+
 app = FastAPI(
     title="FileFlip API",
     description="API for converting PDF files to CSV/XLSX formats",
@@ -34,6 +57,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_tabula_engine():
+    """Warm up the tabula JVM workers so requests never pay JVM startup."""
+    get_tabula_engine().start()
+
+@app.on_event("startup")
+def start_conversion_queue():
+    """Start the conversion worker processes."""
+    get_conversion_queue().start()
+
+@app.on_event("startup")
+def prune_registry():
+    """Remove the jobs and documents left over past their TTL."""
+    registry.prune(force=True)
+
+@app.on_event("shutdown")
+def stop_tabula_engine():
+    """Stop the tabula JVM workers."""
+    get_tabula_engine().shutdown()
+
+@app.on_event("shutdown")
+def stop_extraction_executor():
+    """Stop the extraction threads."""
+    get_extraction_executor().shutdown()
+
+@app.on_event("shutdown")
+def stop_conversion_queue():
+    """Stop the conversion workers, failing the jobs still waiting."""
+    get_conversion_queue().shutdown()
+
 # Models
 class TableInfo(BaseModel):
     page: int
@@ -41,19 +94,70 @@ class TableInfo(BaseModel):
     columns: int
     extraction_method: str
     preview: dict
+    bbox: Optional[List[float]] = None
+    extract_seconds: float = 0.0
 
 class ConversionResponse(BaseModel):
     job_id: str
     message: str
+    deduplicated: bool = False
     
 class JobStatusResponse(BaseModel):
     job_id: str
     status: str
     output_files: Optional[List[str]] = None
     error_message: Optional[str] = None
+    engine: Optional[str] = None
+    queue_wait_seconds: Optional[float] = None
+    run_seconds: Optional[float] = None
+    progress: Optional[Dict[str, Any]] = None
+
+def table_info(table: ExtractedTable) -> TableInfo:
+    """Build the metadata response of a detected table."""
+    return TableInfo(
+        page=table.page,
+        rows=table.rows,
+        columns=table.columns,
+        extraction_method=table.engine,
+        preview=table.data.head(3).to_dict(),
+        bbox=list(table.bbox) if table.bbox is not None else None,
+        extract_seconds=table.extract_seconds
+    )
+
+# Job statuses and output files, shared by every API process
+registry = get_registry()
 
-# Store job statuses in-memory (would use a database in production)
-jobs = {}
+async def ingest_pdf(file: UploadFile) -> IngestedFile:
+    """
+    Stream an upload to a file in TEMP_DIR once, hashing it on the way.
+    
+    Answers 413 as soon as the upload crosses the size limit.
+    """
+    try:
+        return await ingest_upload(file, spool_bytes=0, directory=TEMP_DIR)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+async def run_extraction(fn, *args, upload: Optional[IngestedFile] = None):
+    """
+    Run blocking PDF work on the extraction executor, off the event loop.
+    
+    Answers 503 with Retry-After when the executor is full and 504 when
+    the work runs past its timeout. ``upload``, the file the work reads,
+    stays open until the work is over, even if the request gave up on it
+    and closed the upload first.
+    """
+    on_done = upload.retain().release if upload is not None else None
+    try:
+        return await get_extraction_executor().run(fn, *args, on_done=on_done)
+    except ExecutorBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many PDFs being processed, try again later.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except ExtractionTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
 
 @app.post("/api/detect-tables", response_model=List[TableInfo])
 async def detect_tables(file: UploadFile = File(...)):
@@ -61,17 +165,17 @@ async def detect_tables(file: UploadFile = File(...)):
     Detect tables in a PDF file and return metadata about them.
     """
     # Save uploaded file temporarily
-    temp_file_path = os.path.join(TEMP_DIR, f"{uuid.uuid4()}_{file.filename}")
+    upload = await ingest_pdf(file)
     
     try:
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
         # Detect tables in the PDF
         converter = PDFConverter()
-        tables_info = converter.detect_tables(temp_file_path)
+        tables = await run_extraction(converter.detect_tables, upload.path(), upload=upload)
         
-        return tables_info
+        return [table_info(table) for table in tables]
+    
+    except HTTPException:
+        raise
     
     except Exception as e:
         logger.error(f"Error detecting tables: {str(e)}")
@@ -79,89 +183,215 @@ async def detect_tables(file: UploadFile = File(...)):
     
     finally:
         # Clean up temporary file
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+        upload.close()
 
-def process_conversion(job_id: str, file_path: str, output_format: str, ocr_enabled: bool):
+@app.post("/api/page-scores")
+async def page_scores(file: UploadFile = File(...), threshold: float = Form(DEFAULT_TRIAGE_THRESHOLD)):
     """
-    Background task to process the conversion.
+    Score each page of a PDF for how likely it is to contain a table.
+    
+    Reports the per-page triage scores and which pages would be handed to
+    the table engines at the given threshold, to help tune it.
     """
+    upload = await ingest_pdf(file)
+    
     try:
-        # Update job status
-        jobs[job_id]["status"] = "processing"
-        
-        # Create output directory
-        output_dir = os.path.join(TEMP_DIR, job_id)
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Initialize converter
-        converter = PDFConverter(ocr_enabled=ocr_enabled)
-        
-        # Convert based on output format
-        if output_format == "csv":
-            output_files = converter.convert_to_csv(file_path, output_dir)
-            jobs[job_id]["output_files"] = output_files
-        elif output_format == "xlsx":
-            output_file = converter.convert_to_xlsx(file_path, output_dir)
-            if output_file:
-                jobs[job_id]["output_files"] = [output_file]
-            else:
-                jobs[job_id]["output_files"] = []
+        converter = PDFConverter(triage_threshold=threshold)
+        scores = await run_extraction(converter.score_pages, upload.path(), upload=upload)
         
-        # Update job status
-        if jobs[job_id].get("output_files"):
-            jobs[job_id]["status"] = "completed"
-        else:
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error_message"] = "No tables could be extracted from the PDF"
+        return {
+            "threshold": threshold,
+            "candidate_pages": [s["page"] for s in scores if s["score"] >= threshold],
+            "pages": scores
+        }
+    
+    except HTTPException:
+        raise
     
     except Exception as e:
-        logger.error(f"Error processing conversion: {str(e)}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error_message"] = str(e)
+        logger.error(f"Error scoring pages: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error scoring pages: {str(e)}")
+    
+    finally:
+        upload.close()
+
+def safe_filename(filename: Optional[str]) -> str:
+    """
+    Make an uploaded file's name safe to name output files after.
+    
+    Drops any directory part and replaces characters other than letters,
+    digits, spaces, dots, dashes and underscores.
+    """
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    name = "".join(char if char.isalnum() or char in " ._-" else "_" for char in name).lstrip(".")
+    return name or "document.pdf"
+
+def run_conversion(
+    job_id: str,
+    pdf_path: str,
+    pdf_hash: str,
+    output_formats: List[str],
+    ocr_enabled: bool,
+    race: bool = False,
+    filename: Optional[str] = None
+) -> dict:
+    """
+    Convert a PDF; runs in a conversion worker process.
+    
+    The PDF is parsed once and every requested output format is written
+    from the same tables. With ``race`` set the table engines run
+    concurrently and the first good result wins. Progress is written to
+    the registry as the conversion goes, for the status and event
+    endpoints to pick up. Output files are named after ``filename``, the
+    uploaded file's name, rather than the temporary file at ``pdf_path``.
+    
+    Returns:
+        Dictionary with the winning engine and the output file paths
+    """
+    # Create output directory
+    output_dir = os.path.join(TEMP_DIR, job_id)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Initialize converter
+    progress = ProgressReporter(partial(registry.set_progress, job_id))
+    converter = PDFConverter(ocr_enabled=ocr_enabled, race=race, progress=progress)
+    
+    # Parse once, then write every requested format
+    session = converter.open_session(pdf_path, pdf_hash=pdf_hash, filename=safe_filename(filename))
+    outputs = session.write(output_formats, output_dir)
+    return {
+        "engine": session.engine,
+        "output_files": [path for output_format in output_formats for path in outputs[output_format]]
+    }
+
+def conversion_started(job: QueuedJob):
+    """Mark a job as processing once a worker picks it up."""
+    registry.update_job(job.job_id, status="processing", queue_wait_seconds=round(job.wait_seconds, 4))
+
+def conversion_finished(job: QueuedJob, upload: IngestedFile):
+    """Record the outcome and timings of a job and clean up its input file."""
+    try:
+        run_seconds = round(job.run_seconds, 4) if job.run_seconds is not None else None
+        
+        if job.error is not None:
+            logger.error(f"Error processing conversion: {str(job.error)}")
+            registry.update_job(job.job_id, status="failed", error_message=str(job.error), run_seconds=run_seconds)
+        elif job.result["output_files"]:
+            registry.update_job(
+                job.job_id,
+                status="completed",
+                engine=job.result["engine"],
+                output_files=job.result["output_files"],
+                run_seconds=run_seconds
+            )
+        else:
+            registry.update_job(
+                job.job_id,
+                status="failed",
+                engine=job.result["engine"],
+                error_message="No tables could be extracted from the PDF",
+                run_seconds=run_seconds
+            )
     
     finally:
         # Clean up input file
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        upload.close()
+
+def parse_output_formats(output_format: List[str]) -> List[str]:
+    """
+    Normalise the requested output formats.
+    
+    Accepts repeated form fields as well as comma-separated values,
+    e.g. ``csv,xlsx``. Duplicates are dropped, order is kept.
+    """
+    output_formats = []
+    for value in output_format:
+        for fmt in value.split(","):
+            fmt = fmt.strip().lower()
+            if fmt and fmt not in output_formats:
+                output_formats.append(fmt)
+    return output_formats
+
+def conversion_key(pdf_hash: str, output_formats: List[str], ocr_enabled: bool, race: bool) -> str:
+    """Key identical conversions share: the PDF's content and the options."""
+    return ExtractionCache.make_key(pdf_hash, {
+        'output_formats': sorted(set(output_formats)),
+        'ocr': ocr_enabled,
+        'race': race
+    })
+
+def reusable_job(job: dict) -> bool:
+    """
+    Tell whether an identical submission may attach to an existing job.
+    
+    Failed jobs are retried, in-flight jobs are joined unless they look
+    abandoned, and completed jobs are reused while their outputs exist.
+    """
+    if job["status"] in ("queued", "processing"):
+        return time.time() - job["created_at"] < DEDUP_INFLIGHT_TTL
+    if job["status"] == "completed":
+        return all(os.path.exists(path) for path in job["output_files"] or [])
+    return False
 
 @app.post("/api/convert", response_model=ConversionResponse)
 async def convert_pdf(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    output_format: str = Form(...),
-    ocr_enabled: bool = Form(False)
+    output_format: List[str] = Form(...),
+    ocr_enabled: bool = Form(False),
+    race: bool = Form(False)
 ):
     """
-    Convert a PDF file to the specified output format (csv or xlsx).
+    Convert a PDF file to one or more output formats (csv and/or xlsx).
+    
+    Set ``race`` to run the table engines concurrently; the job status
+    reports which engine won.
+    
+    Jobs run on the conversion worker pool. When its queue is full the
+    request is turned away with 503 and a Retry-After header.
+    
+    Submissions of the same PDF with the same options share one job: they
+    attach to it while it is in flight, and get it straight back once it
+    has completed.
     """
-    if output_format not in ["csv", "xlsx"]:
+    output_formats = parse_output_formats(output_format)
+    if not output_formats or any(fmt not in ["csv", "xlsx"] for fmt in output_formats):
         raise HTTPException(status_code=400, detail="Invalid output format. Use 'csv' or 'xlsx'.")
     
     # Generate job ID
     job_id = str(uuid.uuid4())
     
     # Save uploaded file temporarily
-    temp_file_path = os.path.join(TEMP_DIR, f"{job_id}_{file.filename}")
+    upload = await ingest_pdf(file)
     
     try:
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Drop expired jobs first, so none of them is reused
+        registry.prune()
         
-        # Initialize job status
-        jobs[job_id] = {
-            "status": "queued",
-            "output_files": None,
-            "error_message": None
-        }
+        # Initialize job status, unless an identical job can be reused
+        key = conversion_key(upload.sha256, output_formats, ocr_enabled, race)
+        job = registry.claim_job(key, job_id, reuse=reusable_job, status="queued")
+        if job["job_id"] != job_id:
+            logger.info(f"Conversion of {upload.sha256[:12]} deduplicated onto job {job['job_id']}")
+            upload.close()
+            if job["status"] == "completed":
+                message = "Identical conversion already completed."
+            else:
+                message = "Attached to an identical conversion in progress. Check job status for results."
+            return {"job_id": job["job_id"], "message": message, "deduplicated": True}
         
-        # Process conversion in background
-        background_tasks.add_task(
-            process_conversion,
+        # Queue the conversion for the worker pool
+        get_conversion_queue().submit(
+            job_id,
+            run_conversion,
             job_id,
-            temp_file_path,
-            output_format,
-            ocr_enabled
+            upload.path(),
+            upload.sha256,
+            output_formats,
+            ocr_enabled,
+            race,
+            upload.filename,
+            on_start=conversion_started,
+            on_done=lambda job: conversion_finished(job, upload)
         )
         
         return {
@@ -169,11 +399,25 @@ async def convert_pdf(
             "message": "Conversion started. Check job status for results."
         }
     
+    except QueueFull as e:
+        logger.warning(f"Turning conversion away: {str(e)}")
+        # Identical submissions may have attached meanwhile; they keep the
+        # job, failed, so they don't wait on a conversion that never runs
+        if registry.release_job(job_id):
+            registry.update_job(job_id, status="failed", error_message="Conversion queue was full, submit the PDF again")
+        upload.close()
+        raise HTTPException(
+            status_code=503,
+            detail="Too many conversions in progress, try again later.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
     except Exception as e:
         logger.error(f"Error starting conversion: {str(e)}")
+        # Fail the job so identical submissions do not attach to it
+        registry.update_job(job_id, status="failed", error_message=str(e))
         # Clean up temporary file
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+        upload.close()
         raise HTTPException(status_code=500, detail=f"Error starting conversion: {str(e)}")
 
 @app.get("/api/job/{job_id}", response_model=JobStatusResponse)
@@ -181,28 +425,90 @@ async def get_job_status(job_id: str):
     """
     Get the status of a conversion job.
     """
-    if job_id not in jobs:
+    job = registry.get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
     return {
         "job_id": job_id,
-        "status": jobs[job_id]["status"],
-        "output_files": jobs[job_id].get("output_files"),
-        "error_message": jobs[job_id].get("error_message")
+        "status": job["status"],
+        "output_files": job["output_files"],
+        "error_message": job["error_message"],
+        "engine": job["engine"],
+        "queue_wait_seconds": job["queue_wait_seconds"],
+        "run_seconds": job["run_seconds"],
+        "progress": registry.get_progress(job_id)
     }
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def job_events(job_id: str):
+    """
+    Yield a job's progress as server-sent events until it finishes.
+    
+    The registry is polled, so progress written by any worker process
+    reaches any API process. A ``progress`` event is sent whenever the
+    progress changes, and a final ``status`` event once the job has
+    completed or failed. The stream ends early if the job is deleted.
+    """
+    last_progress = None
+    last_sent = time.monotonic()
+    while True:
+        job = registry.get_job(job_id)
+        if job is None:
+            return
+        
+        progress = registry.get_progress(job_id)
+        if progress is not None and progress != last_progress:
+            last_progress = progress
+            last_sent = time.monotonic()
+            yield sse_event("progress", {"job_id": job_id, **progress})
+        
+        if job["status"] in ("completed", "failed"):
+            yield sse_event("status", {
+                "job_id": job_id,
+                "status": job["status"],
+                "engine": job["engine"],
+                "output_files": job["output_files"],
+                "error_message": job["error_message"]
+            })
+            return
+        
+        if time.monotonic() - last_sent >= EVENTS_KEEPALIVE:
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
+        
+        await asyncio.sleep(EVENTS_POLL_INTERVAL)
+
+@app.get("/api/job/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Stream the progress of a conversion job as server-sent events.
+    """
+    if registry.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return StreamingResponse(
+        job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/download/{job_id}/{file_index}")
 async def download_file(job_id: str, file_index: int):
     """
     Download a converted file.
     """
-    if job_id not in jobs:
+    job = registry.get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    if jobs[job_id]["status"] != "completed":
+    if job["status"] != "completed":
         raise HTTPException(status_code=400, detail="Job not completed")
     
-    output_files = jobs[job_id].get("output_files", [])
+    output_files = job["output_files"] or []
     
     if not output_files or file_index >= len(output_files):
         raise HTTPException(status_code=404, detail="File not found")
@@ -222,12 +528,23 @@ async def download_file(job_id: str, file_index: int):
 async def delete_job(job_id: str):
     """
     Delete a job and its files.
+    
+    A job shared by identical submissions is only detached from the
+    caller; its files are deleted along with the last submission holding it.
     """
-    if job_id not in jobs:
+    job = registry.get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    # Drop the caller's reference, other submissions may still hold the job
+    remaining = registry.release_job(job_id)
+    if remaining is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if remaining > 0:
+        return {"message": "Job detached; its files are kept for identical submissions sharing it"}
+    
     # Delete output files
-    output_files = jobs[job_id].get("output_files", [])
+    output_files = job["output_files"] or []
     for file_path in output_files:
         if os.path.exists(file_path):
             os.remove(file_path)
@@ -237,9 +554,6 @@ async def delete_job(job_id: str):
     if os.path.exists(job_dir):
         shutil.rmtree(job_dir)
     
-    # Remove job from memory
-    del jobs[job_id]
-    
     return {"message": "Job deleted successfully"}
 
 @app.get("/api/health")
@@ -247,7 +561,14 @@ async def health_check():
     """
     Health check endpoint.
     """
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "tabula": get_tabula_engine().stats(),
+        "cache": get_extraction_cache().stats(),
+        "extraction": get_extraction_executor().stats(),
+        "conversion_queue": get_conversion_queue().stats(),
+        "registry": registry.stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,205 @@
+"""
+FileFlip Extraction Cache
+-------------------------
+Disk-backed cache of extraction results, keyed by the SHA-256 of the PDF
+bytes plus the extractor configuration. Several worker processes can
+share one cache directory.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "FILEFLIP_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "fileflip", "cache")
+)
+DEFAULT_CACHE_MAX_BYTES = int(os.environ.get("FILEFLIP_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+_ENTRY_SUFFIX = ".pkl"
+
+# Bumped whenever the shape of the cached results changes, so entries
+# written by older code are never read back
+CACHE_VERSION = 2
+
+
+def content_hash(data: bytes) -> str:
+    """Return the SHA-256 hex digest of the PDF bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of extraction results with LRU eviction.
+
+    Entries are pickled to one file each. Writes go to a temporary file
+    that is atomically renamed into place, so readers never see a partial
+    entry. Recency is tracked through file modification times, which every
+    process sharing the directory updates on a hit.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Directory holding the cache entries
+            max_bytes: Byte budget for all entries together (0 disables the cache)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(pdf_hash: str, config: Dict[str, Any]) -> str:
+        """
+        Build a cache key from the PDF hash and the extractor configuration.
+
+        Args:
+            pdf_hash: SHA-256 hex digest of the PDF bytes
+            config: Extractor settings that affect the result (engine,
+                OCR flag, language, page range, ...)
+
+        Returns:
+            Hex digest identifying the cache entry
+        """
+        payload = json.dumps({'version': CACHE_VERSION, 'pdf': pdf_hash, 'config': config}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _ENTRY_SUFFIX)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for ``key``, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            # Mark as recently used for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {str(e)}")
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store ``value`` under ``key`` and evict old entries over budget."""
+        if not self.enabled:
+            return
+
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path(key))
+        except Exception as e:
+            logger.warning(f"Could not write cache entry {key}: {str(e)}")
+            self._remove(temp_path)
+            return
+
+        self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits its budget."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(_ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Evicted by another worker in the meantime
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                with self._lock:
+                    self.evictions += 1
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except (FileNotFoundError, TypeError):
+            return False
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        for name in os.listdir(self.directory):
+            if name.endswith(_ENTRY_SUFFIX):
+                self._remove(os.path.join(self.directory, name))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this process and the current cache size."""
+        entries = 0
+        size = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(_ENTRY_SUFFIX):
+                try:
+                    size += os.path.getsize(os.path.join(self.directory, name))
+                    entries += 1
+                except FileNotFoundError:
+                    continue
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes
+        }
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Return the process-wide extraction cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache()
+        return _cache
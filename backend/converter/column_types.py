@@ -0,0 +1,271 @@
+"""
+FileFlip Column Type Inference
+------------------------------
+Classifies the columns of an extracted table as dates (with the detected
+format), amounts, integers or text, and parses them into typed arrays.
+Inference runs once, when a table is prepared; the exporters reuse the
+typed values instead of converting the cells again.
+
+Amounts follow South African statement conventions: an optional "R" or
+"ZAR" prefix, space, comma, dot or apostrophe thousand separators, a
+comma or dot decimal, and negatives written with a minus sign,
+parentheses or a DR suffix (CR marks a credit, which stays positive).
+All checks use vectorized pandas string operations over the column.
+Numbers with leading zeros or more than 15 digits (account, card and
+reference numbers) stay text: neither a float nor an Excel cell holds
+them exactly.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+DATE = 'date'
+AMOUNT = 'amount'
+INTEGER = 'integer'
+TEXT = 'text'
+
+# Tried in order; day-first formats come before the US month-first one
+DATE_FORMATS = [
+    '%Y/%m/%d',
+    '%Y-%m-%d',
+    '%d/%m/%Y',
+    '%d-%m-%Y',
+    '%d.%m.%Y',
+    '%d %b %Y',
+    '%d %B %Y',
+    '%d-%b-%Y',
+    '%d %b %y',
+    '%d/%m/%y',
+    '%m/%d/%Y',
+]
+
+# Most digits a number may have and still be written as one; Excel keeps
+# 15 significant digits, and float64 is exact up to there
+MAX_NUMBER_DIGITS = 15
+
+# Cells checked before a whole column is parsed, so text columns are
+# rejected cheaply
+SAMPLE_SIZE = 20
+
+# Rough shape of a date, and of an amount, checked on the sample with one
+# regex before trying the formats
+_DATE_SHAPE = r"\d{1,4}([-/. ])[0-9A-Za-z]{1,9}\1\d{2,4}"
+_AMOUNT_SHAPE = r"(?i)\(?[-+]?\s*(?:ZAR|R)?\s*[-+]?\s*\d[\d ,.'\u00a0]*\)?\s*(?:CR|DR|-)?"
+
+_AMOUNT_PATTERN = (
+    r"^(?P<open>\()?\s*(?P<lead>[-+])?\s*(?:ZAR|R)?\s*(?P<sign>[-+])?\s*"
+    r"(?P<number>\d[\d ,.'\u00a0]*\d|\d)"
+    r"\s*(?P<close>\))?\s*(?P<suffix>CR|DR|-)?$"
+)
+
+# Digits with thousand separators and an optional 1-2 digit decimal, or
+# plain digits with an optional decimal
+_NUMBER_PATTERN = r"\d{1,3}(?:[ ,.'\u00a0]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d+)?"
+
+
+class TypedColumn:
+    """The inferred type of a column and its parsed values."""
+
+    __slots__ = ('kind', 'format', 'values')
+
+    def __init__(self, kind: str, format: Optional[str] = None, values: Optional[np.ndarray] = None):
+        """
+        Initialize the column.
+
+        Args:
+            kind: DATE, AMOUNT, INTEGER or TEXT
+            format: strptime format of a date column
+            values: Parsed values: datetime64 for dates (NaT for blanks),
+                numbers for amounts and integers (NaN for blanks), None for text
+        """
+        self.kind = kind
+        self.format = format
+        self.values = values
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes if self.values is not None else 0
+
+    def slice(self, start: int = 0, stop: Optional[int] = None) -> 'TypedColumn':
+        """Return the values from ``start`` to ``stop`` as a view."""
+        values = self.values[start:stop] if self.values is not None else None
+        return TypedColumn(self.kind, self.format, values)
+
+    def cells(self, start: int, stop: int) -> List[Any]:
+        """
+        Return a slice of the values as plain Python values for writing out.
+
+        Dates become datetimes, integers ints and amounts floats; blanks
+        become None.
+        """
+        values = self.values[start:stop]
+        if self.kind == DATE:
+            missing = np.isnat(values)
+            cells = pd.DatetimeIndex(values).to_pydatetime().astype(object)
+        elif values.dtype.kind == 'f':
+            missing = np.isnan(values)
+            cells = (np.nan_to_num(values).astype(np.int64) if self.kind == INTEGER else values).astype(object)
+        else:
+            return values.tolist()
+        cells[missing] = None
+        return cells.tolist()
+
+    def __repr__(self) -> str:
+        return f"TypedColumn(kind={self.kind!r}, format={self.format!r})"
+
+
+def _parse_dates(text: pd.Series) -> Optional[TypedColumn]:
+    """Parse non-blank text as dates in the first format that fits every cell."""
+    sample = text.iloc[:SAMPLE_SIZE]
+    shape = sample.str.extract(f"^{_DATE_SHAPE}$")[0]
+    if shape.isna().any():
+        return None
+    # Only formats using the separator the cells use
+    separators = set(shape)
+    for date_format in DATE_FORMATS:
+        if not any(separator in date_format for separator in separators):
+            continue
+        if pd.to_datetime(sample, format=date_format, errors='coerce').isna().any():
+            continue
+        parsed = pd.to_datetime(text, format=date_format, errors='coerce')
+        if not parsed.isna().any():
+            return TypedColumn(DATE, date_format, parsed)
+    return None
+
+
+def parse_amounts(text: pd.Series) -> pd.Series:
+    """
+    Parse amounts written in ZA statement conventions.
+
+    Args:
+        text: Cell text
+
+    Returns:
+        The amounts as floats, NaN where a cell is not an amount
+    """
+    text = text.astype(str).str.strip().str.upper()
+    parts = text.str.extract(_AMOUNT_PATTERN)
+    number = parts['number']
+    valid = (
+        number.str.fullmatch(_NUMBER_PATTERN, na=False)
+        & (parts['open'].isna() == parts['close'].isna())
+    )
+
+    # The decimal separator is the last comma or dot followed by 1-2
+    # digits; a lone dot is a decimal point whatever follows it, and all
+    # other separators are thousand separators
+    marked = number.str.replace(r"[.,](?=\d{1,2}$)", "D", regex=True)
+    digits = marked.str.replace(r"[^\dD]", "", regex=True).str.replace("D", ".", regex=False)
+    normalized = number.where(number.str.fullmatch(r"\d+\.\d+", na=False), digits)
+    values = pd.to_numeric(normalized.where(valid), errors='coerce')
+
+    negative = (
+        parts['open'].notna()
+        | (parts['lead'] == '-')
+        | (parts['sign'] == '-')
+        | parts['suffix'].isin(['DR', '-'])
+    )
+    return values.where(~negative, -values)
+
+
+def _parse_numbers(text: pd.Series) -> Optional[TypedColumn]:
+    """Parse non-blank text as integers or amounts, if every cell is one."""
+    if not text.iloc[:SAMPLE_SIZE].str.fullmatch(_AMOUNT_SHAPE).all():
+        return None
+
+    stripped = text.str.strip()
+    # Leading zeros mark codes (accounts, branches) that must stay text,
+    # and longer numbers are references that would lose digits
+    if stripped.str.match(r"[-+]?0\d").any():
+        return None
+    if (stripped.str.count(r"\d") > MAX_NUMBER_DIGITS).any():
+        return None
+    if stripped.str.fullmatch(r"[-+]?\d+").all():
+        # Integers don't go through the amount parser's floats
+        return TypedColumn(INTEGER, values=stripped.map(int))
+
+    values = parse_amounts(text)
+    if values.isna().any():
+        return None
+    return TypedColumn(AMOUNT, values=values)
+
+
+def infer_column(array: np.ndarray) -> TypedColumn:
+    """
+    Infer the type of a column and parse its values.
+
+    Columns that already have a numeric or datetime dtype keep their
+    values. Text columns are a date, integer or amount column only if
+    every non-blank cell parses as one; a column with any other text, or
+    with a number that has leading zeros or more than MAX_NUMBER_DIGITS
+    digits, stays text, so no cell is lost.
+
+    Args:
+        array: The column's cells
+
+    Returns:
+        The inferred column
+    """
+    if array.dtype.kind in 'iu':
+        return TypedColumn(INTEGER, values=array)
+    if array.dtype.kind == 'f':
+        return TypedColumn(AMOUNT, values=array)
+    if array.dtype.kind == 'M':
+        return TypedColumn(DATE, values=array)
+    if array.dtype != object:
+        return TypedColumn(TEXT)
+
+    text = pd.Series(array, dtype=object).fillna('').astype(str).str.strip()
+    blank = (text == '').to_numpy()
+    if blank.all():
+        return TypedColumn(TEXT)
+    filled = text[~blank]
+
+    for parse in (_parse_dates, _parse_numbers):
+        typed = parse(filled)
+        if typed is not None:
+            # Spread the parsed cells back over the blanks
+            if typed.kind == DATE:
+                values = np.full(len(array), np.datetime64('NaT'), dtype='datetime64[ns]')
+            else:
+                values = np.full(len(array), np.nan)
+            values[~blank] = typed.values.to_numpy()
+            typed.values = values
+            return typed
+    return TypedColumn(TEXT)
+
+
+def infer_types(df: pd.DataFrame) -> Dict[str, TypedColumn]:
+    """
+    Infer the type of every column of a DataFrame.
+
+    Returns:
+        The inferred columns by column name
+    """
+    return {str(col): infer_column(df.iloc[:, i].to_numpy()) for i, col in enumerate(df.columns)}
+
+
+def fill_missing(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fill missing cells: 0 in numeric columns, '' elsewhere.
+
+    One fill per group of columns rather than one per column.
+
+    Args:
+        df: Table as read by an engine
+
+    Returns:
+        The filled DataFrame
+    """
+    numeric = np.array([dtype.kind in 'iuf' for dtype in df.dtypes], dtype=bool)
+    df = df.copy()
+    if numeric.any():
+        df.iloc[:, numeric] = df.iloc[:, numeric].fillna(0)
+    if not numeric.all():
+        df.iloc[:, ~numeric] = df.iloc[:, ~numeric].fillna('')
+    return df
@@ -0,0 +1,332 @@
+"""
+FileFlip Extraction Executor
+----------------------------
+Runs blocking extraction work for the async endpoints on a bounded pool
+of threads, so the event loop only does I/O and cheap requests stay fast
+while heavy uploads are parsed. The heavy lifting inside a call already
+leaves the interpreter (page sharding across processes, the tabula JVM
+workers), so threads are enough here.
+
+At most ``workers`` calls run at once and ``max_pending`` more may wait;
+beyond that callers get ExecutorBusy with a Retry-After estimate. Each
+call has a timeout, and the time calls spend waiting for a thread is
+recorded.
+"""
+
+import asyncio
+import collections
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Extractions run at once
+DEFAULT_EXTRACT_WORKERS = int(os.environ.get("FILEFLIP_EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Extractions allowed to wait for a thread before new ones are turned away
+DEFAULT_EXTRACT_QUEUE = int(os.environ.get("FILEFLIP_EXTRACT_QUEUE", 16))
+
+# Seconds a caller waits for its extraction, queueing included
+DEFAULT_EXTRACT_TIMEOUT = float(os.environ.get("FILEFLIP_EXTRACT_TIMEOUT", 300))
+
+# Retry-After, in seconds, before any call has finished
+DEFAULT_RETRY_AFTER = 5
+
+# Upper bound on the Retry-After estimate, in seconds
+MAX_RETRY_AFTER = 300
+
+# Finished calls the Retry-After estimate and the timing stats are based on
+_RECENT_CALLS = 100
+
+# Marks the end of an iterator stepped on the pool
+_DONE = object()
+
+
+class ExecutorBusy(RuntimeError):
+    """Raised when every thread is busy and the wait queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Extraction executor is busy, retry in {retry_after} s")
+        self.retry_after = retry_after
+
+
+class ExtractionTimeout(TimeoutError):
+    """Raised when an extraction does not finish within its timeout."""
+
+
+class ExtractionExecutor:
+    """
+    Bounded thread pool for blocking extraction calls from async code.
+
+    A call that times out is abandoned by its caller but keeps its thread
+    until it returns (threads cannot be killed); it goes on counting
+    against the bound, so a burst of slow documents cannot pile up
+    unbounded work. A call that times out while still waiting never runs.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_EXTRACT_WORKERS,
+        max_pending: int = DEFAULT_EXTRACT_QUEUE,
+        timeout: float = DEFAULT_EXTRACT_TIMEOUT
+    ):
+        """
+        Initialize the executor.
+
+        Args:
+            workers: Number of threads (and calls run at once)
+            max_pending: Calls allowed to wait for a thread
+            timeout: Default seconds a caller waits, queueing included
+        """
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract")
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._recent = collections.deque(maxlen=_RECENT_CALLS)
+
+    async def run(
+        self,
+        fn: Callable,
+        *args,
+        timeout: Optional[float] = None,
+        on_done: Optional[Callable[[], None]] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Run a blocking function on the pool and wait for its result.
+
+        Args:
+            fn: The function
+            *args: Positional arguments to ``fn``
+            timeout: Seconds to wait, queueing included (default: the
+                executor's timeout; None in both disables it)
+            on_done: Called once the call is over: when ``fn`` returns or
+                raises, also after the caller timed out, or when it will
+                never run. Release what ``fn`` reads here rather than after
+                awaiting, which may be while ``fn`` still runs.
+            **kwargs: Keyword arguments to ``fn``
+
+        Returns:
+            What ``fn`` returned
+
+        Raises:
+            ExecutorBusy: If every thread is busy and the wait queue is full
+            ExtractionTimeout: If the call did not finish in time
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            if on_done is not None:
+                on_done()
+            raise ExecutorBusy(self.retry_after())
+
+        submitted = time.monotonic()
+        with self._lock:
+            self._pending += 1
+
+        def call():
+            started = time.monotonic()
+            with self._lock:
+                self._pending -= 1
+                self._running += 1
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._completed += 1
+                    self._recent.append((started - submitted, time.monotonic() - started))
+
+        future = self._pool.submit(call)
+        future.add_done_callback(self._release)
+        if on_done is not None:
+            future.add_done_callback(lambda _: self._notify(on_done))
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            if future.cancel():
+                # Timed out before a thread picked it up
+                with self._lock:
+                    self._pending -= 1
+            raise ExtractionTimeout(f"Extraction did not finish within {timeout:g} s")
+
+    async def iterate(
+        self,
+        iterator: Iterator[Any],
+        timeout: Optional[float] = None,
+        on_done: Optional[Callable[[], None]] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Step a blocking iterator on the pool, yielding its items to async code.
+
+        The whole iteration counts as one call: it holds one slot from the
+        first item to the last, and ``timeout`` covers all of it. When the
+        consumer stops early (e.g. the client went away), the iterator is
+        closed and ``on_done`` called only once the step in flight has
+        returned, never while a thread is still inside it.
+
+        Args:
+            iterator: The blocking iterator
+            timeout: Seconds for the whole iteration, queueing included
+                (default: the executor's timeout; None in both disables it)
+            on_done: Called once the iteration is over, as in ``run``
+
+        Raises:
+            ExecutorBusy: If every thread is busy and the wait queue is full
+            ExtractionTimeout: If the iteration did not finish in time
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            if on_done is not None:
+                on_done()
+            raise ExecutorBusy(self.retry_after())
+
+        submitted = time.monotonic()
+        with self._lock:
+            self._pending += 1
+        state = {'started': None, 'failed': False}
+
+        def step():
+            if state['started'] is None:
+                state['started'] = time.monotonic()
+                with self._lock:
+                    self._pending -= 1
+                    self._running += 1
+            try:
+                return next(iterator, _DONE)
+            except BaseException:
+                state['failed'] = True
+                raise
+
+        def finish(_=None):
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    logger.error(f"Error closing an iteration: {str(e)}")
+            with self._lock:
+                if state['started'] is None:
+                    self._pending -= 1
+                else:
+                    self._running -= 1
+                    self._recent.append((state['started'] - submitted, time.monotonic() - state['started']))
+                if state['failed']:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+            self._slots.release()
+            if on_done is not None:
+                self._notify(on_done)
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else submitted + timeout
+        future = None
+        try:
+            while True:
+                future = self._pool.submit(step)
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                try:
+                    item = await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise ExtractionTimeout(f"Extraction did not finish within {timeout:g} s")
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            if future is None or future.done():
+                finish()
+            else:
+                # A thread is still inside the iterator, finish after it
+                future.add_done_callback(finish)
+
+    def _release(self, future) -> None:
+        self._slots.release()
+
+    def _notify(self, on_done: Callable[[], None]) -> None:
+        try:
+            on_done()
+        except Exception as e:
+            logger.error(f"Error in on_done of extraction call: {str(e)}")
+
+    def retry_after(self) -> int:
+        """
+        Estimate the seconds until a slot frees up.
+
+        Based on the average run time of recent calls and how many calls
+        are ahead, per thread.
+        """
+        with self._lock:
+            run_times = [run for _, run in self._recent]
+            ahead = self._pending / self.workers
+        if not run_times:
+            return DEFAULT_RETRY_AFTER
+        average = sum(run_times) / len(run_times)
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(average * max(ahead, 1))))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call counts and recent queue-wait and run times."""
+        with self._lock:
+            recent = list(self._recent)
+            stats = {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'timeout': self.timeout,
+                'pending': self._pending,
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'timeouts': self._timeouts,
+                'rejected': self._rejected
+            }
+        waits = sorted(wait for wait, _ in recent)
+        runs = [run for _, run in recent]
+        stats['avg_wait_seconds'] = round(sum(waits) / len(waits), 4) if waits else None
+        stats['p95_wait_seconds'] = round(waits[int(0.95 * (len(waits) - 1))], 4) if waits else None
+        stats['max_wait_seconds'] = round(waits[-1], 4) if waits else None
+        stats['avg_run_seconds'] = round(sum(runs) / len(runs), 4) if runs else None
+        return stats
+
+    def shutdown(self) -> None:
+        """Stop the threads once the calls in flight have finished."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executor: Optional[ExtractionExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_extraction_executor() -> ExtractionExecutor:
+    """Return the process-wide extraction executor, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ExtractionExecutor()
+        return _executor
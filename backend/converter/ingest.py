@@ -0,0 +1,270 @@
+"""
+FileFlip Upload Ingestion
+-------------------------
+Reads an upload exactly once: the body is streamed in chunks into a
+spooled temporary file while its SHA-256 and size are computed, and the
+size limit is enforced as soon as it is crossed. The engines then get
+read-only views of the same bytes (memory-mapped once the upload is on
+disk) instead of fresh copies.
+"""
+
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+import threading
+from typing import BinaryIO, Optional, Union
+
+from fastapi import UploadFile
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_UPLOAD_BYTES = int(os.environ.get("FILEFLIP_MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+
+# Uploads up to this size stay in memory
+DEFAULT_SPOOL_BYTES = int(os.environ.get("FILEFLIP_SPOOL_BYTES", 8 * 1024 * 1024))
+
+DEFAULT_UPLOAD_DIR = os.environ.get(
+    "FILEFLIP_UPLOAD_DIR",
+    os.path.join(tempfile.gettempdir(), "fileflip", "uploads")
+)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """The upload is bigger than the configured limit."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the limit of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class IngestedFile:
+    """
+    An upload read once, with its content hash and size.
+
+    Small uploads are held in memory; larger ones are rolled over to a
+    named file in the upload directory, which path-based engines (tabula,
+    camelot) can read directly. Call ``close()`` when done with it.
+
+    A call that may outlive its caller, such as an extraction the caller
+    stopped waiting for, ``retain()``s the upload; ``close()`` then only
+    takes effect once every such call has ``release()``d it.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = DEFAULT_MAX_UPLOAD_BYTES,
+        spool_bytes: int = DEFAULT_SPOOL_BYTES,
+        directory: str = DEFAULT_UPLOAD_DIR
+    ):
+        """
+        Initialize an empty upload; fill it with ``write``.
+
+        Args:
+            filename: Name of the uploaded file
+            max_bytes: Size limit for the upload
+            spool_bytes: Size up to which the upload stays in memory
+            directory: Directory for uploads rolled over to disk
+        """
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.directory = directory
+        self.size = 0
+        self.sha256: Optional[str] = None
+        self._hasher = hashlib.sha256()
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._file: Optional[BinaryIO] = None
+        self._path: Optional[str] = None
+        self._owns_path = True
+        self._data: Optional[Union[bytes, mmap.mmap]] = None
+        self._lock = threading.Lock()
+        self._users = 0
+        self._close_requested = False
+
+    @classmethod
+    def from_file(cls, path: str, sha256: Optional[str] = None, filename: Optional[str] = None) -> 'IngestedFile':
+        """
+        Wrap a PDF already on disk, without copying it.
+
+        Used by worker processes handed the path of an upload; ``close()``
+        leaves the file in place for its owner.
+
+        Args:
+            path: Path of the PDF
+            sha256: Its SHA-256 hex digest, if known (else it is computed)
+            filename: Name of the upload (default: the file's name)
+        """
+        size = os.path.getsize(path)
+        upload = cls(filename or os.path.basename(path), max_bytes=size)
+        upload._buffer = None
+        upload._file = open(path, 'rb')
+        upload._path = path
+        upload._owns_path = False
+        upload.size = size
+        if sha256 is None:
+            for chunk in iter(lambda: upload._file.read(CHUNK_SIZE), b''):
+                upload._hasher.update(chunk)
+            sha256 = upload._hasher.hexdigest()
+        upload.sha256 = sha256
+        return upload
+
+    @property
+    def on_disk(self) -> bool:
+        return self._buffer is None
+
+    def write(self, chunk: bytes) -> None:
+        """
+        Append a chunk of the upload.
+
+        Raises:
+            UploadTooLarge: As soon as the upload crosses ``max_bytes``
+        """
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        self._hasher.update(chunk)
+        if not self.on_disk and self.size > self.spool_bytes:
+            self._rollover()
+        (self._file if self.on_disk else self._buffer).write(chunk)
+
+    def finish(self) -> 'IngestedFile':
+        """Mark the upload complete and fix its hash."""
+        self.sha256 = self._hasher.hexdigest()
+        if self.on_disk:
+            self._file.flush()
+        return self
+
+    def _rollover(self) -> None:
+        """Move the upload from memory to a named file on disk."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, self._path = tempfile.mkstemp(dir=self.directory, suffix=".pdf")
+        self._file = os.fdopen(fd, 'w+b')
+        self._file.write(self._buffer.getbuffer())
+        self._buffer = None
+
+    def data(self) -> Union[bytes, mmap.mmap]:
+        """
+        Return the upload's bytes without copying them.
+
+        A memory map of the file once the upload is on disk, else the
+        in-memory buffer.
+        """
+        if self._data is None:
+            if self.on_disk:
+                self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+            else:
+                # getvalue() hands over the buffer's bytes without a copy
+                self._data = self._buffer.getvalue()
+        return self._data
+
+    def open(self) -> BinaryIO:
+        """
+        Return a new read-only file object over the upload.
+
+        Each call gets its own position, so engines can read concurrently.
+        Data is shared, not copied: the in-memory bytes are shared
+        copy-on-write, the on-disk file is mapped.
+        """
+        data = self.data()
+        if isinstance(data, mmap.mmap):
+            return mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return io.BytesIO(data)
+
+    def path(self) -> str:
+        """Return a filesystem path to the upload, rolling it over to disk if needed."""
+        if not self.on_disk:
+            self._rollover()
+            self._file.flush()
+        return self._path
+
+    def retain(self) -> 'IngestedFile':
+        """Mark the upload as read by a call that may outlive its caller."""
+        with self._lock:
+            self._users += 1
+        return self
+
+    def release(self) -> None:
+        """End a ``retain()``, closing the upload if that was deferred."""
+        with self._lock:
+            self._users -= 1
+            deferred = self._users == 0 and self._close_requested
+        if deferred:
+            self._close()
+
+    def close(self) -> None:
+        """
+        Release the buffer, memory map and file of the upload.
+
+        Deferred until the last ``release()`` while retained.
+        """
+        with self._lock:
+            if self._users:
+                self._close_requested = True
+                return
+        self._close()
+
+    def _close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+        self._buffer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._path and self._owns_path and os.path.exists(self._path):
+            os.remove(self._path)
+        self._path = None
+
+    def __enter__(self) -> 'IngestedFile':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+async def ingest_upload(
+    file: UploadFile,
+    max_bytes: int = DEFAULT_MAX_UPLOAD_BYTES,
+    spool_bytes: int = DEFAULT_SPOOL_BYTES,
+    directory: str = DEFAULT_UPLOAD_DIR
+) -> IngestedFile:
+    """
+    Stream an upload into an IngestedFile, hashing it on the way.
+
+    Args:
+        file: The uploaded file
+        max_bytes: Size limit for the upload
+        spool_bytes: Size up to which the upload stays in memory (0 writes
+            straight to disk)
+        directory: Directory for uploads rolled over to disk
+
+    Returns:
+        The ingested upload
+
+    Raises:
+        UploadTooLarge: If the upload crosses ``max_bytes``; the rest of
+            the body is not read
+    """
+    # Reject early when the size is already known
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    ingested = IngestedFile(file.filename, max_bytes, spool_bytes, directory)
+    if spool_bytes <= 0:
+        ingested._rollover()
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            ingested.write(chunk)
+    except Exception:
+        ingested.close()
+        raise
+    return ingested.finish()
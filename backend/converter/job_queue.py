@@ -0,0 +1,374 @@
+"""
+FileFlip Conversion Queue
+-------------------------
+Runs conversion jobs on a dedicated pool of worker processes, off the web
+server's threadpool. Jobs wait in a bounded queue; when it is full,
+submitting raises QueueFull with a Retry-After estimate so the API can
+shed load instead of piling up work. Each job records how long it waited
+for a worker and how long it ran.
+
+Each worker process warms one tabula JVM when it starts, so conversions
+never pay JVM startup, and the number of workers is capped so the JVMs
+they hold between them stay within FILEFLIP_MAX_JVMS.
+"""
+
+import asyncio
+import collections
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+import logging
+
+from .tabula_engine import init_worker_engine
+
+logger = logging.getLogger(__name__)
+
+# Worker processes running conversions
+DEFAULT_WORKERS = int(os.environ.get("FILEFLIP_CONVERT_WORKERS", os.cpu_count() or 2))
+
+# JVMs the conversion workers may hold between them, one per worker
+DEFAULT_MAX_JVMS = int(os.environ.get("FILEFLIP_MAX_JVMS", 4))
+
+# Jobs allowed to wait for a worker before new ones are turned away
+DEFAULT_QUEUE_DEPTH = int(os.environ.get("FILEFLIP_QUEUE_DEPTH", 32))
+
+# Retry-After, in seconds, before any job has finished
+DEFAULT_RETRY_AFTER = 5
+
+# Upper bound on the Retry-After estimate, in seconds
+MAX_RETRY_AFTER = 300
+
+# Finished jobs the Retry-After estimate and the timing stats are based on
+_RECENT_JOBS = 50
+
+
+class QueueFull(RuntimeError):
+    """Raised when a job is submitted to a full conversion queue."""
+
+    def __init__(self, max_depth: int, retry_after: int):
+        super().__init__(f"Conversion queue is full ({max_depth} jobs waiting), retry in {retry_after} s")
+        self.max_depth = max_depth
+        self.retry_after = retry_after
+
+
+class QueuedJob:
+    """A job in the conversion queue and its timings."""
+
+    __slots__ = (
+        'job_id', 'fn', 'args', 'on_start', 'on_done',
+        'enqueued_at', 'started_at', 'finished_at', 'result', 'error'
+    )
+
+    def __init__(
+        self,
+        job_id: str,
+        fn: Callable,
+        args: tuple,
+        on_start: Optional[Callable[['QueuedJob'], None]] = None,
+        on_done: Optional[Callable[['QueuedJob'], None]] = None
+    ):
+        """
+        Initialize the job.
+
+        Args:
+            job_id: Job ID
+            fn: Module-level function run in a worker process
+            args: Arguments to ``fn``, which must be picklable
+            on_start: Called when a worker picks the job up
+            on_done: Called when the job has finished, failed or was dropped
+        """
+        self.job_id = job_id
+        self.fn = fn
+        self.args = args
+        self.on_start = on_start
+        self.on_done = on_done
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def wait_seconds(self) -> Optional[float]:
+        """Seconds the job waited for a worker."""
+        if self.started_at is None:
+            return None
+        return self.started_at - self.enqueued_at
+
+    @property
+    def run_seconds(self) -> Optional[float]:
+        """Seconds the job ran on its worker."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def __repr__(self) -> str:
+        return f"QueuedJob(job_id={self.job_id!r}, wait_seconds={self.wait_seconds}, run_seconds={self.run_seconds})"
+
+
+class ConversionQueue:
+    """
+    A bounded job queue served by a pool of worker processes.
+
+    One dispatcher thread per worker process takes the next job off the
+    queue, runs it on the pool and waits for it, so a job starts as soon
+    as it leaves the queue and its wait and run times are measured
+    exactly. A crashed worker pool is replaced; the job that was running
+    fails.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        max_depth: int = DEFAULT_QUEUE_DEPTH,
+        mp_context: str = 'spawn',
+        max_jvms: int = DEFAULT_MAX_JVMS,
+        warm_tabula: bool = True
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            workers: Number of worker processes (and jobs run at once),
+                capped at ``max_jvms``
+            max_depth: Jobs allowed to wait for a worker
+            mp_context: multiprocessing start method of the workers; spawn
+                keeps the server's threads and pipes out of them
+            max_jvms: Tabula JVMs the workers may hold between them; each
+                worker holds at most one
+            warm_tabula: Whether workers start their JVM when they start,
+                rather than on their first tabula call
+        """
+        if workers > max_jvms:
+            logger.warning(f"Capping conversion workers at {max_jvms}, the JVM limit")
+        self.workers = max(1, min(workers, max_jvms))
+        self.warm_tabula = warm_tabula
+        self.max_depth = max(1, max_depth)
+        self._context = multiprocessing.get_context(mp_context)
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_depth)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._dispatchers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._recent = collections.deque(maxlen=_RECENT_JOBS)
+
+    @property
+    def started(self) -> bool:
+        return bool(self._dispatchers)
+
+    def start(self) -> None:
+        """Start the worker pool and the dispatcher threads."""
+        with self._lock:
+            if self._dispatchers:
+                return
+            self._pool = self._new_pool()
+            for i in range(self.workers):
+                dispatcher = threading.Thread(target=self._dispatch_loop, name=f"conversion-{i}", daemon=True)
+                dispatcher.start()
+                self._dispatchers.append(dispatcher)
+        logger.info(f"Started conversion queue with {self.workers} workers, depth {self.max_depth}")
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop taking jobs, let running ones finish and drop the waiting ones.
+
+        Dropped jobs still get their ``on_done`` call, with an error set.
+        """
+        with self._lock:
+            dispatchers, self._dispatchers = self._dispatchers, []
+        if not dispatchers:
+            return
+
+        self._drain(RuntimeError("Conversion queue shut down"))
+        for _ in dispatchers:
+            self._queue.put(None)
+        for dispatcher in dispatchers:
+            dispatcher.join(timeout)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(
+        self,
+        job_id: str,
+        fn: Callable,
+        *args,
+        on_start: Optional[Callable[[QueuedJob], None]] = None,
+        on_done: Optional[Callable[[QueuedJob], None]] = None
+    ) -> QueuedJob:
+        """
+        Queue a job.
+
+        Args:
+            job_id: Job ID
+            fn: Module-level function run in a worker process
+            *args: Arguments to ``fn``, which must be picklable
+            on_start: Called, in a dispatcher thread, when a worker picks
+                the job up
+            on_done: Called, in a dispatcher thread, when the job has
+                finished; ``result`` or ``error`` is set
+
+        Returns:
+            The queued job
+
+        Raises:
+            QueueFull: If ``max_depth`` jobs are already waiting
+        """
+        if not self.started:
+            self.start()
+
+        job = QueuedJob(job_id, fn, args, on_start, on_done)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFull(self.max_depth, self.retry_after())
+        return job
+
+    async def run(self, job_id: str, fn: Callable, *args) -> Any:
+        """
+        Queue a job and wait for its result from async code.
+
+        Returns:
+            What ``fn`` returned
+
+        Raises:
+            QueueFull: If ``max_depth`` jobs are already waiting
+            Exception: Whatever ``fn`` raised
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def settle(job: QueuedJob) -> None:
+            if future.done():
+                return
+            if job.error is not None:
+                future.set_exception(job.error)
+            else:
+                future.set_result(job.result)
+
+        self.submit(job_id, fn, *args, on_done=lambda job: loop.call_soon_threadsafe(settle, job))
+        return await future
+
+    def retry_after(self) -> int:
+        """
+        Estimate the seconds until a queue slot frees up.
+
+        Based on the average run time of recent jobs and how many jobs are
+        ahead, per worker.
+        """
+        with self._lock:
+            run_times = [run for _, run in self._recent]
+        if not run_times:
+            return DEFAULT_RETRY_AFTER
+        average = sum(run_times) / len(run_times)
+        ahead = self._queue.qsize() / self.workers
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(average * max(ahead, 1))))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, job counts and recent wait and run times."""
+        with self._lock:
+            recent = list(self._recent)
+            stats = {
+                'workers': self.workers,
+                'max_depth': self.max_depth,
+                'waiting': self._queue.qsize(),
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected
+            }
+        waits = [wait for wait, _ in recent]
+        runs = [run for _, run in recent]
+        stats['avg_wait_seconds'] = round(sum(waits) / len(waits), 4) if waits else None
+        stats['max_wait_seconds'] = round(max(waits), 4) if waits else None
+        stats['avg_run_seconds'] = round(sum(runs) / len(runs), 4) if runs else None
+        return stats
+
+    def _drain(self, error: BaseException) -> None:
+        """Drop every waiting job."""
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None:
+                job.error = error
+                self._notify(job.on_done, job)
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job: QueuedJob) -> None:
+        job.started_at = time.monotonic()
+        with self._lock:
+            self._running += 1
+        self._notify(job.on_start, job)
+
+        pool = self._pool
+        try:
+            job.result = pool.submit(job.fn, *job.args).result()
+        except BrokenProcessPool as e:
+            logger.error(f"Conversion worker crashed running job {job.job_id}, restarting the pool")
+            job.error = e
+            self._restart_pool(pool)
+        except Exception as e:
+            job.error = e
+        finally:
+            job.finished_at = time.monotonic()
+            with self._lock:
+                self._running -= 1
+                if job.error is None:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                self._recent.append((job.wait_seconds, job.run_seconds))
+            self._notify(job.on_done, job)
+
+    def _restart_pool(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            # Other dispatchers may have seen the same crash
+            if self._pool is broken:
+                self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._context,
+            initializer=init_worker_engine,
+            initargs=(self.warm_tabula,)
+        )
+
+    def _notify(self, callback: Optional[Callable[[QueuedJob], None]], job: QueuedJob) -> None:
+        if callback is None:
+            return
+        try:
+            callback(job)
+        except Exception as e:
+            logger.error(f"Error in callback of conversion job {job.job_id}: {str(e)}")
+
+
+_queue: Optional[ConversionQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_conversion_queue() -> ConversionQueue:
+    """Return the process-wide conversion queue, creating it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ConversionQueue()
+        return _queue
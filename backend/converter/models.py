@@ -0,0 +1,274 @@
+"""
+FileFlip Extraction Models
+--------------------------
+Typed records for extracted tables and documents. They use ``__slots__``
+instead of per-instance dictionaries, so the metadata of thousands of
+tables costs little memory, and ``to_dict`` builds plain JSON-ready
+dictionaries without going through a validation layer.
+"""
+
+import sys
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+import logging
+
+from .column_types import TEXT, TypedColumn
+from .table import ColumnarTable
+
+logger = logging.getLogger(__name__)
+
+# Table bounding box on its page: (x0, top, x1, bottom) in PDF points
+BBox = Tuple[float, float, float, float]
+
+# Hex digits of the PDF's hash kept in table IDs (96 bits)
+TABLE_ID_HASH_CHARS = 24
+
+
+def make_table_id(sha256: str, engine: str, page: int, table_index: int) -> str:
+    """
+    Build the ID of a table from the content hash of its PDF.
+
+    The same table of the same PDF always gets the same ID, whoever
+    uploads it and under whatever file name, and tables of different PDFs
+    never share one.
+
+    Args:
+        sha256: SHA-256 hex digest of the PDF bytes
+        engine: Name of the engine that extracted the table
+        page: 1-based page number
+        table_index: Index of the table on its page
+    """
+    return f"{sha256[:TABLE_ID_HASH_CHARS]}_{engine}_p{page}_t{table_index}"
+
+
+class ColumnStats:
+    """Summary statistics of one column of an extracted table."""
+
+    __slots__ = ('name', 'non_empty', 'max_width', 'kind', 'format')
+
+    def __init__(self, name: str, non_empty: int, max_width: int, kind: str = TEXT, format: Optional[str] = None):
+        """
+        Initialize the statistics.
+
+        Args:
+            name: Column name
+            non_empty: Number of cells with content
+            max_width: Widest rendered cell, in characters
+            kind: Inferred column type (date, amount, integer or text)
+            format: Detected format of a date column
+        """
+        self.name = name
+        self.non_empty = non_empty
+        self.max_width = max_width
+        self.kind = kind
+        self.format = format
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'non_empty': self.non_empty,
+            'max_width': self.max_width,
+            'kind': self.kind,
+            'format': self.format
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"ColumnStats(name={self.name!r}, non_empty={self.non_empty}, "
+            f"max_width={self.max_width}, kind={self.kind!r})"
+        )
+
+
+def column_stats(df: pd.DataFrame, types: Optional[Dict[str, TypedColumn]] = None) -> List[ColumnStats]:
+    """
+    Compute the statistics of every column of a DataFrame.
+
+    Each column is rendered to text once; counts and widths come from the
+    vectorized string methods.
+
+    Args:
+        df: The table
+        types: Inferred column types by column name, if known
+    """
+    types = types or {}
+    stats = []
+    for i, name in enumerate(df.columns):
+        text = df.iloc[:, i].fillna('').astype(str)
+        widths = text.str.len()
+        typed = types.get(str(name))
+        stats.append(ColumnStats(
+            str(name),
+            int((text.str.strip() != '').sum()),
+            int(widths.max()) if len(widths) else 0,
+            typed.kind if typed is not None else TEXT,
+            typed.format if typed is not None else None
+        ))
+    return stats
+
+
+class ExtractedTable:
+    """
+    A table found by an extraction engine, with its metadata.
+
+    Engines create it with the raw DataFrame as ``data``; preparing the
+    table for output cleans the cells into a ColumnarTable and fills in
+    the ID, the file name and the column statistics.
+    """
+
+    __slots__ = (
+        'data', 'page', 'table_index', 'engine', 'bbox', 'extract_seconds', 'prepare_seconds',
+        'table_id', 'filename', 'has_multi_header', 'column_stats'
+    )
+
+    def __init__(
+        self,
+        data: Union[pd.DataFrame, ColumnarTable],
+        page: int,
+        table_index: int,
+        engine: str,
+        bbox: Optional[BBox] = None,
+        extract_seconds: float = 0.0,
+        prepare_seconds: float = 0.0,
+        table_id: Optional[str] = None,
+        filename: Optional[str] = None,
+        has_multi_header: bool = False,
+        column_stats: Optional[List[ColumnStats]] = None
+    ):
+        """
+        Initialize the table.
+
+        Args:
+            data: The cells, a DataFrame as extracted or a ColumnarTable once prepared
+            page: 1-based page number the table was found on
+            table_index: Index of the table on its page (or in the engine's output)
+            engine: Name of the engine that extracted it
+            bbox: Bounding box on the page, if the engine reports one
+            extract_seconds: Seconds the engine spent on the page (or the
+                whole call, for document engines) that produced the table
+            prepare_seconds: Seconds spent cleaning the table for output
+            table_id: Table ID, set once prepared
+            filename: Name of the source PDF, set once prepared
+            has_multi_header: Whether the first rows look like extra header rows
+            column_stats: Per-column statistics, set once prepared
+        """
+        self.data = data
+        self.page = page
+        self.table_index = table_index
+        self.engine = engine
+        self.bbox = bbox
+        self.extract_seconds = extract_seconds
+        self.prepare_seconds = prepare_seconds
+        self.table_id = table_id
+        self.filename = filename
+        self.has_multi_header = has_multi_header
+        self.column_stats = column_stats or []
+
+    @property
+    def rows(self) -> int:
+        return len(self.data)
+
+    @property
+    def columns(self) -> int:
+        return len(self.data.columns)
+
+    @property
+    def column_names(self) -> List[str]:
+        return [str(col) for col in self.data.columns]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the table, in bytes."""
+        if isinstance(self.data, ColumnarTable):
+            data_bytes = self.data.nbytes
+        else:
+            data_bytes = int(self.data.memory_usage(deep=True).sum())
+        return sys.getsizeof(self) + data_bytes
+
+    def preview(self, rows: int = 5) -> List[Dict[str, Any]]:
+        """Return the first rows as a list of dictionaries."""
+        if isinstance(self.data, ColumnarTable):
+            return self.data.preview(rows)
+        return self.data.head(rows).to_dict('records')
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the table's metadata (not its cells) as a plain dictionary."""
+        return {
+            'table_id': self.table_id,
+            'page': self.page,
+            'table_index': self.table_index,
+            'rows': self.rows,
+            'columns': self.columns,
+            'engine': self.engine,
+            'bbox': list(self.bbox) if self.bbox is not None else None,
+            'extract_seconds': round(self.extract_seconds, 4),
+            'prepare_seconds': round(self.prepare_seconds, 4),
+            'has_multi_header': self.has_multi_header,
+            'column_names': self.column_names,
+            'column_stats': [stats.to_dict() for stats in self.column_stats],
+            'filename': self.filename
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"ExtractedTable(table_id={self.table_id!r}, page={self.page}, engine={self.engine!r}, "
+            f"rows={self.rows}, columns={self.columns})"
+        )
+
+
+class ExtractedDocument:
+    """The tables extracted from one PDF."""
+
+    __slots__ = ('filename', 'tables', 'sha256', 'extract_seconds')
+
+    def __init__(
+        self,
+        filename: str,
+        tables: List[ExtractedTable],
+        sha256: Optional[str] = None,
+        extract_seconds: float = 0.0
+    ):
+        """
+        Initialize the document.
+
+        Args:
+            filename: Name of the PDF
+            tables: The prepared tables, in page order
+            sha256: SHA-256 hex digest of the PDF bytes
+            extract_seconds: Wall-clock seconds the extraction took
+        """
+        self.filename = filename
+        self.tables = tables
+        self.sha256 = sha256
+        self.extract_seconds = extract_seconds
+
+    @property
+    def engine(self) -> Optional[str]:
+        """Engine that produced the tables."""
+        return self.tables[0].engine if self.tables else None
+
+    @property
+    def table_ids(self) -> List[str]:
+        return [table.table_id for table in self.tables]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the document, in bytes."""
+        return sys.getsizeof(self) + sys.getsizeof(self.tables) + sum(table.nbytes for table in self.tables)
+
+    def table(self, table_id: str) -> Optional[ExtractedTable]:
+        """Return the table with the given ID, or None."""
+        return next((table for table in self.tables if table.table_id == table_id), None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the document's metadata and its tables' as a plain dictionary."""
+        return {
+            'filename': self.filename,
+            'sha256': self.sha256,
+            'engine': self.engine,
+            'extract_seconds': round(self.extract_seconds, 4),
+            'tables': [table.to_dict() for table in self.tables]
+        }
+
+    def __repr__(self) -> str:
+        return f"ExtractedDocument(filename={self.filename!r}, tables={len(self.tables)})"
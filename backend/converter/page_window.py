@@ -0,0 +1,170 @@
+"""
+FileFlip Page Windows
+---------------------
+Walks very large PDFs a window of pages at a time. pdfplumber keeps every
+parsed page's layout objects, and pdfminer every decoded object, alive
+until the document is closed; here each page's cache is flushed once it
+has been processed, and the document is reopened for every window so the
+parser's caches are dropped too. The growth in resident memory since the
+document was started is checked after every page against a configurable
+ceiling.
+"""
+
+import gc
+import os
+from typing import Any, Iterable, Iterator, Optional, Union
+
+import pdfplumber
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pages parsed per opening of the document
+DEFAULT_PAGE_WINDOW = int(os.environ.get("FILEFLIP_PAGE_WINDOW", 50))
+
+# Ceiling on the growth in resident memory while a document is processed
+# (0 disables it). RSS is measured for the whole process, so growth from
+# other documents processed concurrently in the same process counts too.
+DEFAULT_MAX_RSS_BYTES = int(os.environ.get("FILEFLIP_MAX_RSS_BYTES", 0))
+
+_STATM_PATH = "/proc/self/statm"
+
+
+class MemoryCeilingExceeded(MemoryError):
+    """Processing a document grew resident memory by more than the ceiling."""
+
+    def __init__(self, rss_bytes: int, max_rss_bytes: int):
+        super().__init__(
+            f"Resident memory grew by {rss_bytes // 2**20} MiB, over the ceiling of {max_rss_bytes // 2**20} MiB"
+        )
+        self.rss_bytes = rss_bytes
+        self.max_rss_bytes = max_rss_bytes
+
+    def __reduce__(self):
+        # Raised in pool workers, so it must survive pickling
+        return (type(self), (self.rss_bytes, self.max_rss_bytes))
+
+
+def current_rss() -> int:
+    """
+    Return the resident memory of this process, in bytes.
+
+    Read from /proc/self/statm; returns 0 where that isn't available,
+    which disables the ceiling.
+    """
+    try:
+        with open(_STATM_PATH, 'r') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+class RssGuard:
+    """
+    Checks the growth in resident memory of the process against a ceiling.
+
+    The baseline is taken when the guard is created, at the start of a
+    document, so memory the process already holds (other documents,
+    caches, earlier uploads) doesn't count against it. RSS is still a
+    whole-process figure: in a server processing several documents at once
+    the growth of all of them is measured.
+    """
+
+    def __init__(self, max_rss_bytes: int = DEFAULT_MAX_RSS_BYTES):
+        """
+        Initialize the guard.
+
+        Args:
+            max_rss_bytes: Ceiling on resident memory growth in bytes (0 disables it)
+        """
+        self.max_rss_bytes = max_rss_bytes
+        self.baseline_rss = current_rss() if max_rss_bytes > 0 else 0
+        self.peak_rss = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_rss_bytes > 0
+
+    def growth(self) -> int:
+        """Return the growth in resident memory since the guard was created."""
+        return max(0, current_rss() - self.baseline_rss)
+
+    def over(self) -> bool:
+        """Return whether resident memory has grown past the ceiling."""
+        if not self.enabled:
+            return False
+        growth = self.growth()
+        self.peak_rss = max(self.peak_rss, self.baseline_rss + growth)
+        return growth > self.max_rss_bytes
+
+    def check(self) -> None:
+        """
+        Enforce the ceiling, collecting garbage first.
+
+        Raises:
+            MemoryCeilingExceeded: If memory is still over the ceiling
+        """
+        if not self.over():
+            return
+        gc.collect()
+        growth = self.growth()
+        if growth > self.max_rss_bytes:
+            raise MemoryCeilingExceeded(growth, self.max_rss_bytes)
+
+
+def page_count(pdf_source: Union[str, Any]) -> int:
+    """Return the number of pages of a PDF without parsing their content."""
+    if hasattr(pdf_source, 'seek'):
+        pdf_source.seek(0)
+    with pdfplumber.open(pdf_source) as pdf:
+        return len(pdf.pages)
+
+
+def iter_page_windows(
+    pdf_source: Union[str, Any],
+    window: int = DEFAULT_PAGE_WINDOW,
+    page_numbers: Optional[Iterable[int]] = None,
+    guard: Optional[RssGuard] = None
+) -> Iterator[Any]:
+    """
+    Yield the pages of a PDF, opening the document one window at a time.
+
+    Each page's cached layout and objects are flushed as soon as the
+    caller moves on to the next page, and the document is closed at the
+    end of every window. When the guard reports memory over the ceiling,
+    the current window is cut short so the document's caches are dropped;
+    if that doesn't bring memory back under the ceiling, processing stops.
+
+    Args:
+        pdf_source: Path to the PDF file or a seekable file-like object
+        window: Pages parsed per opening of the document
+        page_numbers: 1-based numbers of the pages to yield (default: all)
+        guard: Resident memory guard (default: none)
+
+    Yields:
+        pdfplumber pages, in page order
+
+    Raises:
+        MemoryCeilingExceeded: If memory stays over the guard's ceiling
+    """
+    numbers = sorted(set(page_numbers)) if page_numbers is not None else list(range(1, page_count(pdf_source) + 1))
+    window = max(1, window)
+
+    while numbers:
+        batch, numbers = numbers[:window], numbers[window:]
+        if hasattr(pdf_source, 'seek'):
+            pdf_source.seek(0)
+        with pdfplumber.open(pdf_source, pages=batch) as pdf:
+            for i, page in enumerate(pdf.pages):
+                try:
+                    yield page
+                finally:
+                    page.flush_cache()
+                if guard is not None and guard.over() and i + 1 < len(pdf.pages):
+                    # Put the rest of the window back and reopen the document
+                    logger.info(f"Memory over the ceiling after page {page.page_number}, closing the document early")
+                    numbers = [p.page_number for p in pdf.pages[i + 1:]] + numbers
+                    break
+        if guard is not None:
+            guard.check()
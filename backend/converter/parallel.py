@@ -0,0 +1,200 @@
+"""
+FileFlip Page-Parallel Extraction
+---------------------------------
+Splits the pages of a PDF across a process pool. The pool is shared by
+every document and started with spawn, so worker processes never inherit
+the server's threads and locks. Each worker keeps the document it is
+working on open across the shards of that document.
+"""
+
+import io
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Union
+
+import pdfplumber
+import logging
+
+from .models import ExtractedTable
+from .page_window import DEFAULT_MAX_RSS_BYTES, RssGuard
+
+logger = logging.getLogger(__name__)
+
+# Document the worker process has open, and what identifies it
+_worker_pdf = None
+_worker_source: Optional[Union[bytes, str]] = None
+_worker_key: Optional[tuple] = None
+_worker_guard: Optional[RssGuard] = None
+
+
+def _open_worker_pdf() -> None:
+    """(Re)open the worker's document, dropping the parser's caches."""
+    global _worker_pdf
+    if _worker_pdf is not None:
+        _worker_pdf.close()
+    source = _worker_source
+    _worker_pdf = pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _use_document(pdf_source: Union[bytes, str], doc_key: Optional[str], max_rss_bytes: int) -> None:
+    """
+    Make ``pdf_source`` the worker's open document.
+
+    The open document is kept when the next shard is from the same
+    document, which ``doc_key`` (the content hash) identifies; paths alone
+    don't, a temporary file's name can come back for another upload.
+    Without a key the document is reopened for every shard.
+    """
+    global _worker_source, _worker_key, _worker_guard
+    key = (pdf_source if isinstance(pdf_source, str) else None, doc_key)
+    if doc_key is not None and key == _worker_key and _worker_pdf is not None:
+        return
+    _worker_source = pdf_source
+    _worker_key = key
+    _worker_guard = RssGuard(max_rss_bytes)
+    _open_worker_pdf()
+
+
+def _run_shard(
+    pdf_source: Union[bytes, str],
+    doc_key: Optional[str],
+    page_numbers: List[int],
+    page_func: Callable,
+    max_rss_bytes: int = DEFAULT_MAX_RSS_BYTES
+) -> List[ExtractedTable]:
+    """
+    Run ``page_func`` over a shard of 1-based page numbers.
+
+    Each page's objects are released once its tables are out. If the
+    worker is over the memory ceiling after the shard, the document is
+    reopened to drop the parser's caches.
+    """
+    _use_document(pdf_source, doc_key, max_rss_bytes)
+    results = []
+    for page_number in page_numbers:
+        page = _worker_pdf.pages[page_number - 1]
+        results.extend(page_func(page))
+        page.flush_cache()
+    if _worker_guard.over():
+        _open_worker_pdf()
+        _worker_guard.check()
+    return results
+
+
+def shard_pages(page_count: int, max_workers: int, shards_per_worker: int = 4) -> List[List[int]]:
+    """
+    Split the page range into contiguous shards.
+
+    Args:
+        page_count: Number of pages in the document
+        max_workers: Number of worker processes
+        shards_per_worker: Shards per worker, so fast workers can pick up more
+
+    Returns:
+        A list of shards, each a list of 1-based page numbers, in page order
+    """
+    if page_count <= 0:
+        return []
+    shard_count = max(1, min(page_count, max_workers * shards_per_worker))
+    shard_size = math.ceil(page_count / shard_count)
+    return [
+        list(range(start, min(start + shard_size, page_count + 1)))
+        for start in range(1, page_count + 1, shard_size)
+    ]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Return the shared worker pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"Started page extraction pool with {max_workers} workers")
+        return _pool
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    """Drop a crashed pool so the next document starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        # Other documents may have seen the same crash
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_page_pool() -> None:
+    """Stop the shared worker pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pages_parallel(
+    pdf_source: Union[bytes, str],
+    page_count: int,
+    page_func: Callable,
+    max_workers: Optional[int] = None,
+    max_rss_bytes: int = DEFAULT_MAX_RSS_BYTES,
+    doc_key: Optional[str] = None
+) -> List[ExtractedTable]:
+    """
+    Run a per-page extraction function across the shared process pool.
+
+    Args:
+        pdf_source: Raw bytes of the PDF, or the path of a PDF file (which
+            saves sending the bytes with every shard)
+        page_count: Number of pages in the document
+        page_func: Module-level function taking a pdfplumber page and
+            returning a list of ExtractedTables
+        max_workers: Number of workers the pages are sharded for, and the
+            size of the pool if this call starts it (default: CPU count)
+        max_rss_bytes: Ceiling on each worker's memory growth from the
+            start of the document (0 disables it)
+        doc_key: Content hash of the document, letting workers keep it
+            open from one shard to the next
+
+    Returns:
+        The tables of all pages, merged back in page order
+
+    Raises:
+        MemoryCeilingExceeded: If a worker stays over the memory ceiling
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    shards = shard_pages(page_count, max_workers)
+
+    pool = _get_pool(max_workers)
+    futures = [
+        pool.submit(_run_shard, pdf_source, doc_key, shard, page_func, max_rss_bytes)
+        for shard in shards
+    ]
+    try:
+        # Shards are contiguous and submitted in order, so collecting the
+        # results in submission order keeps the tables in page order
+        tables = []
+        for future in futures:
+            tables.extend(future.result())
+    except BrokenProcessPool:
+        logger.error("Page extraction worker crashed, restarting the pool")
+        _discard_pool(pool)
+        raise
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+    logger.info(f"Extracted {page_count} pages in {len(shards)} shards")
+    return tables
@@ -4,146 +4,523 @@ FileFlip PDF Data Extraction Service
 This module handles extraction of tabular data from PDF files.
 """
 
+import csv
+import asyncio
 import io
+import json
 import os
+import time
+import zipfile
+from functools import partial
 import pandas as pd
 import pdfplumber
-import tabula
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Callable, Iterator, Tuple, Optional, Union
 from fastapi import UploadFile
 import logging
 
+from .cache import ExtractionCache, get_extraction_cache
+from .column_types import AMOUNT, DATE, INTEGER, infer_types
+from .executor import ExtractionExecutor, get_extraction_executor
+from .ingest import IngestedFile, ingest_upload
+from .job_queue import ConversionQueue, get_conversion_queue
+from .models import ExtractedDocument, ExtractedTable, column_stats, make_table_id
+from .page_window import DEFAULT_MAX_RSS_BYTES, DEFAULT_PAGE_WINDOW, MemoryCeilingExceeded, RssGuard, iter_page_windows, page_count
+from .parallel import extract_pages_parallel
+from .strategy import MIN_TABLE_QUALITY, get_strategy_registry, layout_fingerprint, score_tables
+from .table import ColumnarTable, column_cells, pa
+from .tabula_engine import get_tabula_engine
+from .text_layout import tables_from_page as text_layout_tables_from_page
+from .triage import DEFAULT_TRIAGE_THRESHOLD, candidate_pages, format_pages, score_page, score_pages
+from .xlsx_writer import write_xlsx
+
 logger = logging.getLogger(__name__)
 
+# Rows formatted per chunk when streaming CSV
+CSV_CHUNK_ROWS = 1000
+
+# What the converters accept as table data
+TableData = Union[ExtractedTable, ColumnarTable, List[Dict]]
+
+
+def _tables_from_page(page, triage_threshold: Optional[float] = None) -> List[ExtractedTable]:
+    """
+    Extract the tables on a single pdfplumber page.
+    
+    Pages scoring below ``triage_threshold`` in the cheap triage pass are
+    skipped without running table detection.
+    """
+    tables = []
+    if triage_threshold is not None and score_page(page)['score'] < triage_threshold:
+        return tables
+    started = time.perf_counter()
+    for j, found in enumerate(page.find_tables()):
+        table = found.extract()
+        if table and len(table) > 1:  # Skip empty tables
+            # Convert to DataFrame
+            df = pd.DataFrame(table[1:], columns=table[0])
+            # Clean up column names
+            df.columns = [str(col).strip() for col in df.columns]
+            tables.append(ExtractedTable(df, page.page_number, j, 'pdfplumber', bbox=tuple(found.bbox)))
+    # Detection covers the whole page, so its tables share the page's time
+    seconds = time.perf_counter() - started
+    for table in tables:
+        table.extract_seconds = seconds
+    return tables
+
+
+# Engines that work one page at a time, and can be sharded and streamed
+PAGE_ENGINES = {
+    'pdfplumber': _tables_from_page,
+    'text_layout': text_layout_tables_from_page,
+}
+
+
 class PDFExtractor:
     """Extracts tabular data from PDF files using multiple strategies."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        parallel_page_threshold: int = 20,
+        cache: Optional[ExtractionCache] = None,
+        triage_threshold: Optional[float] = DEFAULT_TRIAGE_THRESHOLD,
+        page_window: int = DEFAULT_PAGE_WINDOW,
+        max_rss_bytes: int = DEFAULT_MAX_RSS_BYTES,
+        executor: Optional[ExtractionExecutor] = None
+    ):
+        """
+        Initialize the PDF extractor.
+        
+        Args:
+            max_workers: Size of the process pool for page-parallel extraction
+                (default: CPU count; 1 disables it)
+            parallel_page_threshold: Minimum page count before pages are
+                sharded across the process pool
+            cache: Extraction result cache (default: the shared cache)
+            triage_threshold: Minimum page score for a page to be handed to
+                the table engines (None disables page triage)
+            page_window: Pages parsed per opening of the document by the
+                page engines; each page's objects are released once its
+                tables are out
+            max_rss_bytes: Ceiling on the process's resident memory growth
+                while a document is processed (0 disables it)
+            executor: Bounded executor the blocking extraction of
+                ``extract_tables`` runs on (default: the shared executor)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_page_threshold = parallel_page_threshold
+        self.cache = cache or get_extraction_cache()
+        self.triage_threshold = triage_threshold
+        self.page_window = page_window
+        self.max_rss_bytes = max_rss_bytes
+        self.executor = executor or get_extraction_executor()
+        self._page_funcs = {
+            name: partial(func, triage_threshold=triage_threshold)
+            for name, func in PAGE_ENGINES.items()
+        }
+        self.methods_by_name = {
+            'pdfplumber': self._extract_with_pdfplumber,
+            'text_layout': self._extract_with_text_layout,
+            'tabula': self._extract_with_tabula
+        }
         self.extraction_methods = [
             self._extract_with_pdfplumber,
+            self._extract_with_text_layout,
             self._extract_with_tabula
         ]
+        self.strategy_registry = get_strategy_registry()
 
-    async def extract_tables(self, file: UploadFile) -> List[Dict[str, Any]]:
+    def _methods_for(self, method: Optional[str]) -> List[Callable]:
+        """
+        Return the extraction methods to try for a request.
+        
+        Args:
+            method: Name of a single extraction method, or None for the
+                default fallback chain
+        """
+        if method is None:
+            return self.extraction_methods
+        if method not in self.methods_by_name:
+            raise ValueError(
+                f"Unknown extraction method: {method}. "
+                f"Use one of: {', '.join(self.methods_by_name)}"
+            )
+        return [self.methods_by_name[method]]
+
+    async def extract_tables(self, file: Union[UploadFile, IngestedFile], method: Optional[str] = None) -> List[ExtractedTable]:
         """
         Extract tables from a PDF file.
         
         Args:
-            file: The uploaded PDF file
+            file: The uploaded PDF file, or an upload already ingested with
+                ``ingest_upload`` (left open for the caller)
+            method: Extraction method to use (default: try each in turn,
+                starting with the engine that did best on this layout)
             
         Returns:
-            A list of dictionaries, each containing a table and metadata
+            The extracted tables, prepared for output
+            
+        Raises:
+            ExecutorBusy: If the extraction executor has no room for the request
+            ExtractionTimeout: If the extraction runs past the executor's timeout
         """
+        methods = self._methods_for(method)
+        # Read the upload once, hashing it on the way
+        source = file if isinstance(file, IngestedFile) else await ingest_upload(file)
         try:
-            # Read the file into memory
-            contents = await file.read()
-            file_obj = io.BytesIO(contents)
-            
-            # Try different extraction methods
-            for method in self.extraction_methods:
-                tables = method(file_obj)
-                if tables and len(tables) > 0:
-                    return self._prepare_tables_output(tables, file.filename)
-            
-            # If no tables are found
-            logger.warning(f"No tables found in {file.filename}")
-            return []
-            
+            # The parsing is blocking, keep it off the event loop. A call
+            # that times out goes on reading the upload, so it holds the
+            # upload open until it is over, whenever it gets closed.
+            return await self.executor.run(
+                self._extract_tables_sync, source, methods, on_done=source.retain().release
+            )
         except Exception as e:
             logger.error(f"Error extracting tables from PDF: {str(e)}")
             raise
         finally:
-            # Reset file pointer for potential reuse
-            await file.seek(0)
+            if source is not file:
+                source.close()
 
-    def _extract_with_pdfplumber(self, file_obj: io.BytesIO) -> List[pd.DataFrame]:
-        """Extract tables using pdfplumber library."""
+    def _extract_tables_sync(self, source: IngestedFile, methods: List[Callable]) -> List[ExtractedTable]:
+        """Extract and prepare the tables of an ingested upload, blocking."""
+        # Reuse the result of an earlier extraction of the same document
+        cache_key = self.cache.make_key(source.sha256, self._cache_config(methods))
+        tables = self.cache.get(cache_key)
+        
+        if tables is None:
+            tables = self._run_methods(source, methods)
+            if tables:
+                # Only cache successes, failures may be transient
+                self.cache.put(cache_key, tables)
+        
+        if tables:
+            return self._prepare_tables_output(tables, source.filename, source.sha256)
+        
+        # If no tables are found
+        logger.warning(f"No tables found in {source.filename}")
+        return []
+
+    async def extract_document(self, file: Union[UploadFile, IngestedFile], method: Optional[str] = None) -> ExtractedDocument:
+        """
+        Extract tables from a PDF file into an ExtractedDocument.
+        
+        Args:
+            file: The uploaded PDF file, or an upload already ingested with
+                ``ingest_upload`` (left open for the caller)
+            method: Extraction method to use (default: try each in turn)
+            
+        Returns:
+            The document with its tables, content hash and extraction time
+        """
+        started = time.perf_counter()
+        source = file if isinstance(file, IngestedFile) else await ingest_upload(file)
+        try:
+            tables = await self.extract_tables(source, method=method)
+            return ExtractedDocument(source.filename, tables, source.sha256, time.perf_counter() - started)
+        finally:
+            if source is not file:
+                source.close()
+
+    async def extract_documents(
+        self,
+        files: List[IngestedFile],
+        method: Optional[str] = None,
+        queue: Optional[ConversionQueue] = None
+    ) -> List[Union[ExtractedDocument, Exception]]:
+        """
+        Extract several PDFs in parallel, each in a worker process.
+        
+        The documents are handed to the conversion queue's worker pool by
+        path, so the bytes are not sent between processes. The workers'
+        results land in the on-disk extraction cache, and their engine
+        scores are merged into the strategy registry file, which this
+        process reloads on its next lookup.
+        
+        Args:
+            files: Uploads already ingested with ``ingest_upload`` (left
+                open for the caller)
+            method: Extraction method to use (default: try each in turn)
+            queue: Worker pool to run on (default: the shared conversion queue)
+            
+        Returns:
+            One entry per file, in order: the document, or the exception
+            its extraction raised (QueueFull if the pool had no room)
+        """
+        self._methods_for(method)
+        queue = queue or get_conversion_queue()
+        return await asyncio.gather(
+            *(
+                queue.run(
+                    f"extract-{i}-{source.sha256[:12]}",
+                    extract_file,
+                    source.path(),
+                    source.filename,
+                    source.sha256,
+                    method,
+                    self.triage_threshold
+                )
+                for i, source in enumerate(files)
+            ),
+            return_exceptions=True
+        )
+
+    def _order_methods(self, source: IngestedFile, methods: List[Callable]) -> Tuple[Optional[str], List[Callable]]:
+        """
+        Put the engine that did best on this layout before the others.
+        
+        Returns:
+            The layout fingerprint and the reordered methods
+        """
+        with source.open() as view:
+            fingerprint = layout_fingerprint(view)
+        if len(methods) < 2:
+            return fingerprint, methods
+        
+        engine_names = {extract: name for name, extract in self.methods_by_name.items()}
+        order = self.strategy_registry.order_engines(fingerprint, [engine_names[m] for m in methods])
+        if order[0] != engine_names[methods[0]]:
+            logger.info(f"Layout {fingerprint} seen before, trying {order[0]} first")
+        return fingerprint, [self.methods_by_name[name] for name in order]
+
+    def _run_methods(self, source: IngestedFile, methods: List[Callable]) -> List[ExtractedTable]:
+        """
+        Try extraction methods in turn and return the best result.
+        
+        Stops at the first result scoring at least MIN_TABLE_QUALITY; if none
+        does, the best-scoring result is returned. Every engine's score is
+        recorded against the layout fingerprint.
+        """
+        fingerprint, methods = self._order_methods(source, methods)
+        engine_names = {extract: name for name, extract in self.methods_by_name.items()}
+        best_tables, best_score = [], -1.0
+        
+        for extract in methods:
+            tables = extract(source)
+            score = score_tables(tables) if tables else 0.0
+            self.strategy_registry.record(fingerprint, engine_names[extract], score)
+            if tables and score > best_score:
+                best_tables, best_score = tables, score
+            if score >= MIN_TABLE_QUALITY:
+                break
+        
+        return best_tables
+
+    def iter_tables(self, source: IngestedFile, method: Optional[str] = None) -> Iterator[ExtractedTable]:
+        """
+        Extract tables from a PDF, yielding each table as soon as its page is done.
+        
+        Page engines (pdfplumber, text_layout) parse one page at a time and
+        yield as they go; other engines run on the whole document. The next
+        engine is only tried if the previous one found nothing, and the
+        engine that did best on this layout before is tried first.
+        
+        Args:
+            source: The ingested upload
+            method: Extraction method to use (default: try each in turn)
+            
+        Yields:
+            The extracted tables, prepared for output, in page order
+            
+        Raises:
+            MemoryCeilingExceeded: If the document pushes memory over the ceiling
+        """
+        methods = self._methods_for(method)
+        filename = source.filename
+        cache_key = self.cache.make_key(source.sha256, self._cache_config(methods))
+        tables = self.cache.get(cache_key)
+        if tables is not None:
+            for extracted in tables:
+                yield self._prepare_table(extracted, filename, source.sha256)
+            return
+        
         tables = []
+        engine_names = {extract: name for name, extract in self.methods_by_name.items()}
+        fingerprint, methods = self._order_methods(source, methods)
+        for extract in methods:
+            engine = engine_names.get(extract)
+            complete = True
+            if engine in self._page_funcs:
+                try:
+                    with source.open() as view:
+                        for page in iter_page_windows(view, self.page_window, guard=RssGuard(self.max_rss_bytes)):
+                            for extracted in self._page_funcs[engine](page):
+                                tables.append(extracted)
+                                yield self._prepare_table(extracted, filename, source.sha256)
+                except MemoryCeilingExceeded:
+                    raise
+                except Exception as e:
+                    logger.error(f"{engine} extraction failed: {str(e)}")
+                    complete = False
+            else:
+                tables = extract(source)
+                for extracted in tables:
+                    yield self._prepare_table(extracted, filename, source.sha256)
+            
+            self.strategy_registry.record(fingerprint, engine, score_tables(tables) if tables else 0.0)
+            if tables:
+                break
+        
+        # Don't cache what a failed pass left behind
+        if tables and complete:
+            self.cache.put(cache_key, tables)
+        elif not tables:
+            logger.warning(f"No tables found in {filename}")
+
+    def _cache_config(self, methods: List[Callable]) -> Dict[str, Any]:
+        """Extractor settings that determine the extraction result."""
+        return {
+            'engine': [extract.__name__ for extract in methods],
+            'ocr': False,
+            'language': None,
+            'pages': 'all',
+            'triage': self.triage_threshold
+        }
+
+    def _extract_with_pdfplumber(self, source: IngestedFile) -> List[ExtractedTable]:
+        """Extract tables using pdfplumber library."""
+        return self._extract_pages(source, 'pdfplumber')
+
+    def _extract_with_text_layout(self, source: IngestedFile) -> List[ExtractedTable]:
+        """Extract tables from the word boxes of the text layer."""
+        return self._extract_pages(source, 'text_layout')
+
+    def _extract_pages(self, source: IngestedFile, engine: str) -> List[ExtractedTable]:
+        """
+        Run a page engine over every page, sharding large documents across processes.
+        
+        Sequentially, pages are walked a window at a time so memory stays
+        bounded however long the document.
+        
+        Raises:
+            MemoryCeilingExceeded: If the document pushes memory over the ceiling
+        """
+        tables = None
+        page_func = self._page_funcs[engine]
         
         try:
-            with pdfplumber.open(file_obj) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    extracted_tables = page.extract_tables()
-                    for j, table in enumerate(extracted_tables):
-                        if table and len(table) > 1:  # Skip empty tables
-                            # Convert to DataFrame
-                            df = pd.DataFrame(table[1:], columns=table[0])
-                            # Clean up column names
-                            df.columns = [str(col).strip() for col in df.columns]
-                            tables.append({
-                                'data': df,
-                                'page': i + 1,
-                                'table_index': j,
-                                'method': 'pdfplumber'
-                            })
+            with source.open() as view:
+                count = page_count(view)
+                if self.max_workers > 1 and count >= self.parallel_page_threshold:
+                    tables = self._extract_pages_parallel(source, count, page_func)
+                
+                if tables is None:
+                    tables = []
+                    for page in iter_page_windows(view, self.page_window, guard=RssGuard(self.max_rss_bytes)):
+                        tables.extend(page_func(page))
             
-            file_obj.seek(0)  # Reset file pointer for potential reuse
             return tables
+        except MemoryCeilingExceeded:
+            raise
         except Exception as e:
-            logger.error(f"pdfplumber extraction failed: {str(e)}")
-            file_obj.seek(0)  # Reset file pointer
+            logger.error(f"{engine} extraction failed: {str(e)}")
             return []
 
-    def _extract_with_tabula(self, file_obj: io.BytesIO) -> List[pd.DataFrame]:
+    def _extract_pages_parallel(self, source: IngestedFile, page_count: int, page_func: Callable) -> Optional[List[ExtractedTable]]:
+        """
+        Extract tables with a page engine, sharding the pages across a process pool.
+        
+        Workers open the upload's file when it is on disk, so the bytes
+        are not pickled with every shard. Returns None if the pool fails,
+        so the caller can fall back to the sequential path.
+        """
+        try:
+            return extract_pages_parallel(
+                source.path() if source.on_disk else source.data(),
+                page_count,
+                page_func,
+                max_workers=self.max_workers,
+                max_rss_bytes=self.max_rss_bytes,
+                doc_key=source.sha256
+            )
+        except MemoryCeilingExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"Parallel extraction failed, falling back to sequential: {str(e)}")
+            return None
+
+    def _extract_with_tabula(self, source: IngestedFile) -> List[ExtractedTable]:
         """Extract tables using tabula-py library."""
         tables = []
         
         try:
-            # Save the BytesIO to a temporary file since tabula requires a file path
-            temp_file_path = "temp_pdf.pdf"
-            with open(temp_file_path, 'wb') as f:
-                f.write(file_obj.getvalue())
+            # tabula requires a file path
+            pdf_path = source.path()
+            
+            # Only hand the candidate pages to tabula
+            pages = self._triage_pages(pdf_path)
+            if not pages:
+                return tables
             
-            # Extract tables with tabula
-            extracted_dfs = tabula.read_pdf(temp_file_path, pages='all', multiple_tables=True)
+            # Extract tables on a warm tabula worker
+            started = time.perf_counter()
+            extracted_dfs = get_tabula_engine().read_pdf(pdf_path, pages=pages, multiple_tables=True)
+            seconds = time.perf_counter() - started
             
             for i, df in enumerate(extracted_dfs):
                 if not df.empty:
-                    tables.append({
-                        'data': df,
-                        'page': i + 1,  # This is an approximation
-                        'table_index': i,
-                        'method': 'tabula'
-                    })
-            
-            # Clean up temp file
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+                    # The page is an approximation, tabula doesn't report it
+                    tables.append(ExtractedTable(df, i + 1, i, 'tabula', extract_seconds=seconds))
                 
             return tables
         except Exception as e:
             logger.error(f"tabula extraction failed: {str(e)}")
-            if os.path.exists("temp_pdf.pdf"):
-                os.remove("temp_pdf.pdf")
             return []
 
-    def _prepare_tables_output(self, tables: List[Dict], filename: str) -> List[Dict[str, Any]]:
+    def _triage_pages(self, pdf_path: str) -> str:
+        """
+        Return the page spec of the candidate pages for the heavy engines.
+        
+        'all' if triage is disabled or fails, '' if no page qualifies.
+        """
+        if self.triage_threshold is None:
+            return 'all'
+        try:
+            scores = score_pages(pdf_path)
+        except Exception as e:
+            logger.warning(f"Page triage failed, using all pages: {str(e)}")
+            return 'all'
+        
+        pages = candidate_pages(scores, self.triage_threshold)
+        logger.info("Page triage scores: " + ", ".join(f"p{s['page']}={s['score']}" for s in scores))
+        return 'all' if len(pages) == len(scores) else format_pages(pages)
+
+    def _prepare_tables_output(self, tables: List[ExtractedTable], filename: str, sha256: str) -> List[ExtractedTable]:
         """Prepare tables for output, with basic data cleaning."""
-        results = []
+        return [self._prepare_table(extracted, filename, sha256) for extracted in tables]
+
+    def _prepare_table(self, extracted: ExtractedTable, filename: str, sha256: str) -> ExtractedTable:
+        """
+        Prepare a single table for output, with basic data cleaning.
         
-        for table_info in tables:
-            df = table_info['data']
-            
-            # Basic data cleaning
-            df = self._clean_dataframe(df)
-            
-            # Detect if it's a multi-header table (when first rows look like headers)
-            has_multi_header = self._detect_multi_header(df)
-            
-            results.append({
-                'table_id': f"{filename.replace('.pdf', '')}_p{table_info['page']}_t{table_info['table_index']}",
-                'page': table_info['page'],
-                'rows': len(df),
-                'columns': len(df.columns),
-                'method': table_info['method'],
-                'preview_data': df.head(5).to_dict('records'),
-                'has_multi_header': has_multi_header,
-                'column_names': df.columns.tolist(),
-                'data': df.to_dict('records'),
-                'filename': filename
-            })
-            
-        return results
+        Returns a new table rather than updating ``extracted``, which may
+        be held by the cache. The cells are kept once, in a ColumnarTable;
+        previews and records are built from it on demand. Column types are
+        inferred here, once, and kept with the table for the exporters.
+        The table ID is derived from ``sha256``, the hash of the PDF.
+        """
+        started = time.perf_counter()
+        
+        # Basic data cleaning
+        df = self._clean_dataframe(extracted.data)
+        
+        # Detect if it's a multi-header table (when first rows look like headers)
+        has_multi_header = self._detect_multi_header(df)
+        
+        types = infer_types(df)
+        table = ExtractedTable(
+            ColumnarTable.from_dataframe(df, types),
+            extracted.page,
+            extracted.table_index,
+            extracted.engine,
+            bbox=extracted.bbox,
+            extract_seconds=extracted.extract_seconds,
+            table_id=make_table_id(sha256, extracted.engine, extracted.page, extracted.table_index),
+            filename=filename,
+            has_multi_header=has_multi_header,
+            column_stats=column_stats(df, types)
+        )
+        table.prepare_seconds = time.perf_counter() - started
+        return table
 
     def _clean_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Clean and prepare the dataframe."""
@@ -195,76 +572,265 @@ class PDFExtractor:
         return False
 
 
+def extract_file(
+    pdf_path: str,
+    filename: str,
+    sha256: str,
+    method: Optional[str] = None,
+    triage_threshold: Optional[float] = DEFAULT_TRIAGE_THRESHOLD
+) -> ExtractedDocument:
+    """
+    Extract a PDF on disk, blocking; runs in a worker process for batches.
+    
+    Pages are not sharded further, the batch already keeps every worker busy.
+    
+    Args:
+        pdf_path: Path of the PDF, left in place
+        filename: Name of the upload
+        sha256: SHA-256 hex digest of the PDF bytes
+        method: Extraction method to use (default: try each in turn)
+        triage_threshold: Minimum page score for a page to be handed to
+            the table engines
+        
+    Returns:
+        The document with its tables, content hash and extraction time
+    """
+    started = time.perf_counter()
+    extractor = PDFExtractor(max_workers=1, triage_threshold=triage_threshold)
+    with IngestedFile.from_file(pdf_path, sha256, filename) as source:
+        tables = extractor._extract_tables_sync(source, extractor._methods_for(method))
+    return ExtractedDocument(filename, tables, sha256, time.perf_counter() - started)
+
+
 class DataConverter:
     """Converts extracted data to various formats."""
     
-    def to_csv(self, data: List[Dict], delimiter: str = ',') -> io.StringIO:
+    def _to_columnar(self, data: TableData) -> ColumnarTable:
+        """Return table data as a ColumnarTable."""
+        if isinstance(data, ExtractedTable):
+            data = data.data
+        if isinstance(data, pd.DataFrame):
+            return ColumnarTable.from_dataframe(data)
+        if isinstance(data, ColumnarTable):
+            return data
+        return ColumnarTable.from_records(data)
+    
+    def to_csv(self, data: TableData, delimiter: str = ',') -> io.StringIO:
         """
         Convert table data to CSV format.
         
         Args:
-            data: List of dictionaries representing table rows
+            data: An extracted table, a ColumnarTable, or a list of dictionaries
+                representing table rows
             delimiter: CSV delimiter character
             
         Returns:
             StringIO object containing CSV data
         """
-        df = pd.DataFrame(data)
         output = io.StringIO()
-        df.to_csv(output, index=False, sep=delimiter)
+        for chunk in self.iter_csv(data, delimiter=delimiter):
+            output.write(chunk)
         output.seek(0)
         return output
     
-    def to_excel(self, data: List[Dict], sheet_name: str = 'Sheet1') -> io.BytesIO:
+    def iter_csv(
+        self,
+        data: TableData,
+        delimiter: str = ',',
+        include_header: bool = True,
+        chunk_rows: int = CSV_CHUNK_ROWS
+    ) -> Iterator[str]:
+        """
+        Stream table data as CSV, a chunk of rows at a time.
+        
+        Args:
+            data: An extracted table, a ColumnarTable, or a list of dictionaries
+                representing table rows
+            delimiter: CSV delimiter character
+            include_header: Whether to write the header row
+            chunk_rows: Rows formatted per chunk
+            
+        Yields:
+            CSV text, one chunk of rows at a time
+        """
+        yield from self.iter_csv_tables([data], delimiter, include_header, chunk_rows)
+    
+    def iter_csv_tables(
+        self,
+        tables: List[TableData],
+        delimiter: str = ',',
+        include_header: bool = True,
+        chunk_rows: int = CSV_CHUNK_ROWS
+    ) -> Iterator[str]:
+        """
+        Stream several tables as one CSV, one after another.
+        
+        The header is the union of the tables' columns, in order of first
+        appearance; cells a table doesn't have are left empty. Only one
+        chunk of rows is formatted at a time, so memory stays bounded
+        whatever the table size.
+        
+        Yields:
+            CSV text, one chunk of rows at a time
+        """
+        tables = [self._to_columnar(table) for table in tables]
+        columns = []
+        for table in tables:
+            columns.extend(col for col in table.columns if col not in columns)
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=delimiter, lineterminator='\n')
+        if include_header:
+            writer.writerow(columns)
+        
+        for table in tables:
+            arrays = [table.column(col) if col in table.columns else None for col in columns]
+            for start in range(0, table.num_rows, chunk_rows):
+                stop = min(start + chunk_rows, table.num_rows)
+                cells = [column_cells(array, start, stop) for array in arrays]
+                writer.writerows(zip(*cells))
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        if buffer.tell():
+            yield buffer.getvalue()
+    
+    def to_excel(self, data: TableData, sheet_name: str = 'Sheet1') -> io.BytesIO:
         """
         Convert table data to Excel format.
         
         Args:
-            data: List of dictionaries representing table rows
+            data: An extracted table, a ColumnarTable, or a list of dictionaries
+                representing table rows
             sheet_name: Name for the Excel sheet
             
         Returns:
             BytesIO object containing Excel data
         """
-        df = pd.DataFrame(data)
+        return self.to_excel_tables([data], [sheet_name])
+    
+    def to_excel_tables(self, tables: List[TableData], sheet_names: Optional[List[str]] = None) -> io.BytesIO:
+        """
+        Convert several tables to one Excel workbook, one sheet per table.
+        
+        Rows are streamed into constant-memory sheets and column widths
+        are sized as the rows are written.
+        
+        Args:
+            tables: Extracted tables, ColumnarTables, or lists of dictionaries
+                representing table rows
+            sheet_names: Names for the sheets (default: "Table 1", "Table 2", ...)
+            
+        Returns:
+            BytesIO object containing Excel data
+        """
         output = io.BytesIO()
+        write_xlsx([self._to_columnar(table) for table in tables], output, sheet_names)
+        output.seek(0)
+        return output
+
+    def to_parquet(self, data: TableData, compression: str = 'zstd') -> io.BytesIO:
+        """
+        Convert table data to a Parquet file with typed columns.
         
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name=sheet_name)
+        Args:
+            data: An extracted table, a ColumnarTable, or a list of dictionaries
+                representing table rows
+            compression: Parquet compression codec
             
-            # Auto-adjust column widths
-            worksheet = writer.sheets[sheet_name]
-            for i, col in enumerate(df.columns):
-                max_len = max(
-                    df[col].astype(str).map(len).max(),
-                    len(str(col))
-                ) + 2  # Adding a little extra space
-                
-                # Convert to excel column letter (A, B, C, etc.)
-                col_letter = writer.sheets[sheet_name].cell(1, i + 1).column_letter
-                worksheet.column_dimensions[col_letter].width = min(max_len, 50)  # Cap width at 50 characters
+        Returns:
+            BytesIO object containing Parquet data
+        """
+        import pyarrow.parquet as pq
         
+        output = io.BytesIO()
+        pq.write_table(self._to_columnar(data).to_arrow(), output, compression=compression)
         output.seek(0)
         return output
-
-    def to_sage_format(self, data: List[Dict]) -> io.BytesIO:
+    
+    def to_arrow(self, data: TableData, compression: str = 'zstd') -> io.BytesIO:
+        """
+        Convert table data to an Arrow IPC file with typed columns.
+        
+        Args:
+            data: An extracted table, a ColumnarTable, or a list of dictionaries
+                representing table rows
+            compression: IPC buffer compression codec
+            
+        Returns:
+            BytesIO object containing Arrow IPC data
+        """
+        arrow_table = self._to_columnar(data).to_arrow()
+        output = io.BytesIO()
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_file(output, arrow_table.schema, options=options) as writer:
+            writer.write_table(arrow_table)
+        output.seek(0)
+        return output
+    
+    def to_dataset(self, tables: List[ExtractedTable], format: str = 'parquet') -> io.BytesIO:
+        """
+        Package several tables as a zipped Parquet or Arrow dataset.
+        
+        Each table is written to ``table_id=<id>/part-0.<ext>`` (a Hive
+        style partition, so the unzipped folder loads directly with
+        ``pyarrow.dataset`` or ``pandas.read_parquet``), next to a
+        ``_manifest.json`` listing the tables.
+        
+        Args:
+            tables: Extracted tables
+            format: 'parquet' or 'arrow'
+            
+        Returns:
+            BytesIO object containing the zip archive
+        """
+        writers = {'parquet': self.to_parquet, 'arrow': self.to_arrow}
+        if format not in writers:
+            raise ValueError(f"Unsupported dataset format: {format}")
+        
+        manifest = []
+        output = io.BytesIO()
+        # The files are compressed already
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for table in tables:
+                path = f"table_id={table.table_id}/part-0.{format}"
+                archive.writestr(path, writers[format](table).getvalue())
+                manifest.append({
+                    'table_id': table.table_id,
+                    'page': table.page,
+                    'rows': table.rows,
+                    'columns': table.columns,
+                    'engine': table.engine,
+                    'path': path
+                })
+            archive.writestr('_manifest.json', json.dumps({'format': format, 'tables': manifest}, indent=2))
+        output.seek(0)
+        return output
+    
+    def to_sage_format(self, data: TableData) -> io.BytesIO:
         """
         Convert table data to a format compatible with Sage accounting software.
         
         Args:
-            data: List of dictionaries representing table rows
+            data: An extracted table, a ColumnarTable, or a list of dictionaries
+                representing table rows
             
         Returns:
             BytesIO object containing Sage-compatible data
         """
         # Map columns to Sage-expected format if possible
-        df = pd.DataFrame(data)
+        table = self._to_columnar(data)
+        df = table.to_dataframe()
         
         # Attempt to identify and rename columns to match Sage format
         column_mapping = self._get_sage_column_mapping(df.columns)
         if column_mapping:
             df = df.rename(columns=column_mapping)
         
+        # Column types, inferred at extraction (or now, for other tables)
+        types = {column_mapping.get(col, col): table.column_type(col) for col in table.columns}
+        
         # Filter to only include columns needed by Sage
         sage_columns = [
             'Description', 'Reference', 'Date', 'Amount', 'VAT', 'Account'
@@ -277,29 +843,19 @@ class DataConverter:
         if len(available_sage_columns) >= 3:
             df = df[available_sage_columns]
         
-        # Format dates if a Date column exists
-        if 'Date' in df.columns:
-            try:
-                df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%d/%m/%Y')
-            except:
-                # Keep original if conversion fails
-                pass
+        # Format dates if the Date column holds dates, else keep the original
+        if 'Date' in df.columns and types['Date'].kind == DATE:
+            dates = pd.Series(types['Date'].values, index=df.index)
+            df['Date'] = dates.dt.strftime('%d/%m/%Y').where(dates.notna(), df['Date'])
                 
-        # Format numbers
+        # Format numbers if the column holds amounts, else keep the original
         for col in ['Amount', 'VAT']:
-            if col in df.columns:
-                try:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-                    df[col] = df[col].fillna(0).round(2)
-                except:
-                    # Keep original if conversion fails
-                    pass
+            if col in df.columns and types[col].kind in (AMOUNT, INTEGER):
+                df[col] = pd.Series(types[col].values, index=df.index, dtype=float).fillna(0).round(2)
         
         # Convert to Excel
         output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Sage Import')
-            
+        write_xlsx([df], output, ['Sage Import'])
         output.seek(0)
         return output
         
@@ -0,0 +1,125 @@
+"""
+FileFlip Conversion Progress
+----------------------------
+Tracks how far a conversion has got: the current stage and engine, pages
+done out of the total for that stage, tables found so far and an ETA for
+the stage. The table count settles on the kept result once extraction
+ends, since a later engine may replace an earlier one's tables.
+Snapshots are handed to a publish callback (the job registry, for jobs
+running in worker processes), throttled so a fast page loop does not
+turn into a write per page.
+"""
+
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between two published snapshots
+DEFAULT_PROGRESS_INTERVAL = float(os.environ.get("FILEFLIP_PROGRESS_INTERVAL", 0.5))
+
+
+class ProgressReporter:
+    """
+    Progress of one conversion.
+
+    Stage changes are published straight away; page and table updates at
+    most every ``interval`` seconds. Without a publish callback updates
+    are only tracked, which is what converters do outside of jobs.
+    """
+
+    def __init__(
+        self,
+        publish: Optional[Callable[[Dict[str, Any]], None]] = None,
+        interval: float = DEFAULT_PROGRESS_INTERVAL
+    ):
+        """
+        Initialize the reporter.
+
+        Args:
+            publish: Called with each snapshot (default: none)
+            interval: Minimum seconds between published snapshots
+        """
+        self.publish = publish
+        self.interval = interval
+        self.stage: Optional[str] = None
+        self.engine: Optional[str] = None
+        self.pages_done = 0
+        self.pages_total: Optional[int] = None
+        self.tables_found = 0
+        self._stage_started = time.monotonic()
+        self._published_at = 0.0
+
+    def start_stage(self, stage: str, pages_total: Optional[int] = None, engine: Optional[str] = None) -> None:
+        """
+        Enter a new stage, e.g. triage, extracting, ocr or writing.
+
+        Args:
+            stage: Stage name
+            pages_total: Pages the stage will go through, if known
+            engine: Engine doing the work, if any
+        """
+        self.stage = stage
+        self.engine = engine
+        self.pages_done = 0
+        self.pages_total = pages_total
+        self._stage_started = time.monotonic()
+        self._emit(force=True)
+
+    def pages(self, count: int = 1) -> None:
+        """Record pages done in the current stage."""
+        self.pages_done += count
+        self._emit(force=self.pages_total is not None and self.pages_done >= self.pages_total)
+
+    def set_pages(self, done: int, total: Optional[int] = None) -> None:
+        """Set the pages done, and the total if it is only known now."""
+        if total is not None:
+            self.pages_total = total
+        self.pages_done = done
+        self._emit(force=self.pages_total is not None and done >= self.pages_total)
+
+    def tables(self, count: int) -> None:
+        """Record tables found."""
+        self.tables_found += count
+        self._emit()
+
+    def set_tables(self, count: int) -> None:
+        """Set the number of tables found, once an engine's result is kept."""
+        self.tables_found = count
+        self._emit(force=True)
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Seconds left in the current stage, from its pace so far."""
+        if not self.pages_total or not self.pages_done:
+            return None
+        elapsed = time.monotonic() - self._stage_started
+        remaining = max(0, self.pages_total - self.pages_done)
+        return round(elapsed / self.pages_done * remaining, 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the progress as a plain dictionary."""
+        return {
+            'stage': self.stage,
+            'engine': self.engine,
+            'pages_done': self.pages_done,
+            'pages_total': self.pages_total,
+            'tables_found': self.tables_found,
+            'eta_seconds': self.eta_seconds
+        }
+
+    def _emit(self, force: bool = False) -> None:
+        if self.publish is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._published_at < self.interval:
+            return
+        self._published_at = now
+        try:
+            self.publish(self.snapshot())
+        except Exception as e:
+            # Progress is best effort, never fail the conversion over it
+            logger.warning(f"Could not publish progress: {str(e)}")
@@ -0,0 +1,215 @@
+"""
+FileFlip Engine Racing
+----------------------
+Runs several extraction engines on the same PDF at once, takes the first
+result that passes a quality threshold and kills the rest.
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import logging
+
+from .page_window import iter_page_windows
+from .strategy import MIN_TABLE_QUALITY, score_tables
+from .tabula_engine import TabulaCancelled, get_tabula_engine
+from .triage import parse_pages
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENGINES = ('pdfplumber', 'tabula', 'camelot')
+
+# Seconds an engine may run before it is killed
+DEFAULT_ENGINE_TIMEOUT = 120
+
+# Legs start from a fresh interpreter, so a child never inherits a lock
+# held by one of the server's other threads
+_MP_CONTEXT = multiprocessing.get_context('spawn')
+
+
+class _Cancelled(Exception):
+    """Internal signal that a leg lost the race."""
+
+
+def _run_pdfplumber(pdf_path: str, pages: str) -> List[pd.DataFrame]:
+    """Extract tables with pdfplumber (runs in a child process)."""
+    wanted = None if pages == 'all' else parse_pages(pages)
+    tables = []
+    for page in iter_page_windows(pdf_path, page_numbers=wanted):
+        for table in page.extract_tables():
+            if table and len(table) > 1:
+                df = pd.DataFrame(table[1:], columns=table[0])
+                df.columns = [str(col).strip() for col in df.columns]
+                tables.append(df)
+    return tables
+
+
+def _run_camelot(pdf_path: str, pages: str) -> List[pd.DataFrame]:
+    """Extract tables with camelot (runs in a child process)."""
+    import camelot
+
+    return [table.df for table in camelot.read_pdf(pdf_path, pages=pages, flavor='lattice')]
+
+
+# Engines run in a child process that can be killed outright
+_PROCESS_ENGINES: Dict[str, Callable] = {
+    'pdfplumber': _run_pdfplumber,
+    'camelot': _run_camelot,
+}
+
+
+def _process_entry(conn, engine: str, pdf_path: str, pages: str) -> None:
+    try:
+        conn.send(('ok', _PROCESS_ENGINES[engine](pdf_path, pages)))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {str(e)}"))
+    finally:
+        conn.close()
+
+
+def _run_process_leg(engine: str, pdf_path: str, pages: str, timeout: float, cancel: threading.Event) -> List[pd.DataFrame]:
+    """Run an engine in a child process, killing it on timeout or cancel."""
+    parent_conn, child_conn = _MP_CONTEXT.Pipe(duplex=False)
+    process = _MP_CONTEXT.Process(
+        target=_process_entry,
+        args=(child_conn, engine, pdf_path, pages),
+        name=f"race-{engine}",
+        daemon=True
+    )
+    process.start()
+    child_conn.close()
+
+    deadline = time.monotonic() + timeout
+    try:
+        while not parent_conn.poll(0.1):
+            if cancel.is_set():
+                raise _Cancelled()
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{engine} timed out after {timeout}s")
+            if not process.is_alive() and not parent_conn.poll():
+                raise RuntimeError(f"{engine} worker exited with code {process.exitcode}")
+        status, payload = parent_conn.recv()
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        parent_conn.close()
+
+    if status == 'error':
+        raise RuntimeError(payload)
+    return payload
+
+
+def _run_tabula_leg(pdf_path: str, pages: str, timeout: float, cancel: threading.Event) -> List[pd.DataFrame]:
+    """Run tabula on a warm JVM worker, which is restarted if cancelled."""
+    try:
+        return get_tabula_engine().read_pdf(
+            pdf_path,
+            timeout=timeout,
+            cancel=cancel,
+            pages=pages,
+            multiple_tables=True,
+            guess=True,
+            lattice=True,
+            stream=True
+        )
+    except TabulaCancelled:
+        raise _Cancelled()
+
+
+def _join_legs(threads: List[threading.Thread]) -> None:
+    """Wait for the cancelled legs of a race to finish cleaning up."""
+    for thread in threads:
+        thread.join()
+    logger.debug("Cancelled race legs cleaned up")
+
+
+def race_engines(
+    pdf_path: str,
+    engines: Tuple[str, ...] = DEFAULT_ENGINES,
+    pages: str = 'all',
+    quality_threshold: float = MIN_TABLE_QUALITY,
+    timeouts: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """
+    Run extraction engines concurrently and keep the first good result.
+
+    Each engine runs in its own worker: pdfplumber and camelot in child
+    processes, tabula on a warm JVM worker. The first result scoring at
+    least ``quality_threshold`` wins and is returned at once; the other
+    engines are killed in the background. If no engine passes, the
+    best-scoring result is returned once all have finished or timed out.
+
+    Args:
+        pdf_path: Path to the PDF file
+        engines: Names of the engines to race
+        pages: Page spec handed to every engine
+        quality_threshold: Minimum score for a result to win outright
+        timeouts: Per-engine timeouts in seconds (default: DEFAULT_ENGINE_TIMEOUT)
+
+    Returns:
+        Dictionary with the winning 'engine' (None if no engine found
+        tables), its 'tables' and 'score', and per-engine 'results'
+        (status and seconds)
+    """
+    timeouts = timeouts or {}
+    cancel = threading.Event()
+    results: queue.Queue = queue.Queue()
+    started = time.monotonic()
+
+    def run_leg(engine: str) -> None:
+        timeout = timeouts.get(engine, DEFAULT_ENGINE_TIMEOUT)
+        try:
+            if engine == 'tabula':
+                tables = _run_tabula_leg(pdf_path, pages, timeout, cancel)
+            else:
+                tables = _run_process_leg(engine, pdf_path, pages, timeout, cancel)
+            results.put((engine, 'finished', tables))
+        except _Cancelled:
+            results.put((engine, 'cancelled', None))
+        except TimeoutError:
+            results.put((engine, 'timeout', None))
+        except Exception as e:
+            logger.warning(f"{engine} failed in race: {str(e)}")
+            results.put((engine, 'error', None))
+
+    threads = [threading.Thread(target=run_leg, args=(engine,), daemon=True) for engine in engines]
+    for thread in threads:
+        thread.start()
+
+    report: Dict[str, Dict[str, Any]] = {}
+    best = (None, [], -1.0)
+    pending = list(engines)
+    while pending:
+        engine, status, tables = results.get()
+        pending.remove(engine)
+        report[engine] = {'status': status, 'seconds': round(time.monotonic() - started, 3)}
+        if status != 'finished':
+            continue
+
+        score = score_tables(tables) if tables else 0.0
+        report[engine]['score'] = score
+        if tables and score > best[2]:
+            best = (engine, tables, score)
+        if score >= quality_threshold:
+            # Winner found, kill the other engines
+            cancel.set()
+            break
+
+    # The losers are still being killed; don't make the winner wait for them
+    for engine in pending:
+        report[engine] = {'status': 'cancelled', 'seconds': round(time.monotonic() - started, 3)}
+    if pending:
+        threading.Thread(target=_join_legs, args=(threads,), name="race-cleanup", daemon=True).start()
+
+    winner, tables, score = best
+    if winner:
+        report[winner]['status'] = 'won'
+    logger.info(f"Engine race on {pdf_path}: winner={winner} " + ", ".join(
+        f"{engine}={info['status']}" for engine, info in report.items()
+    ))
+    return {'engine': winner, 'tables': tables, 'score': max(score, 0.0), 'results': report}
@@ -0,0 +1,458 @@
+"""
+FileFlip Registry
+-----------------
+Persistent registry of conversion jobs, their output files, and the
+metadata of uploaded documents and their tables. It lives in SQLite in
+WAL mode, so every API process on the host (uvicorn workers, replicas
+sharing a volume) sees the same jobs and documents, and status polls and
+downloads no longer depend on which process took the request. Readers
+never block the writer; lookups by job, document, table ID and content
+hash are indexed. Jobs can be registered under a key of their input and
+options, so identical submissions share one job; a shared job counts the
+submissions holding it and is only removed once all have released it.
+
+The cells of extracted tables are not kept here, they stay in the
+process's DocumentStore. Rows live as long as the store keeps documents:
+jobs not updated and documents not registered within the TTL are pruned,
+with the jobs' output files.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import logging
+
+from .models import ExtractedDocument
+from .store import DEFAULT_STORE_TTL
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_PATH = os.environ.get(
+    "FILEFLIP_REGISTRY_PATH",
+    os.path.join(tempfile.gettempdir(), "fileflip", "registry.db")
+)
+
+# Seconds a writer waits for another process's write to finish
+DEFAULT_BUSY_TIMEOUT = float(os.environ.get("FILEFLIP_REGISTRY_BUSY_TIMEOUT", 10))
+
+# Seconds between two prunes by the same registry, so callers may prune on
+# every write
+PRUNE_INTERVAL = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    output_files TEXT,
+    error_message TEXT,
+    engine TEXT,
+    queue_wait_seconds REAL,
+    run_seconds REAL,
+    refs INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);
+
+CREATE TABLE IF NOT EXISTS job_keys (
+    dedup_key TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL REFERENCES jobs (job_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS job_keys_job_id ON job_keys (job_id);
+
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    sha256 TEXT,
+    engine TEXT,
+    extract_seconds REAL,
+    table_count INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256);
+CREATE INDEX IF NOT EXISTS documents_created_at ON documents (created_at);
+
+CREATE TABLE IF NOT EXISTS tables (
+    doc_id TEXT NOT NULL REFERENCES documents (doc_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    table_id TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    PRIMARY KEY (doc_id, position)
+);
+CREATE INDEX IF NOT EXISTS tables_table_id ON tables (table_id);
+
+CREATE TABLE IF NOT EXISTS job_progress (
+    job_id TEXT PRIMARY KEY REFERENCES jobs (job_id) ON DELETE CASCADE,
+    stage TEXT,
+    engine TEXT,
+    pages_done INTEGER NOT NULL,
+    pages_total INTEGER,
+    tables_found INTEGER NOT NULL,
+    eta_seconds REAL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Progress columns, as found in a ProgressReporter snapshot
+PROGRESS_FIELDS = ('stage', 'engine', 'pages_done', 'pages_total', 'tables_found', 'eta_seconds')
+
+# Job columns callers may set
+JOB_FIELDS = ('status', 'output_files', 'error_message', 'engine', 'queue_wait_seconds', 'run_seconds')
+
+
+class Registry:
+    """
+    SQLite registry of jobs and documents, shared between processes.
+
+    Each thread gets its own connection; SQLite in WAL mode serializes the
+    writers of all processes and lets readers run alongside them.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_REGISTRY_PATH,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+        ttl: float = DEFAULT_STORE_TTL
+    ):
+        """
+        Initialize the registry, creating the database if needed.
+
+        Args:
+            path: Path of the SQLite database file
+            busy_timeout: Seconds a write waits for other writers
+            ttl: Seconds a job is kept after its last update, and a
+                document after it was registered
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.ttl = ttl
+        self._local = threading.local()
+        self._prune_lock = threading.Lock()
+        self._last_prune: Optional[float] = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = [row['name'] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if 'refs' not in columns:
+                # Registries created before jobs were shared
+                conn.execute("ALTER TABLE jobs ADD COLUMN refs INTEGER NOT NULL DEFAULT 1")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Jobs
+
+    def create_job(self, job_id: str, status: str = 'queued', **fields) -> None:
+        """
+        Register a new job.
+
+        Args:
+            job_id: Job ID
+            status: Initial status
+            **fields: Other job columns (see JOB_FIELDS)
+        """
+        values = self._job_values(status=status, **fields)
+        now = time.time()
+        values.update(job_id=job_id, created_at=now, updated_at=now)
+        columns = ', '.join(values)
+        placeholders = ', '.join(f":{column}" for column in values)
+        with self._connect() as conn:
+            conn.execute(f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", values)
+
+    def update_job(self, job_id: str, **fields) -> bool:
+        """
+        Update the columns of a job.
+
+        Returns:
+            False if the job does not exist (e.g. it was deleted)
+        """
+        values = self._job_values(**fields)
+        values.update(job_id=job_id, updated_at=time.time())
+        assignments = ', '.join(f"{column} = :{column}" for column in values if column != 'job_id')
+        with self._connect() as conn:
+            cursor = conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = :job_id", values)
+        return cursor.rowcount > 0
+
+    def claim_job(
+        self,
+        dedup_key: str,
+        job_id: str,
+        reuse: Callable[[Dict[str, Any]], bool],
+        status: str = 'queued'
+    ) -> Dict[str, Any]:
+        """
+        Return the job registered under a key, or register a new one.
+
+        The lookup and the registration happen in one write transaction,
+        so of identical submissions racing in any number of processes
+        exactly one creates the job and the others get it. Every
+        submission handed an existing job adds a reference to it, which
+        ``release_job`` drops.
+
+        Args:
+            dedup_key: Key of the job's input and options
+            job_id: ID of the job to create if none can be reused
+            reuse: Tells whether the job found under the key may be
+                handed out (e.g. not failed, outputs still on disk)
+            status: Initial status of a new job
+
+        Returns:
+            The job, which is the new one if its ID is ``job_id``
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT jobs.* FROM job_keys JOIN jobs USING (job_id) WHERE dedup_key = ?", (dedup_key,)
+            ).fetchone()
+            if row is not None:
+                job = self._job_from_row(row)
+                if reuse(job):
+                    conn.execute("UPDATE jobs SET refs = refs + 1 WHERE job_id = ?", (job['job_id'],))
+                    job['refs'] += 1
+                    return job
+
+            now = time.time()
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (job_id, status, now, now)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO job_keys (dedup_key, job_id) VALUES (?, ?)", (dedup_key, job_id)
+            )
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job as a dictionary, or None."""
+        row = self._connect().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return self._job_from_row(row)
+
+    def _job_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job['output_files'] = json.loads(job['output_files']) if job['output_files'] else None
+        return job
+
+    def delete_job(self, job_id: str) -> bool:
+        """Remove a job. Returns False if it did not exist."""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        return cursor.rowcount > 0
+
+    def release_job(self, job_id: str) -> Optional[int]:
+        """
+        Drop one submission's reference to a job, removing the job with
+        the last one.
+
+        Returns:
+            The number of references left (0 if the job was removed), or
+            None if the job did not exist
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT refs FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            refs = row['refs'] - 1
+            if refs > 0:
+                conn.execute("UPDATE jobs SET refs = ? WHERE job_id = ?", (refs, job_id))
+            else:
+                conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        return max(refs, 0)
+
+    def set_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        """
+        Record the progress of a job, replacing the previous snapshot.
+
+        Args:
+            job_id: Job ID
+            progress: A ProgressReporter snapshot
+        """
+        values = {field: progress.get(field) for field in PROGRESS_FIELDS}
+        values['pages_done'] = values['pages_done'] or 0
+        values['tables_found'] = values['tables_found'] or 0
+        values.update(job_id=job_id, updated_at=time.time())
+        columns = ', '.join(values)
+        placeholders = ', '.join(f":{column}" for column in values)
+        with self._connect() as conn:
+            # Inserting for a deleted job fails its foreign key, skip it
+            conn.execute(
+                f"INSERT OR REPLACE INTO job_progress ({columns}) "
+                f"SELECT {placeholders} WHERE EXISTS (SELECT 1 FROM jobs WHERE job_id = :job_id)",
+                values
+            )
+
+    def get_progress(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the latest progress of a job as a dictionary, or None."""
+        row = self._connect().execute(
+            "SELECT * FROM job_progress WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        progress = dict(row)
+        del progress['job_id']
+        return progress
+
+    def _job_values(self, **fields) -> Dict[str, Any]:
+        unknown = set(fields) - set(JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        if fields.get('output_files') is not None:
+            fields['output_files'] = json.dumps(fields['output_files'])
+        return fields
+
+    # Documents
+
+    def put_document(self, doc_id: str, document: ExtractedDocument) -> None:
+        """
+        Register a document and the metadata of its tables, replacing any
+        earlier document with the same ID.
+        """
+        tables = [
+            (doc_id, position, table.table_id, json.dumps(table.to_dict()))
+            for position, table in enumerate(document.tables)
+        ]
+        with self._connect() as conn:
+            conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            conn.execute(
+                "INSERT INTO documents (doc_id, filename, sha256, engine, extract_seconds, table_count, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, document.filename, document.sha256, document.engine,
+                 document.extract_seconds, len(document.tables), time.time())
+            )
+            conn.executemany(
+                "INSERT INTO tables (doc_id, position, table_id, metadata) VALUES (?, ?, ?, ?)",
+                tables
+            )
+
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Return a document's metadata with its tables', or None."""
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return None
+        document = dict(row)
+        document['tables'] = [
+            json.loads(metadata) for (metadata,) in conn.execute(
+                "SELECT metadata FROM tables WHERE doc_id = ? ORDER BY position", (doc_id,)
+            )
+        ]
+        return document
+
+    def find_table(self, table_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the metadata of a table by its ID, with the ID of the
+        document holding it under ``doc_id``, or None.
+        """
+        row = self._connect().execute(
+            "SELECT doc_id, metadata FROM tables WHERE table_id = ? LIMIT 1", (table_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row['metadata']), 'doc_id': row['doc_id']}
+
+    def delete_document(self, doc_id: str) -> bool:
+        """Remove a document and its tables. Returns False if it did not exist."""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        return cursor.rowcount > 0
+
+    # Expiry
+
+    def prune(self, force: bool = False) -> List[Dict[str, Any]]:
+        """
+        Remove the jobs and documents older than the TTL.
+
+        Progress, dedup keys and tables go with their job or document, and
+        the output files of removed jobs are deleted. Unless forced, this
+        runs at most once per PRUNE_INTERVAL and returns nothing otherwise.
+
+        Returns:
+            The removed jobs
+        """
+        now = time.monotonic()
+        with self._prune_lock:
+            if not force and self._last_prune is not None and now - self._last_prune < PRUNE_INTERVAL:
+                return []
+            self._last_prune = now
+
+        cutoff = time.time() - self.ttl
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT * FROM jobs WHERE updated_at < ?", (cutoff,)).fetchall()
+            conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+            documents = conn.execute("DELETE FROM documents WHERE created_at < ?", (cutoff,)).rowcount
+
+        jobs = [self._job_from_row(row) for row in rows]
+        for job in jobs:
+            self._remove_outputs(job)
+        if jobs or documents:
+            logger.info(f"Pruned {len(jobs)} jobs and {documents} documents older than {self.ttl:.0f}s")
+        return jobs
+
+    def _remove_outputs(self, job: Dict[str, Any]) -> None:
+        """Delete a job's output files, and their directory once empty."""
+        directories = set()
+        for path in job['output_files'] or []:
+            directories.add(os.path.dirname(path))
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove output {path}: {str(e)}")
+        for directory in directories:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Return row counts by kind and jobs by status."""
+        conn = self._connect()
+        return {
+            'path': self.path,
+            'jobs': dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()),
+            'documents': conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+            'tables': conn.execute("SELECT COUNT(*) FROM tables").fetchone()[0]
+        }
+
+
+_registry: Optional[Registry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> Registry:
+    """Return the process-wide registry, creating it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = Registry()
+        return _registry
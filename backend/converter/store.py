@@ -0,0 +1,326 @@
+"""
+FileFlip Document Store
+-----------------------
+Bounded store for uploaded documents and their extracted tables. Recently
+used documents stay in memory; colder ones are spilled to memory-mapped
+files on local disk, and documents unused for longer than the TTL are
+dropped.
+"""
+
+import mmap
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import logging
+
+from .models import ExtractedDocument, ExtractedTable
+from .table import ColumnarTable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.environ.get(
+    "FILEFLIP_STORE_DIR",
+    os.path.join(tempfile.gettempdir(), "fileflip", "store")
+)
+DEFAULT_STORE_MAX_MEMORY = int(os.environ.get("FILEFLIP_STORE_MAX_MEMORY", 256 * 1024 * 1024))
+DEFAULT_STORE_MAX_DISK = int(os.environ.get("FILEFLIP_STORE_MAX_DISK", 2 * 1024 * 1024 * 1024))
+DEFAULT_STORE_TTL = float(os.environ.get("FILEFLIP_STORE_TTL", 3600))
+
+
+def estimate_size(value: Any) -> int:
+    """Roughly estimate the memory held by a stored value, in bytes."""
+    if isinstance(value, (ColumnarTable, ExtractedTable, ExtractedDocument)):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    """A stored document, held either in memory or in a spill file."""
+
+    __slots__ = ('value', 'size', 'table_ids', 'last_access', 'path', 'mapped', 'disk_size')
+
+    def __init__(self, value: Any, size: int, table_ids: List[str]):
+        self.value = value
+        self.size = size
+        self.table_ids = table_ids
+        self.last_access = time.monotonic()
+        self.path: Optional[str] = None
+        self.mapped: Optional[mmap.mmap] = None
+        self.disk_size = 0
+
+    @property
+    def spilled(self) -> bool:
+        return self.value is None
+
+
+class DocumentStore:
+    """
+    Thread-safe document store with a memory budget, TTL and LRU eviction.
+
+    Each document is an ExtractedDocument. When the in-memory documents exceed ``max_memory_bytes``, the
+    least recently used ones are pickled to a spill file and memory-mapped;
+    reading a spilled document loads it back into memory. When the spill
+    files exceed ``max_disk_bytes``, the least recently used spilled
+    documents are dropped.
+
+    An index from table ID to the documents holding the table makes
+    table lookups constant-time. It is updated wherever a document is
+    added or dropped, so eviction, expiry and deletion keep it in step.
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int = DEFAULT_STORE_MAX_MEMORY,
+        max_disk_bytes: int = DEFAULT_STORE_MAX_DISK,
+        ttl: float = DEFAULT_STORE_TTL,
+        directory: str = DEFAULT_STORE_DIR
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            max_memory_bytes: Memory budget for the documents held in memory
+            max_disk_bytes: Disk budget for spilled documents (0 disables spilling)
+            ttl: Seconds a document is kept after it was last used
+            directory: Directory for the spill files
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self._spill_dir: Optional[str] = None
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        # Table ID -> (document ID, position in the document) of each
+        # document holding it, most recent last. Table IDs derive from the
+        # PDF's content, so the same PDF uploaded under two document IDs
+        # shares them.
+        self._table_index: Dict[str, List[Tuple[str, int]]] = {}
+        self._lock = threading.RLock()
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.spills = 0
+        self.loads = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def put(self, doc_id: str, document: ExtractedDocument) -> None:
+        """
+        Store a document, replacing any earlier one with the same ID.
+
+        Args:
+            doc_id: Document ID
+            document: The document with its extracted tables
+        """
+        entry = _Entry(document, estimate_size(document), document.table_ids)
+        with self._lock:
+            self._drop(doc_id)
+            self._entries[doc_id] = entry
+            for position, table_id in enumerate(entry.table_ids):
+                self._table_index.setdefault(table_id, []).append((doc_id, position))
+            self.memory_bytes += entry.size
+            self._enforce_budget()
+
+    def get(self, doc_id: str) -> Optional[ExtractedDocument]:
+        """Return a document, loading it back from disk if it was spilled."""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            entry.last_access = time.monotonic()
+            self._entries.move_to_end(doc_id)
+            if entry.spilled:
+                try:
+                    self._load(entry)
+                except Exception as e:
+                    logger.warning(f"Discarding unreadable spilled document {doc_id}: {str(e)}")
+                    self._drop(doc_id)
+                    return None
+                self._enforce_budget(keep=doc_id)
+            return entry.value
+
+    def __contains__(self, doc_id: str) -> bool:
+        with self._lock:
+            self._expire()
+            return doc_id in self._entries
+
+    def find_table(self, table_id: str) -> Optional[Tuple[ExtractedDocument, ExtractedTable]]:
+        """
+        Find an extracted table by its ID.
+
+        The table index points at the owning document and the table's
+        position in it; the document is loaded if it was spilled.
+
+        Returns:
+            The document and the table, or None if no document holds it
+        """
+        with self._lock:
+            self._expire()
+            holders = self._table_index.get(table_id)
+            if not holders:
+                return None
+            doc_id, position = holders[-1]
+            document = self.get(doc_id)
+        if document is None:
+            return None
+        return document, document.tables[position]
+
+    def delete(self, doc_id: str) -> bool:
+        """Remove a document. Returns False if it was not stored."""
+        with self._lock:
+            return self._drop(doc_id)
+
+    def clear(self) -> None:
+        """Remove every document and the spill files."""
+        with self._lock:
+            for doc_id in list(self._entries):
+                self._drop(doc_id)
+            if self._spill_dir:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return occupancy and eviction counters."""
+        with self._lock:
+            self._expire()
+            spilled = sum(1 for entry in self._entries.values() if entry.spilled)
+            return {
+                'documents': len(self._entries),
+                'tables': len(self._table_index),
+                'in_memory': len(self._entries) - spilled,
+                'spilled': spilled,
+                'memory_bytes': self.memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'disk_bytes': self.disk_bytes,
+                'max_disk_bytes': self.max_disk_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'spills': self.spills,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def _enforce_budget(self, keep: Optional[str] = None) -> None:
+        """Expire, spill and evict documents until both budgets are met."""
+        self._expire()
+
+        # Spill the coldest documents until memory fits, sparing ``keep``
+        for doc_id, entry in list(self._entries.items()):
+            if self.memory_bytes <= self.max_memory_bytes:
+                break
+            if entry.spilled or doc_id == keep:
+                continue
+            if not self._spill(doc_id, entry):
+                self._drop(doc_id)
+                self.evictions += 1
+
+        # Drop the coldest spilled documents until disk fits
+        for doc_id, entry in list(self._entries.items()):
+            if self.disk_bytes <= self.max_disk_bytes:
+                break
+            if entry.spilled:
+                self._drop(doc_id)
+                self.evictions += 1
+
+    def _expire(self) -> None:
+        """Drop documents unused for longer than the TTL."""
+        deadline = time.monotonic() - self.ttl
+        # Entries are in LRU order, so stop at the first fresh one
+        for doc_id, entry in list(self._entries.items()):
+            if entry.last_access >= deadline:
+                break
+            self._drop(doc_id)
+            self.expirations += 1
+
+    def _spill(self, doc_id: str, entry: _Entry) -> bool:
+        """Move a document to a memory-mapped spill file."""
+        if self.max_disk_bytes <= 0:
+            return False
+        try:
+            if self._spill_dir is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._spill_dir = tempfile.mkdtemp(dir=self.directory, prefix="spill-")
+            fd, path = tempfile.mkstemp(dir=self._spill_dir, suffix=".pkl")
+            with os.fdopen(fd, 'w+b') as f:
+                pickle.dump(entry.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                entry.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception as e:
+            logger.warning(f"Could not spill document {doc_id}: {str(e)}")
+            return False
+
+        entry.path = path
+        entry.disk_size = len(entry.mapped)
+        entry.value = None
+        self.memory_bytes -= entry.size
+        self.disk_bytes += entry.disk_size
+        self.spills += 1
+        return True
+
+    def _load(self, entry: _Entry) -> None:
+        """Load a spilled document back into memory."""
+        entry.value = pickle.loads(entry.mapped)
+        self._release_spill(entry)
+        self.memory_bytes += entry.size
+        self.loads += 1
+
+    def _release_spill(self, entry: _Entry) -> None:
+        if entry.mapped is not None:
+            entry.mapped.close()
+            entry.mapped = None
+        if entry.path:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            entry.path = None
+        self.disk_bytes -= entry.disk_size
+        entry.disk_size = 0
+
+    def _drop(self, doc_id: str) -> bool:
+        entry = self._entries.pop(doc_id, None)
+        if entry is None:
+            return False
+        for position, table_id in enumerate(entry.table_ids):
+            holders = self._table_index.get(table_id)
+            if holders is None:
+                continue
+            holders.remove((doc_id, position))
+            if not holders:
+                del self._table_index[table_id]
+        if entry.spilled:
+            self._release_spill(entry)
+        else:
+            self.memory_bytes -= entry.size
+        return True
+
+
+_store: Optional[DocumentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    """Return the process-wide document store, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DocumentStore()
+        return _store
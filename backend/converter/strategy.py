@@ -0,0 +1,251 @@
+"""
+FileFlip Extraction Strategy Selection
+--------------------------------------
+Computes a cheap layout fingerprint for a PDF and remembers which engine
+gave the best result for each fingerprint, so repeat layouts go straight
+to the winning engine.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+import pdfplumber
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .models import ExtractedTable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STRATEGY_FILE = os.environ.get(
+    "FILEFLIP_STRATEGY_FILE",
+    os.path.join(tempfile.gettempdir(), "fileflip", "strategies.json")
+)
+
+# Results scoring below this are treated as junk and the next engine is tried
+MIN_TABLE_QUALITY = 0.5
+
+# Share of the first page height treated as the header band
+_HEADER_BAND = 0.12
+
+
+def layout_fingerprint(pdf_source: Union[str, Any]) -> Optional[str]:
+    """
+    Compute a cheap fingerprint of the document layout.
+
+    Combines the producer/creator metadata, the first page size and a hash
+    of the first page's header text. Digits are dropped from the header so
+    statement dates and numbers don't change the fingerprint.
+
+    Args:
+        pdf_source: Path to the PDF file or a file-like object
+
+    Returns:
+        Hex fingerprint, or None if the PDF could not be read
+    """
+    try:
+        with pdfplumber.open(pdf_source) as pdf:
+            if not pdf.pages:
+                return None
+            metadata = pdf.metadata or {}
+            first = pdf.pages[0]
+            header = first.crop((0, 0, first.width, first.height * _HEADER_BAND))
+            header_text = re.sub(r"[\d\s]+", " ", header.extract_text() or "").strip().lower()
+            parts = [
+                str(metadata.get('Producer', '')),
+                str(metadata.get('Creator', '')),
+                round(float(first.width)),
+                round(float(first.height)),
+                hashlib.sha256(header_text.encode('utf-8')).hexdigest()
+            ]
+    except Exception as e:
+        logger.warning(f"Could not fingerprint PDF layout: {str(e)}")
+        return None
+    finally:
+        if hasattr(pdf_source, 'seek'):
+            pdf_source.seek(0)
+
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def score_tables(tables: List[Union[pd.DataFrame, ExtractedTable]]) -> float:
+    """
+    Score extracted tables between 0 (junk) and 1 (clean).
+
+    The score is the share of filled cells, scaled down for tables with
+    fewer than three columns, which are usually text split into lines.
+
+    Args:
+        tables: DataFrames, or extracted tables still holding their DataFrame
+
+    Returns:
+        Quality score
+    """
+    cells = 0
+    filled = 0
+    columns = 0
+    for table in tables:
+        df = table.data if isinstance(table, ExtractedTable) else table
+        if df.empty:
+            continue
+        values = df.fillna('').astype(str).apply(lambda col: col.str.strip())
+        cells += values.size
+        filled += int((values != '').values.sum())
+        columns += len(df.columns)
+
+    if cells == 0:
+        return 0.0
+    avg_columns = columns / len(tables)
+    return round((filled / cells) * min(1.0, avg_columns / 3), 3)
+
+
+class StrategyRegistry:
+    """
+    Persisted record of engine results per layout fingerprint.
+
+    Stored as a small JSON file and shared by every process on the host:
+    the API, the app and the conversion workers. Each update takes an
+    exclusive lock on the file, reloads what other processes have saved
+    since, applies the result and rewrites the file atomically, so no
+    process overwrites another's records. Lookups reload the file when it
+    has changed. Without fcntl (Windows) updates are not locked, and
+    concurrent writers can drop each other's latest result.
+    """
+
+    def __init__(self, path: str = DEFAULT_STRATEGY_FILE):
+        """
+        Initialize the registry.
+
+        Args:
+            path: JSON file holding the registry
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._refresh()
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Identify the saved version of the file; every save replaces its inode."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self) -> None:
+        """Reload the records if the file was saved since they were read."""
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            self._records = self._load()
+            self._stamp = stamp
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on the registry across processes."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".lock", 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable strategy registry {self.path}: {str(e)}")
+            return {}
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._records, f)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save strategy registry: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def best_engine(self, fingerprint: Optional[str], candidates: List[str]) -> Optional[str]:
+        """
+        Return the engine with the best average score for a layout.
+
+        Args:
+            fingerprint: Layout fingerprint
+            candidates: Engine names the caller can run
+
+        Returns:
+            Engine name, or None if the layout has not been seen
+        """
+        if not fingerprint:
+            return None
+        with self._lock:
+            self._refresh()
+            records = self._records.get(fingerprint, {})
+            known = [(records[name]['score'], name) for name in candidates if name in records]
+        if not known:
+            return None
+        return max(known)[1]
+
+    def order_engines(self, fingerprint: Optional[str], engines: List[str]) -> List[str]:
+        """Return ``engines`` with the best known engine for the layout first."""
+        best = self.best_engine(fingerprint, engines)
+        if best is None:
+            return list(engines)
+        return [best] + [name for name in engines if name != best]
+
+    def record(self, fingerprint: Optional[str], engine: str, score: float) -> None:
+        """
+        Record the result an engine produced for a layout.
+
+        Args:
+            fingerprint: Layout fingerprint
+            engine: Engine name
+            score: Quality score of the engine's tables
+        """
+        if not fingerprint:
+            return
+        with self._lock, self._file_lock():
+            # Start from what other processes have saved
+            self._refresh()
+            stats = self._records.setdefault(fingerprint, {}).setdefault(engine, {'runs': 0, 'score': 0.0})
+            stats['runs'] += 1
+            # Running average of the scores
+            stats['score'] += (score - stats['score']) / stats['runs']
+            self._save()
+            self._stamp = self._file_stamp()
+
+
+_registry: Optional[StrategyRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_strategy_registry() -> StrategyRegistry:
+    """Return the process-wide strategy registry, creating it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = StrategyRegistry()
+        return _registry
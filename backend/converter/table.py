@@ -0,0 +1,205 @@
+"""
+FileFlip Columnar Table
+-----------------------
+Compact in-memory representation of an extracted table. Cells are held
+once, as one NumPy array per column; records, previews and DataFrames are
+built on demand. Columns can carry their inferred type and parsed values,
+which the typed exporters (XLSX, Parquet, Arrow, Sage) use.
+"""
+
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import logging
+
+try:
+    import pyarrow as pa
+except ImportError:  # Optional, only needed for Parquet/Arrow output
+    pa = None
+
+from .column_types import AMOUNT, DATE, INTEGER, TypedColumn, infer_column
+
+logger = logging.getLogger(__name__)
+
+ARROW_AVAILABLE = pa is not None
+
+
+def _arrow_array(array: np.ndarray, typed: TypedColumn) -> 'pa.Array':
+    """
+    Convert a column to an Arrow array of its inferred type.
+
+    Dates become date32, amounts float64 and integers int64 columns, with
+    blanks as nulls; text columns stay strings.
+    """
+    if array.dtype != object:
+        return pa.array(array)
+    if typed.kind == DATE:
+        return pa.array(typed.values.astype('datetime64[D]'), mask=np.isnat(typed.values), type=pa.date32())
+    if typed.kind in (AMOUNT, INTEGER):
+        missing = np.isnan(typed.values)
+        if typed.kind == INTEGER:
+            return pa.array(np.nan_to_num(typed.values).astype(np.int64), mask=missing, type=pa.int64())
+        return pa.array(typed.values, mask=missing, type=pa.float64())
+    text = pd.Series(array, dtype=object).fillna('').astype(str).str.strip()
+    return pa.array(text.to_numpy(), type=pa.string())
+
+
+def column_cells(array: Optional[np.ndarray], start: int, stop: int) -> List[Any]:
+    """
+    Return a slice of a column as plain Python values for writing out.
+
+    Missing values (NaN, or a column the table doesn't have) become None.
+    """
+    if array is None:
+        return [None] * (stop - start)
+    values = array[start:stop]
+    if values.dtype.kind == 'f':
+        values = np.where(np.isnan(values), None, values)
+    return values.tolist()
+
+
+class ColumnarTable:
+    """
+    An extracted table stored column by column.
+
+    Text columns are object arrays that share the cell strings with the
+    DataFrame they came from; numeric columns keep their NumPy dtype.
+    Slicing returns views, so skipping rows doesn't copy any cells.
+
+    The cells keep their text as extracted; ``types`` holds the inferred
+    type and parsed values of each column, when known.
+    """
+
+    def __init__(self, columns: List[str], arrays: List[np.ndarray], types: Optional[Dict[str, TypedColumn]] = None):
+        """
+        Initialize the table.
+
+        Args:
+            columns: Column names
+            arrays: One 1-D array per column, all the same length
+            types: Inferred column types by column name
+        """
+        if len(columns) != len(arrays):
+            raise ValueError(f"Got {len(columns)} column names for {len(arrays)} columns")
+        if len({len(array) for array in arrays}) > 1:
+            raise ValueError("All columns must have the same length")
+        self.columns = list(columns)
+        self.arrays = list(arrays)
+        self.types = dict(types or {})
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, types: Optional[Dict[str, TypedColumn]] = None) -> 'ColumnarTable':
+        """Build a table from a DataFrame, keeping its column dtypes."""
+        return cls(
+            [str(col) for col in df.columns],
+            [df.iloc[:, i].to_numpy() for i in range(df.shape[1])],
+            types
+        )
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> 'ColumnarTable':
+        """Build a table from a list of row dictionaries."""
+        return cls.from_dataframe(pd.DataFrame(records))
+
+    @classmethod
+    def concat(cls, tables: List['ColumnarTable']) -> 'ColumnarTable':
+        """
+        Stack tables vertically.
+
+        Columns are matched by name; cells missing from a table are left
+        empty. Column types are not carried over, they are inferred again
+        when needed.
+        """
+        columns: List[str] = []
+        for table in tables:
+            columns.extend(col for col in table.columns if col not in columns)
+
+        arrays = []
+        for col in columns:
+            parts = []
+            for table in tables:
+                if col in table.columns:
+                    parts.append(table.column(col).astype(object))
+                else:
+                    parts.append(np.full(table.num_rows, '', dtype=object))
+            arrays.append(np.concatenate(parts) if parts else np.empty(0, dtype=object))
+        return cls(columns, arrays)
+
+    @property
+    def num_rows(self) -> int:
+        return len(self.arrays[0]) if self.arrays else 0
+
+    @property
+    def num_columns(self) -> int:
+        return len(self.columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the cells, in bytes."""
+        total = 0
+        for array in self.arrays:
+            total += array.nbytes
+            if array.dtype == object:
+                total += sum(sys.getsizeof(value) for value in array)
+        return total + sum(typed.nbytes for typed in self.types.values())
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the array holding a column."""
+        return self.arrays[self.columns.index(name)]
+
+    def slice(self, start: int = 0, stop: Optional[int] = None) -> 'ColumnarTable':
+        """Return the rows from ``start`` to ``stop`` as a table of views."""
+        return ColumnarTable(
+            self.columns,
+            [array[start:stop] for array in self.arrays],
+            {col: typed.slice(start, stop) for col, typed in self.types.items()}
+        )
+
+    def column_type(self, name: str) -> TypedColumn:
+        """
+        Return the inferred type of a column.
+
+        Columns of tables built without inference are inferred on first
+        use and the result kept.
+        """
+        if name not in self.types:
+            self.types[name] = infer_column(self.column(name))
+        return self.types[name]
+
+    def iter_rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[tuple]:
+        """Yield rows as tuples of plain Python values."""
+        return zip(*(array[start:stop].tolist() for array in self.arrays))
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return rows as dictionaries keyed by column name."""
+        return [dict(zip(self.columns, row)) for row in self.iter_rows(start, stop)]
+
+    def preview(self, rows: int = 5) -> List[Dict[str, Any]]:
+        """Return the first few rows as dictionaries."""
+        return self.records(0, rows)
+
+    def to_arrow(self) -> 'pa.Table':
+        """
+        Build an Arrow table with typed columns.
+
+        Raises:
+            RuntimeError: If pyarrow is not installed
+        """
+        if pa is None:
+            raise RuntimeError("pyarrow is required for Parquet and Arrow output")
+        return pa.Table.from_arrays(
+            [_arrow_array(array, self.column_type(col)) for col, array in zip(self.columns, self.arrays)],
+            names=self.columns
+        )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Build a DataFrame over the table's columns."""
+        # Build positionally so duplicate column names survive
+        df = pd.DataFrame(dict(enumerate(self.arrays)), copy=False)
+        df.columns = self.columns
+        return df
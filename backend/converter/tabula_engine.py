@@ -0,0 +1,342 @@
+"""
+FileFlip Tabula Engine
+----------------------
+Keeps a small pool of long-lived worker processes, each with a warm JVM,
+so tabula extraction does not pay JVM startup on every call.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# JVM worker processes of the process-wide engine
+DEFAULT_TABULA_WORKERS = int(os.environ.get("FILEFLIP_TABULA_WORKERS", 2))
+
+
+class TabulaWorkerError(RuntimeError):
+    """Raised when a tabula worker crashes or times out."""
+
+
+class TabulaTimeout(TabulaWorkerError):
+    """Raised when a tabula request runs past its timeout."""
+
+
+class TabulaCancelled(RuntimeError):
+    """Raised when a caller cancels a tabula request in flight."""
+
+
+def _start_jvm() -> None:
+    """Start the JVM in this process the same way tabula-py does on first use."""
+    try:
+        from tabula import io as tabula_io
+        from tabula.backend import TabulaVm
+
+        if tabula_io._tabula_vm is None:
+            tabula_io._tabula_vm = TabulaVm(
+                java_options=tabula_io._build_java_options(),
+                silent=True
+            )
+    except Exception as e:
+        # tabula falls back to starting the JVM lazily on the first call
+        logger.warning(f"Could not pre-start the tabula JVM: {str(e)}")
+
+
+def _worker_main(conn) -> None:
+    """Serve tabula requests from the parent process until told to stop."""
+    import tabula
+
+    _start_jvm()
+    handlers = {
+        'ping': lambda: True,
+        'read_pdf': tabula.read_pdf,
+    }
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        method, args, kwargs = message
+        try:
+            conn.send(('ok', handlers[method](*args, **kwargs)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {str(e)}"))
+
+
+class _TabulaWorker:
+    """A single worker process and the pipe used to talk to it."""
+
+    def __init__(self, index: int, context):
+        self.index = index
+        self.context = context
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+        self.start()
+
+    def start(self) -> None:
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_worker_main,
+            args=(child_conn,),
+            name=f"tabula-worker-{self.index}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=5)
+        self.kill()
+
+    def kill(self) -> None:
+        """Kill the worker outright, for when it is busy inside the JVM."""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def restart(self, graceful: bool = True) -> None:
+        """
+        Replace the worker process.
+
+        A busy worker won't read the stop message until its JVM call
+        returns, so cancelled and timed-out workers are killed at once
+        rather than stopped gracefully.
+        """
+        if graceful:
+            self.stop()
+        else:
+            self.kill()
+        self.restarts += 1
+        self.start()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def call(
+        self,
+        method: str,
+        args: tuple,
+        kwargs: dict,
+        timeout: Optional[float],
+        cancel: Optional[threading.Event] = None
+    ) -> Any:
+        """
+        Send a request to the worker and wait for its reply.
+
+        If ``cancel`` is set while waiting, the worker is killed and
+        restarted, since a JVM call cannot be interrupted in place.
+        """
+        try:
+            self.conn.send((method, args, kwargs))
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self.conn.poll(0.1):
+                if cancel is not None and cancel.is_set():
+                    logger.info(f"Tabula worker {self.index} cancelled, restarting")
+                    self.restart(graceful=False)
+                    raise TabulaCancelled("tabula request cancelled")
+                if deadline is not None and time.monotonic() > deadline:
+                    logger.error(f"Tabula worker {self.index} timed out after {timeout}s, restarting")
+                    self.restart(graceful=False)
+                    raise TabulaTimeout(f"tabula worker timed out after {timeout}s")
+            status, payload = self.conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            logger.error(f"Tabula worker {self.index} crashed, restarting: {str(e)}")
+            self.restart()
+            raise TabulaWorkerError(f"tabula worker crashed: {str(e)}")
+
+        if status == 'error':
+            raise RuntimeError(payload)
+        return payload
+
+
+class TabulaEngine:
+    """
+    A pool of warm tabula JVM workers behind a request queue.
+
+    Callers block until a worker is free, so the number of concurrent JVM
+    extractions never exceeds the pool size. Crashed or hung workers are
+    restarted; requests that crashed a worker are retried once on the
+    fresh worker.
+    """
+
+    def __init__(self, workers: int = DEFAULT_TABULA_WORKERS, request_timeout: float = 300, health_check_interval: float = 30):
+        """
+        Initialize the tabula engine.
+
+        Args:
+            workers: Number of JVM worker processes
+            request_timeout: Seconds before a single extraction is abandoned
+            health_check_interval: Seconds between health checks of idle workers
+        """
+        self.workers = workers
+        self.request_timeout = request_timeout
+        self.health_check_interval = health_check_interval
+        self._context = multiprocessing.get_context('spawn')
+        self._workers: List[_TabulaWorker] = []
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._monitor = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        """Start the worker processes and the health-check thread."""
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.workers):
+                worker = _TabulaWorker(i, self._context)
+                self._workers.append(worker)
+                self._idle.put(worker)
+
+            self._stop_event.clear()
+            self._monitor = threading.Thread(target=self._monitor_loop, name="tabula-health", daemon=True)
+            self._monitor.start()
+        logger.info(f"Started tabula engine with {self.workers} workers")
+
+    def shutdown(self) -> None:
+        """Stop the health-check thread and all worker processes."""
+        with self._lock:
+            self._stop_event.set()
+            for worker in self._workers:
+                worker.stop()
+            self._workers = []
+            self._idle = queue.Queue()
+
+    def read_pdf(
+        self,
+        pdf_path: str,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        **kwargs
+    ) -> List[pd.DataFrame]:
+        """
+        Extract tables with tabula on a warm worker.
+
+        Args:
+            pdf_path: Path to the PDF file
+            timeout: Seconds before the request is abandoned (default:
+                the engine's request_timeout)
+            cancel: Event that abandons the request when set
+            **kwargs: Options passed through to ``tabula.read_pdf``
+
+        Returns:
+            List of pandas DataFrames, as returned by ``tabula.read_pdf``
+        """
+        if not self.started:
+            self.start()
+
+        timeout = timeout or self.request_timeout
+        worker = self._idle.get()
+        try:
+            try:
+                return worker.call('read_pdf', (pdf_path,), kwargs, timeout, cancel)
+            except TabulaTimeout:
+                raise
+            except TabulaWorkerError:
+                # The worker crashed and has been restarted, give the request one more go
+                return worker.call('read_pdf', (pdf_path,), kwargs, timeout, cancel)
+        finally:
+            self._idle.put(worker)
+
+    def health_check(self, timeout: float = 10) -> Dict[str, Any]:
+        """
+        Ping every idle worker and restart any that are dead or unresponsive.
+
+        Busy workers are left alone; a crash during a request is detected
+        and handled by the request itself.
+
+        Returns:
+            Dictionary with worker counts and restart totals
+        """
+        checked = []
+        while True:
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+        for worker in checked:
+            try:
+                if worker.is_alive():
+                    worker.call('ping', (), {}, timeout)
+                else:
+                    logger.warning(f"Tabula worker {worker.index} is not running, restarting")
+                    worker.restart()
+            except TabulaWorkerError as e:
+                # call() has already restarted the worker
+                logger.warning(f"Tabula worker {worker.index} failed health check: {str(e)}")
+            finally:
+                self._idle.put(worker)
+
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return worker counts without touching the workers."""
+        return {
+            'workers': len(self._workers),
+            'alive': sum(1 for worker in self._workers if worker.is_alive()),
+            'idle': self._idle.qsize(),
+            'restarts': sum(worker.restarts for worker in self._workers)
+        }
+
+    def _monitor_loop(self) -> None:
+        while not self._stop_event.wait(self.health_check_interval):
+            try:
+                self.health_check()
+            except Exception as e:
+                logger.error(f"Tabula health check failed: {str(e)}")
+
+
+_engine: Optional[TabulaEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_tabula_engine() -> TabulaEngine:
+    """Return the process-wide tabula engine, creating it on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TabulaEngine()
+        return _engine
+
+
+def init_worker_engine(start: bool = True) -> None:
+    """
+    Set up the tabula engine of a conversion worker process.
+
+    A conversion worker runs one job at a time, so its engine gets a
+    single JVM worker, started here so no job pays JVM startup. Run as
+    the worker pool's initializer.
+
+    Args:
+        start: Whether to start the JVM now rather than on first use
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TabulaEngine(workers=1)
+        engine = _engine
+    if start:
+        engine.start()
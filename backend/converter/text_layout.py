@@ -0,0 +1,198 @@
+"""
+FileFlip Text-Layout Extraction
+-------------------------------
+Coordinate-based table extraction for digitally generated PDFs with a
+clean text layer. Word boxes are pulled once per page into NumPy arrays;
+column boundaries come from gaps in the horizontal word coverage and rows
+from clustering the word tops.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import logging
+
+from .models import BBox, ExtractedTable
+from .triage import score_page
+
+logger = logging.getLogger(__name__)
+
+# Minimum width (in points) of a vertical gutter between two columns
+MIN_COLUMN_GAP = 8.0
+
+# Share of rows that may cross a gutter (titles, wrapped descriptions)
+GAP_NOISE_RATIO = 0.1
+
+
+def words_to_arrays(words: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Convert pdfplumber word dictionaries into coordinate arrays.
+
+    Args:
+        words: Words as returned by ``page.extract_words()``
+
+    Returns:
+        Dictionary of arrays: x0, x1, top, bottom and text
+    """
+    return {
+        'x0': np.fromiter((w['x0'] for w in words), dtype=float, count=len(words)),
+        'x1': np.fromiter((w['x1'] for w in words), dtype=float, count=len(words)),
+        'top': np.fromiter((w['top'] for w in words), dtype=float, count=len(words)),
+        'bottom': np.fromiter((w['bottom'] for w in words), dtype=float, count=len(words)),
+        'text': np.array([w['text'] for w in words], dtype=object),
+    }
+
+
+def cluster_rows(top: np.ndarray, bottom: np.ndarray) -> np.ndarray:
+    """
+    Assign each word to a text row by clustering the word tops.
+
+    A new row starts wherever the gap to the previous top (in sorted order)
+    exceeds half the median word height.
+
+    Returns:
+        Row index per word, numbered top to bottom
+    """
+    order = np.argsort(top, kind='stable')
+    tolerance = max(1.0, float(np.median(bottom - top)) / 2)
+    breaks = np.diff(top[order]) > tolerance
+    row_sorted = np.concatenate(([0], np.cumsum(breaks)))
+    rows = np.empty_like(row_sorted)
+    rows[order] = row_sorted
+    return rows
+
+
+def find_column_boundaries(x0: np.ndarray, x1: np.ndarray, rows: np.ndarray, min_gap: float = MIN_COLUMN_GAP) -> np.ndarray:
+    """
+    Find column boundaries from gaps in the horizontal word coverage.
+
+    Coverage is counted per point along the x axis as the number of rows
+    with a word over that point. Runs where at most GAP_NOISE_RATIO of
+    the rows are covered, and that are at least ``min_gap`` wide, are
+    gutters; the boundary is the middle of each gutter.
+
+    Returns:
+        Sorted x positions of the column boundaries
+    """
+    end = np.ceil(x1).astype(int)
+    width = max(int(end.max()), 0) + 2
+    # Words may start slightly off the page; negative indices would wrap
+    # around to the far end of the profile
+    start = np.clip(np.floor(x0).astype(int), 0, width)
+    end = np.clip(end, 0, width)
+
+    # Words of one row don't overlap, so the number of words over a point
+    # is the number of rows covering it
+    delta = np.zeros(width + 1, dtype=int)
+    np.add.at(delta, start, 1)
+    np.add.at(delta, end, -1)
+    coverage = np.cumsum(delta)[:width]
+
+    n_rows = int(rows.max()) + 1
+    open_mask = coverage <= n_rows * GAP_NOISE_RATIO
+    # Only gutters between the first and last covered point count
+    covered = np.flatnonzero(coverage > 0)
+    if len(covered) == 0:
+        return np.array([])
+    open_mask[:covered[0]] = False
+    open_mask[covered[-1] + 1:] = False
+
+    edges = np.diff(open_mask.astype(int))
+    gap_starts = np.flatnonzero(edges == 1) + 1
+    gap_ends = np.flatnonzero(edges == -1) + 1
+    widths = gap_ends - gap_starts
+    keep = widths >= min_gap
+    return (gap_starts[keep] + gap_ends[keep]) / 2.0
+
+
+def table_from_words(words: List[Dict[str, Any]], min_gap: float = MIN_COLUMN_GAP) -> Optional[pd.DataFrame]:
+    """
+    Build a table from the words of a page.
+
+    Args:
+        words: Words as returned by ``page.extract_words()``
+        min_gap: Minimum gutter width between columns, in points
+
+    Returns:
+        A DataFrame with the first multi-column row as header, or None if
+        the page does not look tabular
+    """
+    found = _locate_table(words, min_gap)
+    return found[0] if found else None
+
+
+def _locate_table(words: List[Dict[str, Any]], min_gap: float = MIN_COLUMN_GAP) -> Optional[Tuple[pd.DataFrame, BBox]]:
+    """Build a table from the words of a page, with the bounding box of its rows."""
+    if len(words) < 4:
+        return None
+
+    arrays = words_to_arrays(words)
+    rows = cluster_rows(arrays['top'], arrays['bottom'])
+    boundaries = find_column_boundaries(arrays['x0'], arrays['x1'], rows, min_gap)
+    if len(boundaries) == 0:
+        return None
+
+    centers = (arrays['x0'] + arrays['x1']) / 2
+    cols = np.searchsorted(boundaries, centers)
+    n_rows = int(rows.max()) + 1
+    n_cols = len(boundaries) + 1
+
+    # Join the words of each cell in reading order
+    order = np.lexsort((arrays['x0'], cols, rows))
+    cell_ids = rows[order] * n_cols + cols[order]
+    unique_cells, first = np.unique(cell_ids, return_index=True)
+    texts = np.split(arrays['text'][order], first[1:])
+    grid = np.full(n_rows * n_cols, '', dtype=object)
+    grid[unique_cells] = [' '.join(t) for t in texts]
+    grid = grid.reshape(n_rows, n_cols)
+
+    # Keep rows that span at least two columns (drops letterhead and notes)
+    filled = (grid != '').sum(axis=1)
+    table_rows = np.flatnonzero(filled >= 2)
+    if len(table_rows) < 2:
+        return None
+
+    # The first row that fills at least half the columns is the header
+    header_candidates = table_rows[filled[table_rows] >= n_cols / 2]
+    header_row = header_candidates[0] if len(header_candidates) else table_rows[0]
+    body = grid[table_rows[table_rows > header_row]]
+    if len(body) == 0:
+        return None
+
+    header = [h if h else f"Column_{i}" for i, h in enumerate(grid[header_row])]
+    in_table = np.isin(rows, table_rows[table_rows >= header_row])
+    bbox = (
+        float(arrays['x0'][in_table].min()),
+        float(arrays['top'][in_table].min()),
+        float(arrays['x1'][in_table].max()),
+        float(arrays['bottom'][in_table].max())
+    )
+    return pd.DataFrame(body, columns=header), bbox
+
+
+def tables_from_page(page, triage_threshold: Optional[float] = None) -> List[ExtractedTable]:
+    """
+    Extract the table on a single pdfplumber page from its word boxes.
+
+    Pages scoring below ``triage_threshold`` in the triage pass are skipped;
+    the page's words are extracted once, for the triage and the table.
+    """
+    started = time.perf_counter()
+    words = page.extract_words()
+    if triage_threshold is not None and score_page(page, words)['score'] < triage_threshold:
+        return []
+
+    found = _locate_table(words)
+    if found is None:
+        return []
+    df, bbox = found
+    return [ExtractedTable(
+        df,
+        page.page_number,
+        0,
+        'text_layout',
+        bbox=bbox,
+        extract_seconds=time.perf_counter() - started
+    )]
@@ -0,0 +1,149 @@
+"""
+FileFlip Page Triage
+--------------------
+Cheap pre-pass that scores each page for how likely it is to hold a
+table, so the heavy engines only run on candidate pages.
+"""
+
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import pdfplumber
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pages scoring below this are skipped by the heavy engines
+DEFAULT_TRIAGE_THRESHOLD = 0.3
+
+
+def score_page(page, words: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Score a pdfplumber page for "tableness".
+
+    The score combines three signals from the text layer, all cheap to
+    compute because they need no layout analysis:
+
+    - ruling lines: drawn lines and thin rectangles
+    - column gutters: share of text rows split by wide gaps between words
+    - character density: share of characters that are digits
+
+    Pages without a text layer get the threshold score, so scanned pages
+    are still handed to the engines (and OCR).
+
+    Args:
+        page: A pdfplumber page
+        words: The page's words, if the caller has already extracted them
+            (default: extracted here)
+
+    Returns:
+        Dictionary with the page number, the score and its components
+    """
+    chars = page.chars
+    if not chars:
+        return {
+            'page': page.page_number,
+            'score': DEFAULT_TRIAGE_THRESHOLD,
+            'chars': 0,
+            'ruling_lines': 0,
+            'columnar_rows': 0.0,
+            'digit_ratio': 0.0,
+            'text_layer': False
+        }
+
+    thin_rects = [r for r in page.rects if min(r['width'], r['height']) < 2]
+    ruling_lines = len(page.lines) + len(thin_rects)
+
+    # Share of text rows split into columns by wide gaps; prose rows are
+    # separated by single spaces, table rows by column gutters
+    rows = defaultdict(list)
+    for w in (page.extract_words() if words is None else words):
+        rows[round(w['top'])].append(w)
+    columnar_rows = 0
+    for row in rows.values():
+        row.sort(key=lambda w: w['x0'])
+        wide_gaps = sum(
+            1 for prev, cur in zip(row, row[1:])
+            if cur['x0'] - prev['x1'] > cur['bottom'] - cur['top']
+        )
+        if wide_gaps >= 2:
+            columnar_rows += 1
+    columnar_ratio = columnar_rows / len(rows) if rows else 0.0
+
+    digits = sum(1 for c in chars if c['text'].isdigit())
+    digit_ratio = digits / len(chars)
+
+    score = (
+        0.35 * min(1.0, ruling_lines / 10)
+        + 0.35 * min(1.0, columnar_ratio / 0.5)
+        + 0.30 * min(1.0, digit_ratio / 0.2)
+    )
+
+    return {
+        'page': page.page_number,
+        'score': round(score, 3),
+        'chars': len(chars),
+        'ruling_lines': ruling_lines,
+        'columnar_rows': round(columnar_ratio, 3),
+        'digit_ratio': round(digit_ratio, 3),
+        'text_layer': True
+    }
+
+
+def score_pages(pdf_source: Union[str, Any], on_page: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Score every page of a PDF.
+
+    Args:
+        pdf_source: Path to the PDF file or a file-like object
+        on_page: Called after each page with the number of pages scored
+            so far and the page count
+
+    Returns:
+        List of page scores, in page order
+    """
+    with pdfplumber.open(pdf_source) as pdf:
+        scores = []
+        for page in pdf.pages:
+            scores.append(score_page(page))
+            # Release the page's parsed objects straight away
+            page.flush_cache()
+            if on_page is not None:
+                on_page(len(scores), len(pdf.pages))
+    return scores
+
+
+def candidate_pages(scores: List[Dict[str, Any]], threshold: float = DEFAULT_TRIAGE_THRESHOLD) -> List[int]:
+    """Return the numbers of the pages that score at or above the threshold."""
+    return [s['page'] for s in scores if s['score'] >= threshold]
+
+
+def parse_pages(pages: str) -> set:
+    """Expand a page spec such as ``1,3-5`` into a set of page numbers."""
+    numbers = set()
+    for part in pages.split(','):
+        if '-' in part:
+            start, end = part.split('-')
+            numbers.update(range(int(start), int(end) + 1))
+        elif part:
+            numbers.add(int(part))
+    return numbers
+
+
+def format_pages(pages: List[int]) -> str:
+    """
+    Format page numbers as a tabula/camelot page spec, e.g. ``1,3-5``.
+
+    Args:
+        pages: Sorted 1-based page numbers
+
+    Returns:
+        Page spec string
+    """
+    ranges = []
+    for page in pages:
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
@@ -0,0 +1,142 @@
+"""
+FileFlip Streaming XLSX Writer
+------------------------------
+Writes tables to XLSX in xlsxwriter's constant-memory mode: each row is
+flushed to disk as soon as it is written, so memory stays flat however
+long the sheet. Column widths are tracked while the rows go out instead
+of in a second pass over the data. Columns with an inferred type are
+written as numbers and dates instead of text.
+"""
+
+from typing import Any, BinaryIO, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import logging
+
+from .column_types import DATE, TEXT
+from .table import ColumnarTable, column_cells
+
+logger = logging.getLogger(__name__)
+
+# Rows written per chunk
+XLSX_CHUNK_ROWS = 1000
+
+# Column widths are capped at this many characters
+MAX_COLUMN_WIDTH = 50
+
+# Display format of date cells
+DATE_FORMAT = 'dd/mm/yyyy'
+
+
+def _max_width(cells: List[Any]) -> int:
+    """Return the widest rendered cell of a chunk, in characters."""
+    widths = [len(str(cell)) for cell in cells if cell is not None]
+    return max(widths) if widths else 0
+
+
+class StreamingXlsxWriter:
+    """
+    Write-only XLSX workbook with one sheet per table.
+
+    Usage::
+
+        with StreamingXlsxWriter(output) as writer:
+            writer.add_table(table, "Table 1")
+    """
+
+    def __init__(self, output: Union[str, BinaryIO], chunk_rows: int = XLSX_CHUNK_ROWS, max_width: int = MAX_COLUMN_WIDTH):
+        """
+        Initialize the writer.
+
+        Args:
+            output: Path or binary file object to write the workbook to
+            chunk_rows: Rows converted to Python values per chunk
+            max_width: Cap for the column widths, in characters
+        """
+        import xlsxwriter
+
+        self.chunk_rows = chunk_rows
+        self.max_width = max_width
+        self.workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        self._header_format = self.workbook.add_format({'bold': True})
+        self._date_format = self.workbook.add_format({'num_format': DATE_FORMAT})
+
+    def add_table(self, table: Union[ColumnarTable, pd.DataFrame], sheet_name: str, include_header: bool = True) -> None:
+        """
+        Write a table to a new sheet.
+
+        Columns the table has a type for are written as typed values;
+        column widths follow the extracted text.
+
+        Args:
+            table: The table to write
+            sheet_name: Name of the sheet (Excel allows 31 characters)
+            include_header: Whether to write the column names as the first row
+        """
+        if isinstance(table, pd.DataFrame):
+            table = ColumnarTable.from_dataframe(table)
+
+        worksheet = self.workbook.add_worksheet(sheet_name[:31])
+        widths = np.zeros(table.num_columns, dtype=int)
+        row = 0
+        if include_header:
+            worksheet.write_row(0, 0, table.columns, self._header_format)
+            widths = np.array([len(col) for col in table.columns], dtype=int)
+            row = 1
+
+        typed = [table.types.get(col) for col in table.columns]
+        typed = [t if t is not None and t.kind != TEXT else None for t in typed]
+        date_columns = [i for i, t in enumerate(typed) if t is not None and t.kind == DATE]
+
+        # Rows must be written in order in constant-memory mode
+        for start in range(0, table.num_rows, self.chunk_rows):
+            stop = min(start + self.chunk_rows, table.num_rows)
+            columns = [column_cells(array, start, stop) for array in table.arrays]
+            for i, cells in enumerate(columns):
+                widths[i] = max(widths[i], _max_width(cells))
+                if typed[i] is not None:
+                    columns[i] = typed[i].cells(start, stop)
+            for values in zip(*columns):
+                if date_columns:
+                    # Dates need a number format to display as dates
+                    values = list(values)
+                    for i in date_columns:
+                        if values[i] is not None:
+                            worksheet.write_datetime(row, i, values[i], self._date_format)
+                            values[i] = None
+                worksheet.write_row(row, 0, values)
+                row += 1
+
+        # Column settings are only written out when the workbook closes
+        for i, width in enumerate(widths):
+            worksheet.set_column(i, i, min(int(width) + 2, self.max_width))
+
+    def close(self) -> None:
+        """Finish the workbook."""
+        self.workbook.close()
+
+    def __enter__(self) -> 'StreamingXlsxWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_xlsx(
+    tables: List[Union[ColumnarTable, pd.DataFrame]],
+    output: Union[str, BinaryIO],
+    sheet_names: Optional[List[str]] = None
+) -> None:
+    """
+    Write tables to an XLSX workbook, one sheet per table.
+
+    Args:
+        tables: Tables to write
+        output: Path or binary file object to write the workbook to
+        sheet_names: Sheet names (default: "Table 1", "Table 2", ...)
+    """
+    sheet_names = sheet_names or [f"Table {i + 1}" for i in range(len(tables))]
+    with StreamingXlsxWriter(output) as writer:
+        for table, sheet_name in zip(tables, sheet_names):
+            writer.add_table(table, sheet_name)
@@ -0,0 +1,124 @@
+# backend/tests/test_api.py
+import io
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+import api
+from converter import job_queue
+from converter.cache import ExtractionCache
+from converter.job_queue import ConversionQueue
+from converter.pdf_converter import PDFExtractor
+from converter.registry import Registry
+from converter.store import DocumentStore
+
+def table_pdf(rows):
+    """Build a one-page PDF holding a ruled table of ``rows``."""
+    ops = []
+    for r, row in enumerate(rows):
+        for c, text in enumerate(row):
+            x, y = 72 + c * 120, 700 - r * 20
+            ops.append(f"{x} {y} 120 20 re S")
+            ops.append(f"BT /F1 10 Tf {x + 4} {y + 6} Td ({text}) Tj ET")
+    stream = "\n".join(ops)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode())
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+def statement(amount):
+    return table_pdf([["Date", "Amount"], ["01/02", amount], ["02/02", "2.50"]])
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, 'document_store', DocumentStore(directory=str(tmp_path / 'store')))
+    monkeypatch.setattr(api, 'registry', Registry(str(tmp_path / 'registry.db')))
+    monkeypatch.setattr(api, 'pdf_extractor', PDFExtractor(max_workers=1, cache=ExtractionCache(str(tmp_path / 'cache'))))
+    return TestClient(api.app)
+
+@pytest.fixture
+def conversions(monkeypatch):
+    conversions = ConversionQueue(workers=1, max_depth=2, warm_tabula=False)
+    monkeypatch.setattr(job_queue, '_queue', conversions)
+    yield conversions
+    conversions.shutdown(timeout=0)
+
+def test_same_name_uploads_keep_their_own_tables(client):
+    responses = [
+        client.post('/api/upload', files={'file': ('statement.pdf', statement(amount))}, data={'method': 'pdfplumber'})
+        for amount in ('1.50', '9.99')
+    ]
+    assert [response.status_code for response in responses] == [200, 200]
+    file_ids = [response.headers['X-File-ID'] for response in responses]
+    assert file_ids[0] != file_ids[1]
+
+    for response, file_id, amount in zip(responses, file_ids, ('1.50', '9.99')):
+        preview = response.json()[0]
+        assert preview['file_id'] == file_id
+        converted = client.post(f"/api/convert/{preview['table_id']}", data={'format': 'csv'})
+        assert converted.status_code == 200 and amount in converted.text
+        merged = client.post('/api/batch-convert', data={'file_id': file_id, 'format': 'csv'})
+        assert merged.status_code == 200 and amount in merged.text
+
+def test_streamed_upload_is_stored_under_its_file_id(client):
+    response = client.post('/api/upload/stream', files={'file': ('statement.pdf', statement('1.50'))}, data={'method': 'pdfplumber'})
+    assert response.status_code == 200
+    file_id = response.headers['X-File-ID']
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['file_id'] for line in lines] == [file_id]
+    assert api.registry.get_document(file_id)['table_count'] == 1
+    assert client.get(f"/api/files/{file_id}").json()['filename'] == 'statement.pdf'
+
+def test_batch_upload_merges_every_file(client, conversions):
+    files = [
+        ('files', ('march.pdf', statement('1.50'))),
+        ('files', ('april.pdf', statement('9.99'))),
+        ('files', ('notes.pdf', b'%PDF-1.4 not really a PDF')),
+    ]
+    response = client.post('/api/upload/batch', files=files, data={'method': 'pdfplumber'})
+    assert response.status_code == 200
+    batch = response.json()
+    results = {result['filename']: result for result in batch['files']}
+    assert [len(results[name]['tables']) for name in ('march.pdf', 'april.pdf')] == [1, 1]
+    assert results['notes.pdf']['error']
+
+    merged = client.post('/api/batch-convert', data={'file_id': batch['batch_id'], 'format': 'csv'})
+    assert merged.status_code == 200
+    assert '1.50' in merged.text and '9.99' in merged.text
+
+def test_batch_upload_limits(client, conversions, monkeypatch):
+    monkeypatch.setattr(api, 'MAX_BATCH_FILES', 1)
+    files = [('files', (f"{month}.pdf", statement('1.50'))) for month in ('march', 'april')]
+    response = client.post('/api/upload/batch', files=files)
+    assert response.status_code == 400
+
+    # Every file turned away by a full queue
+    started = threading.Event()
+    conversions.submit('busy', time.sleep, 2, on_start=lambda job: started.set())
+    assert started.wait(30)
+    conversions.submit('waiting-1', time.sleep, 0)
+    conversions.submit('waiting-2', time.sleep, 0)
+    response = client.post('/api/upload/batch', files=files[:1])
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
@@ -0,0 +1,164 @@
+# backend/tests/test_app.py
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+
+import cv2
+import pytest
+import pytesseract
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+from converter import job_queue, pdf_converter
+from converter.cache import ExtractionCache
+from converter.job_queue import ConversionQueue
+from converter.registry import Registry
+
+# app.py imports PDFConverter from converter.pdf_converter, where
+# tidy_project.py moves pdf-converter-backend.py; load it from the repo root
+if not hasattr(pdf_converter, 'PDFConverter'):
+    _path = os.path.join(os.path.dirname(__file__), '..', '..', 'pdf-converter-backend.py')
+    _spec = importlib.util.spec_from_file_location('pdf_converter_backend', _path)
+    _backend = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(_backend)
+    pdf_converter.PDFConverter = _backend.PDFConverter
+
+import app
+
+def test_outputs_are_named_after_the_upload(tmp_path):
+    assert app.safe_filename('../../March 2024: statement.pdf') == 'March 2024_ statement.pdf'
+    assert app.safe_filename('C:\\Users\\me\\statement.pdf') == 'statement.pdf'
+    assert app.safe_filename('..') == 'document.pdf'
+
+    session = app.PDFConverter().open_session(str(tmp_path / 'tmpab12cd'), pdf_hash='abc', filename='statement.pdf')
+    assert session._prepare_output(str(tmp_path)) == (str(tmp_path), 'statement')
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'registry', Registry(str(tmp_path / 'registry.db')))
+    return TestClient(app.app)
+
+@pytest.fixture
+def busy_queue(monkeypatch):
+    """A conversion queue whose only worker is busy, so submitted jobs wait."""
+    conversions = ConversionQueue(workers=1, max_depth=1, warm_tabula=False)
+    monkeypatch.setattr(job_queue, '_queue', conversions)
+    started = threading.Event()
+    conversions.submit('busy', time.sleep, 2, on_start=lambda job: started.set())
+    assert started.wait(30)
+    yield conversions
+    # Waiting jobs are dropped, none reaches a worker
+    conversions.shutdown(timeout=0)
+
+def convert(client, output_format='csv'):
+    return client.post('/api/convert', files={'file': ('statement.pdf', b'%PDF-1.4 statement')}, data={'output_format': output_format})
+
+def test_full_queue_answers_503_with_retry_after(client, busy_queue):
+    busy_queue.submit('waiting', time.sleep, 0)
+    response = convert(client)
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    assert app.registry.stats()['jobs'] == {}
+
+def test_job_events_stream_progress_until_the_job_finishes(client, monkeypatch):
+    monkeypatch.setattr(app, 'EVENTS_POLL_INTERVAL', 0.01)
+    app.registry.create_job('job-1', status='processing')
+    app.registry.set_progress('job-1', {'stage': 'triage', 'pages_done': 1, 'pages_total': 4})
+
+    def work():
+        time.sleep(0.2)
+        app.registry.set_progress('job-1', {'stage': 'extracting', 'engine': 'pdfplumber', 'pages_done': 4, 'pages_total': 4, 'tables_found': 2})
+        time.sleep(0.2)
+        app.registry.update_job('job-1', status='completed', engine='pdfplumber', output_files=['/tmp/statement.csv'])
+
+    worker = threading.Thread(target=work)
+    worker.start()
+    response = client.get('/api/job/job-1/events')
+    worker.join()
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+
+    events = []
+    for block in response.text.strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    assert [event for event, _ in events] == ['progress', 'progress', 'status']
+    assert [data['pages_done'] for _, data in events[:2]] == [1, 4]
+    assert events[2][1]['status'] == 'completed' and events[2][1]['output_files'] == ['/tmp/statement.csv']
+
+    assert client.get('/api/job/missing/events').status_code == 404
+
+def test_identical_conversions_share_one_job(client, busy_queue):
+    first = convert(client, 'csv,xlsx')
+    second = convert(client, 'xlsx,csv')
+    assert [response.status_code for response in (first, second)] == [200, 200]
+    assert second.json()['job_id'] == first.json()['job_id']
+    assert (first.json()['deduplicated'], second.json()['deduplicated']) == (False, True)
+    assert app.conversion_key('abc', ['csv'], False, False) != app.conversion_key('abc', ['csv', 'xlsx'], False, False)
+
+    # The job stays for the other submission until both have deleted it
+    job_id = first.json()['job_id']
+    assert 'detached' in client.delete(f"/api/job/{job_id}").json()['message']
+    assert client.get(f"/api/job/{job_id}").json()['status'] == 'queued'
+    assert client.delete(f"/api/job/{job_id}").status_code == 200
+    assert client.get(f"/api/job/{job_id}").status_code == 404
+
+def test_submission_attached_while_the_queue_is_full_keeps_the_job(client, busy_queue, monkeypatch):
+    busy_queue.submit('waiting', time.sleep, 0)
+    key = app.conversion_key(hashlib.sha256(b'%PDF-1.4 statement').hexdigest(), ['csv'], False, False)
+    attached = []
+    submit = busy_queue.submit
+
+    def attach_then_submit(*args, **kwargs):
+        # An identical submission attaches between the claim and the submit
+        attached.append(app.registry.claim_job(key, 'other', reuse=app.reusable_job))
+        return submit(*args, **kwargs)
+
+    monkeypatch.setattr(busy_queue, 'submit', attach_then_submit)
+    assert convert(client).status_code == 503
+    job = client.get(f"/api/job/{attached[0]['job_id']}")
+    assert job.status_code == 200 and job.json()['status'] == 'failed'
+
+def blank_pdf(path):
+    """Write a one-page PDF with nothing on it."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200] >>",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+    return str(path)
+
+def test_ocr_images_go_in_a_directory_of_their_own(tmp_path, monkeypatch):
+    pdf_path = blank_pdf(tmp_path / 'scan.pdf')
+    monkeypatch.chdir(tmp_path)
+    images = []
+    monkeypatch.setattr(cv2, 'imread', lambda path: images.append(path))
+
+    def ocr(image, lang):
+        raise RuntimeError("tesseract crashed")
+
+    monkeypatch.setattr(pytesseract, 'image_to_string', ocr)
+    converter = app.PDFConverter(ocr_enabled=True, cache=ExtractionCache(str(tmp_path / 'cache')), triage_threshold=None)
+    monkeypatch.setattr(converter, 'extract_tables_with_tabula', lambda path: [])
+    monkeypatch.setattr(converter, 'extract_tables_with_camelot', lambda path: [])
+    assert converter.parse_pdf_to_dataframes(pdf_path) == []
+
+    assert len(images) == 1
+    assert os.path.dirname(images[0]) != str(tmp_path)
+    # Removed along with its directory, even though OCR failed
+    assert not os.path.exists(os.path.dirname(images[0]))
+    assert sorted(os.listdir(tmp_path)) == ['cache', 'scan.pdf']
@@ -0,0 +1,27 @@
+# backend/tests/test_cache.py
+import os
+from converter.cache import ExtractionCache, content_hash
+
+def test_cache_round_trip_and_counters(tmp_path):
+    cache = ExtractionCache(directory=str(tmp_path), max_bytes=1024 * 1024)
+    key = cache.make_key(content_hash(b'%PDF-1.4'), {'engine': ['tabula'], 'ocr': False})
+    assert cache.get(key) is None
+    cache.put(key, [{'page': 1}])
+    assert cache.get(key) == [{'page': 1}]
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+def test_cache_key_depends_on_config():
+    pdf_hash = content_hash(b'%PDF-1.4')
+    assert ExtractionCache.make_key(pdf_hash, {'ocr': False}) != ExtractionCache.make_key(pdf_hash, {'ocr': True})
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ExtractionCache(directory=str(tmp_path), max_bytes=3500)
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, b'x' * 1000)
+        os.utime(os.path.join(str(tmp_path), f"{key}.pkl"), (i, i))
+    cache.get('a')
+    cache.put('d', b'x' * 1000)
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.stats()['evictions'] >= 1
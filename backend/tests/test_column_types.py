@@ -0,0 +1,38 @@
+# backend/tests/test_column_types.py
+import numpy as np
+import pandas as pd
+
+from converter.column_types import AMOUNT, DATE, INTEGER, TEXT, fill_missing, infer_column, parse_amounts
+
+def column(*cells):
+    return np.array(cells, dtype=object)
+
+def test_parse_amounts_handles_za_formats():
+    cells = pd.Series(['R1 234,56', '(1,234.50)', '27666.00 CR', '100.00 DR', 'R-5', '1.234,56', '12,34', 'n/a'])
+    values = parse_amounts(cells).tolist()
+    assert values[:7] == [1234.56, -1234.5, 27666.0, -100.0, -5.0, 1234.56, 12.34]
+    assert np.isnan(values[7])
+
+def test_infer_column_detects_dates_with_format():
+    typed = infer_column(column('01/03/2024', '', '15/03/2024'))
+    assert (typed.kind, typed.format) == (DATE, '%d/%m/%Y')
+    assert typed.cells(0, 3)[1] is None
+    assert typed.cells(0, 3)[2].day == 15
+
+def test_infer_column_amounts_integers_and_text():
+    assert infer_column(column('1,000.00 CR', '5.00 DR', None)).kind == AMOUNT
+    assert infer_column(column('12', '34')).kind == INTEGER
+    # Leading zeros are codes, one stray label keeps the whole column text
+    assert infer_column(column('001', '002')).kind == TEXT
+    assert infer_column(column('Balance brought forward', '1,000.00')).kind == TEXT
+
+def test_long_numbers_stay_text():
+    typed = infer_column(column('123456789012345', '-42', None))
+    assert typed.kind == INTEGER
+    assert typed.cells(0, 3) == [123456789012345, -42, None]
+    assert infer_column(column('4000123412341234', '12')).kind == TEXT
+    assert infer_column(column('12 345 678 901 234,56', '1.00')).kind == TEXT
+
+def test_fill_missing_fills_by_column_dtype():
+    df = pd.DataFrame({'Amount': [1.5, np.nan], 'Description': ['Fee', None]})
+    assert fill_missing(df).values.tolist() == [[1.5, 'Fee'], [0.0, '']]
@@ -0,0 +1,40 @@
+# backend/tests/test_data_converter.py
+import numpy as np
+import pandas as pd
+
+from converter.pdf_converter import DataConverter
+from converter.table import ColumnarTable
+
+def test_iter_csv_streams_in_chunks():
+    table = ColumnarTable.from_dataframe(pd.DataFrame({'Ref': [f"r{i}" for i in range(25)], 'Amount': np.arange(25.0)}))
+    chunks = list(DataConverter().iter_csv(table, chunk_rows=10))
+    assert len(chunks) == 3
+    assert ''.join(chunks) == table.to_dataframe().to_csv(index=False)
+
+def test_iter_csv_tables_unions_columns():
+    first = ColumnarTable.from_records([{'Date': '01/03', 'Amount': '1,00'}])
+    second = ColumnarTable.from_dataframe(pd.DataFrame({'Date': ['02/03'], 'Fee': [np.nan]}))
+    csv_text = ''.join(DataConverter().iter_csv_tables([first, second], delimiter=';'))
+    assert csv_text == "Date;Amount;Fee\n01/03;1,00;\n02/03;;\n"
+
+def test_to_excel_tables_writes_sheets_and_widths():
+    openpyxl = __import__('openpyxl')
+    first = ColumnarTable.from_records([{'Description': 'Card purchase at a long merchant name', 'Amount': 12.5}])
+    second = ColumnarTable.from_dataframe(pd.DataFrame({'Fee': [np.nan, 3.0]}))
+    workbook = openpyxl.load_workbook(DataConverter().to_excel_tables([first, second]))
+    assert workbook.sheetnames == ['Table 1', 'Table 2']
+    sheet = workbook['Table 1']
+    assert [cell.value for cell in sheet[2]] == ['Card purchase at a long merchant name', 12.5]
+    assert sheet.column_dimensions['A'].width > sheet.column_dimensions['B'].width
+    assert [cell.value for cell in workbook['Table 2']['A']] == ['Fee', None, 3]
+
+def test_sage_format_uses_inferred_types():
+    openpyxl = __import__('openpyxl')
+    table = ColumnarTable.from_records([
+        {'Date': '2024/03/02', 'Description': 'Card purchase', 'Amount': '1 250,00 DR'},
+        {'Date': '2024/03/03', 'Description': 'Salary', 'Amount': 'R15,000.00'},
+    ])
+    sheet = openpyxl.load_workbook(DataConverter().to_sage_format(table))['Sage Import']
+    assert [[cell.value for cell in row] for row in sheet.iter_rows(min_row=2)] == [
+        ['Card purchase', '02/03/2024', -1250], ['Salary', '03/03/2024', 15000]
+    ]
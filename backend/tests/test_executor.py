@@ -0,0 +1,110 @@
+# backend/tests/test_executor.py
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from converter.executor import ExecutorBusy, ExtractionExecutor, ExtractionTimeout
+from converter.ingest import IngestedFile
+
+def slow_thread_id(seconds):
+    time.sleep(seconds)
+    return threading.get_ident()
+
+def test_calls_run_off_the_loop_and_waits_are_recorded():
+    executor = ExtractionExecutor(workers=1, max_pending=1)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        first = asyncio.ensure_future(executor.run(slow_thread_id, 0.2))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(executor.run(sum, [1, 2]))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorBusy):
+            await executor.run(sum, [])
+        assert await first != loop_thread
+        assert await second == 3
+
+    asyncio.run(main())
+    stats = executor.stats()
+    assert (stats['completed'], stats['rejected'], stats['pending']) == (2, 1, 0)
+    assert stats['max_wait_seconds'] >= 0.1
+    executor.shutdown()
+
+def test_timeout_frees_the_caller():
+    executor = ExtractionExecutor(workers=1, max_pending=0)
+    release = threading.Event()
+
+    async def main():
+        with pytest.raises(ExtractionTimeout):
+            await executor.run(release.wait, 5, timeout=0.05)
+
+    asyncio.run(main())
+    assert executor.stats()['timeouts'] == 1
+    release.set()
+    executor.shutdown()
+
+def test_timed_out_call_keeps_its_upload_open(tmp_path):
+    executor = ExtractionExecutor(workers=1, max_pending=0)
+    upload = IngestedFile('a.pdf', spool_bytes=0, directory=str(tmp_path))
+    upload.write(b'%PDF-1.4 statement')
+    upload.finish()
+    path = upload.path()
+    release = threading.Event()
+    read = []
+
+    def read_later():
+        release.wait(5)
+        with upload.open() as view:
+            read.append(view.read())
+
+    async def main():
+        with pytest.raises(ExtractionTimeout):
+            await executor.run(read_later, timeout=0.05, on_done=upload.retain().release)
+        upload.close()
+
+    asyncio.run(main())
+    assert os.path.exists(path)
+    release.set()
+    deadline = time.monotonic() + 5
+    while os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert read == [b'%PDF-1.4 statement']
+    assert not os.path.exists(path)
+    executor.shutdown()
+
+def test_iteration_holds_one_slot_and_finishes_after_the_step_in_flight():
+    executor = ExtractionExecutor(workers=1, max_pending=0)
+    release = threading.Event()
+    closed = threading.Event()
+    done = threading.Event()
+
+    def pages():
+        try:
+            yield 1
+            yield 2
+            release.wait(5)
+            yield 3
+        finally:
+            closed.set()
+
+    async def main():
+        assert [item async for item in executor.iterate(iter([1, 2]))] == [1, 2]
+        items = []
+        with pytest.raises(ExtractionTimeout):
+            async for item in executor.iterate(pages(), timeout=0.2, on_done=done.set):
+                items.append(item)
+                # The iteration holds the only slot
+                with pytest.raises(ExecutorBusy):
+                    await executor.run(sum, [])
+        assert items == [1, 2]
+
+    asyncio.run(main())
+    assert not closed.is_set() and not done.is_set()
+    release.set()
+    assert done.wait(5) and closed.is_set()
+    stats = executor.stats()
+    assert (stats['completed'], stats['timeouts'], stats['rejected']) == (2, 1, 2)
+    executor.shutdown()
@@ -0,0 +1,39 @@
+# backend/tests/test_ingest.py
+import hashlib
+
+import pytest
+
+from converter.ingest import IngestedFile, UploadTooLarge
+
+def test_hash_and_size_computed_while_writing(tmp_path):
+    upload = IngestedFile('a.pdf', spool_bytes=10, directory=str(tmp_path))
+    upload.write(b'%PDF-1.4 ')
+    assert not upload.on_disk
+    upload.write(b'rest of the file')
+    upload.finish()
+    assert upload.on_disk
+    assert upload.size == 25
+    assert upload.sha256 == hashlib.sha256(b'%PDF-1.4 rest of the file').hexdigest()
+    with upload.open() as first, upload.open() as second:
+        assert first.read(4) == b'%PDF'
+        assert second.read() == b'%PDF-1.4 rest of the file'
+    path = upload.path()
+    upload.close()
+    assert not (tmp_path / path).exists()
+
+def test_size_limit_is_enforced_while_streaming(tmp_path):
+    upload = IngestedFile('a.pdf', max_bytes=8, directory=str(tmp_path))
+    upload.write(b'1234')
+    with pytest.raises(UploadTooLarge):
+        upload.write(b'56789')
+
+def test_from_file_wraps_without_taking_ownership(tmp_path):
+    path = tmp_path / 'statement.pdf'
+    path.write_bytes(b'%PDF-1.4 statement')
+    upload = IngestedFile.from_file(str(path))
+    assert upload.on_disk and upload.path() == str(path)
+    assert upload.sha256 == hashlib.sha256(b'%PDF-1.4 statement').hexdigest()
+    with upload.open() as view:
+        assert view.read() == b'%PDF-1.4 statement'
+    upload.close()
+    assert path.exists()
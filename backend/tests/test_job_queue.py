@@ -0,0 +1,58 @@
+# backend/tests/test_job_queue.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from converter.job_queue import ConversionQueue, QueueFull
+from converter.tabula_engine import get_tabula_engine
+
+def worker_engine():
+    engine = get_tabula_engine()
+    return engine.workers, engine.started
+
+def test_full_queue_turns_jobs_away_and_timings_are_recorded():
+    conversions = ConversionQueue(workers=1, max_depth=1, warm_tabula=False)
+    started = threading.Event()
+    finished = threading.Event()
+    try:
+        first = conversions.submit('a', time.sleep, 0.5, on_start=lambda job: started.set())
+        assert started.wait(30)
+        second = conversions.submit('b', int, 'not a number', on_done=lambda job: finished.set())
+        with pytest.raises(QueueFull) as full:
+            conversions.submit('c', time.sleep, 0)
+        assert full.value.retry_after >= 1
+
+        assert finished.wait(30)
+        assert first.error is None and first.run_seconds >= 0.5
+        assert second.wait_seconds >= 0.4
+        assert isinstance(second.error, ValueError)
+
+        stats = conversions.stats()
+        assert (stats['completed'], stats['failed'], stats['rejected']) == (1, 1, 1)
+        assert stats['waiting'] == 0 and stats['running'] == 0
+    finally:
+        conversions.shutdown()
+
+def test_run_awaits_the_result():
+    conversions = ConversionQueue(workers=1, max_depth=2, warm_tabula=False)
+
+    async def main():
+        total = await conversions.run('sum', sum, [1, 2, 3])
+        with pytest.raises(ValueError):
+            await conversions.run('bad', int, 'x')
+        return total
+
+    try:
+        assert asyncio.run(main()) == 6
+    finally:
+        conversions.shutdown()
+
+def test_workers_warm_one_jvm_each_within_the_limit():
+    assert ConversionQueue(workers=8, max_jvms=3).workers == 3
+    conversions = ConversionQueue(workers=1, max_depth=1)
+    try:
+        assert asyncio.run(conversions.run('engine', worker_engine)) == (1, True)
+    finally:
+        conversions.shutdown()
@@ -0,0 +1,39 @@
+# backend/tests/test_models.py
+import json
+import pickle
+
+import pandas as pd
+
+from converter.models import ExtractedDocument, ExtractedTable, column_stats, make_table_id
+from converter.table import ColumnarTable
+
+def test_column_stats_counts_and_widths():
+    df = pd.DataFrame({'Date': ['01/03', '', '03/03'], 'Amount': [1.5, None, 1234.25]})
+    stats = {s.name: s for s in column_stats(df)}
+    assert stats['Date'].non_empty == 2
+    assert stats['Date'].max_width == 5
+    assert stats['Amount'].non_empty == 2
+    assert stats['Amount'].max_width == len('1234.25')
+
+def test_extracted_table_is_slotted_and_serializes():
+    df = pd.DataFrame({'Ref': ['a', 'b']})
+    table = ExtractedTable(
+        ColumnarTable.from_dataframe(df), 2, 0, 'pdfplumber',
+        bbox=(10.0, 20.0, 300.0, 400.0), table_id='doc_p2_t0', column_stats=column_stats(df)
+    )
+    assert not hasattr(table, '__dict__')
+    metadata = json.loads(json.dumps(table.to_dict()))
+    assert metadata['rows'] == 2 and metadata['columns'] == 1
+    assert metadata['bbox'] == [10.0, 20.0, 300.0, 400.0]
+    assert metadata['column_stats'] == [{'name': 'Ref', 'non_empty': 2, 'max_width': 1, 'kind': 'text', 'format': None}]
+    assert table.preview(1) == [{'Ref': 'a'}]
+
+    document = pickle.loads(pickle.dumps(ExtractedDocument('doc.pdf', [table], sha256='abc')))
+    assert document.engine == 'pdfplumber'
+    assert document.table('doc_p2_t0').data.records() == [{'Ref': 'a'}, {'Ref': 'b'}]
+
+def test_table_ids_derive_from_content():
+    first = make_table_id('a' * 64, 'pdfplumber', 2, 0)
+    assert first == make_table_id('a' * 64, 'pdfplumber', 2, 0)
+    assert first != make_table_id('b' * 64, 'pdfplumber', 2, 0)
+    assert first != make_table_id('a' * 64, 'text_layout', 2, 0)
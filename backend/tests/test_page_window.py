@@ -0,0 +1,58 @@
+# backend/tests/test_page_window.py
+import io
+import pickle
+
+import pytest
+
+from converter.page_window import MemoryCeilingExceeded, RssGuard, current_rss, iter_page_windows, page_count
+
+def blank_pdf(pages):
+    """Build a PDF of blank pages."""
+    kids = ' '.join(f"{3 + i} 0 R" for i in range(pages))
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>",
+    ] + ["<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>"] * pages
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode())
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    out.seek(0)
+    return out
+
+def test_windows_yield_every_page_in_order():
+    pdf = blank_pdf(7)
+    assert page_count(pdf) == 7
+    assert [page.page_number for page in iter_page_windows(pdf, window=3)] == list(range(1, 8))
+    assert [page.page_number for page in iter_page_windows(pdf, window=2, page_numbers=[6, 2, 4])] == [2, 4, 6]
+
+def test_guard_enforces_the_ceiling():
+    assert current_rss() > 0
+    assert not RssGuard(0).over()
+    RssGuard(2**50).check()
+    guard = RssGuard(2**20)
+    ballast = b'x' * 32 * 2**20
+    with pytest.raises(MemoryCeilingExceeded):
+        guard.check()
+    with pytest.raises(MemoryCeilingExceeded):
+        list(iter_page_windows(blank_pdf(3), window=1, guard=guard))
+    del ballast
+
+def test_guard_ignores_memory_held_before_the_document():
+    ballast = b'x' * 32 * 2**20
+    assert current_rss() > 2**20
+    guard = RssGuard(2**20)
+    guard.check()
+    assert [page.page_number for page in iter_page_windows(blank_pdf(3), window=1, guard=guard)] == [1, 2, 3]
+    del ballast
+
+def test_ceiling_error_survives_pickling():
+    error = pickle.loads(pickle.dumps(MemoryCeilingExceeded(3 * 2**20, 2**20)))
+    assert (error.rss_bytes, error.max_rss_bytes) == (3 * 2**20, 2**20)
@@ -0,0 +1,23 @@
+# backend/tests/test_parallel.py
+from converter import parallel
+from converter.parallel import shard_pages
+
+def test_shard_pages_covers_every_page_in_order():
+    shards = shard_pages(101, max_workers=4)
+    pages = [page for shard in shards for page in shard]
+    assert pages == list(range(1, 102))
+    assert len(shards) <= 16
+
+def test_shard_pages_small_document():
+    assert shard_pages(3, max_workers=8) == [[1], [2], [3]]
+    assert shard_pages(0, max_workers=8) == []
+
+def test_documents_share_one_spawned_pool():
+    pool = parallel._get_pool(2)
+    try:
+        assert parallel._get_pool(4) is pool
+        assert pool._mp_context.get_start_method() == 'spawn'
+    finally:
+        parallel.shutdown_page_pool()
+    assert parallel._get_pool(2) is not pool
+    parallel.shutdown_page_pool()
@@ -0,0 +1,35 @@
+# backend/tests/test_progress.py
+from converter.progress import ProgressReporter
+
+def test_page_updates_are_throttled_but_stages_are_not():
+    published = []
+    progress = ProgressReporter(published.append, interval=60)
+    progress.start_stage('extracting', pages_total=3, engine='tabula')
+    progress.pages()
+    progress.tables(2)
+    assert [p['pages_done'] for p in published] == [0]
+
+    progress.pages(2)
+    assert published[-1]['pages_done'] == 3
+    assert published[-1]['tables_found'] == 2
+    progress.start_stage('writing')
+    assert (published[-1]['stage'], published[-1]['engine'], published[-1]['pages_total']) == ('writing', None, None)
+
+def test_set_pages_learns_the_total():
+    published = []
+    progress = ProgressReporter(published.append, interval=60)
+    progress.start_stage('triage')
+    progress.set_pages(1, 2)
+    progress.set_pages(2, 2)
+    assert (published[-1]['pages_done'], published[-1]['pages_total']) == (2, 2)
+    assert published[-1]['eta_seconds'] == 0
+
+def test_publish_errors_do_not_fail_the_conversion():
+    def publish(snapshot):
+        raise RuntimeError('registry is locked')
+
+    progress = ProgressReporter(publish)
+    progress.start_stage('ocr', pages_total=1)
+    progress.pages()
+    assert progress.snapshot()['pages_done'] == 1
+    assert ProgressReporter().snapshot()['eta_seconds'] is None
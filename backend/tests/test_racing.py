@@ -0,0 +1,59 @@
+# backend/tests/test_racing.py
+import multiprocessing
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from converter import racing, tabula_engine
+from converter.tabula_engine import TabulaCancelled, _TabulaWorker
+
+def busy_worker(conn):
+    """Stands in for a tabula worker stuck in a long JVM call."""
+    while conn.recv() is not None:
+        time.sleep(30)
+
+def test_first_good_result_wins(monkeypatch):
+    def process_leg(engine, pdf_path, pages, timeout, cancel):
+        if engine == 'pdfplumber':
+            return [pd.DataFrame({'a': ['1'], 'b': ['2'], 'c': ['3']})]
+        # The slow engine waits until it is cancelled
+        cancel.wait(5)
+        raise racing._Cancelled()
+
+    monkeypatch.setattr(racing, '_run_process_leg', process_leg)
+    result = racing.race_engines('statement.pdf', engines=('pdfplumber', 'camelot'))
+    assert result['engine'] == 'pdfplumber'
+    assert result['results']['pdfplumber']['status'] == 'won'
+    assert result['results']['camelot']['status'] == 'cancelled'
+
+def test_winner_does_not_wait_for_the_losers(monkeypatch):
+    def process_leg(engine, pdf_path, pages, timeout, cancel):
+        if engine == 'pdfplumber':
+            return [pd.DataFrame({'a': ['1'], 'b': ['2'], 'c': ['3']})]
+        # Killing this engine takes a while
+        cancel.wait(5)
+        time.sleep(2)
+        raise racing._Cancelled()
+
+    monkeypatch.setattr(racing, '_run_process_leg', process_leg)
+    started = time.monotonic()
+    result = racing.race_engines('statement.pdf', engines=('pdfplumber', 'camelot'))
+    assert time.monotonic() - started < 1
+    assert result['engine'] == 'pdfplumber'
+    assert result['results']['camelot']['status'] == 'cancelled'
+
+def test_cancelled_tabula_worker_is_killed_at_once(monkeypatch):
+    monkeypatch.setattr(tabula_engine, '_worker_main', busy_worker)
+    worker = _TabulaWorker(0, multiprocessing.get_context('spawn'))
+    cancel = threading.Event()
+    threading.Timer(0.5, cancel.set).start()
+    started = time.monotonic()
+    try:
+        with pytest.raises(TabulaCancelled):
+            worker.call('read_pdf', ('statement.pdf',), {}, None, cancel)
+        assert time.monotonic() - started < 3
+        assert worker.restarts == 1 and worker.is_alive()
+    finally:
+        worker.stop()
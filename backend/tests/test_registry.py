@@ -0,0 +1,114 @@
+# backend/tests/test_registry.py
+import sqlite3
+
+import pandas as pd
+
+from converter.models import ExtractedDocument, ExtractedTable
+from converter.registry import Registry
+from converter.table import ColumnarTable
+
+def test_jobs_are_shared_between_connections(tmp_path):
+    path = str(tmp_path / 'registry.db')
+    Registry(path).create_job('job-1')
+    other = Registry(path)
+    assert other.update_job('job-1', status='completed', output_files=['/tmp/a.csv'], run_seconds=1.5)
+    job = Registry(path).get_job('job-1')
+    assert (job['status'], job['output_files'], job['run_seconds']) == ('completed', ['/tmp/a.csv'], 1.5)
+    assert other.delete_job('job-1')
+    assert not other.update_job('job-1', status='failed')
+    assert other.get_job('job-1') is None
+
+def test_documents_and_tables_are_indexed(tmp_path):
+    registry = Registry(str(tmp_path / 'registry.db'))
+    df = pd.DataFrame({'Amount': ['1.00', '2.00']})
+    tables = [
+        ExtractedTable(ColumnarTable.from_dataframe(df), page, 0, 'pdfplumber', table_id=f"s_p{page}_t0", filename='s.pdf')
+        for page in (1, 2)
+    ]
+    registry.put_document('temp_s.pdf', ExtractedDocument('s.pdf', tables, 'abc'))
+    registry.put_document('temp_s.pdf', ExtractedDocument('s.pdf', tables[:1], 'abc'))
+
+    document = registry.get_document('temp_s.pdf')
+    assert document['sha256'] == 'abc'
+    assert [table['table_id'] for table in document['tables']] == ['s_p1_t0']
+    assert registry.find_table('s_p1_t0')['doc_id'] == 'temp_s.pdf'
+    assert registry.find_table('s_p2_t0') is None
+
+    assert registry.delete_document('temp_s.pdf')
+    assert registry.find_table('s_p1_t0') is None
+    assert registry.stats()['tables'] == 0
+
+def test_progress_follows_its_job(tmp_path):
+    registry = Registry(str(tmp_path / 'registry.db'))
+    registry.set_progress('missing', {'stage': 'triage'})
+    assert registry.get_progress('missing') is None
+
+    registry.create_job('job-1')
+    registry.set_progress('job-1', {'stage': 'triage', 'pages_done': 1, 'pages_total': 4})
+    registry.set_progress('job-1', {'stage': 'extracting', 'engine': 'tabula', 'pages_done': 2, 'pages_total': 4, 'tables_found': 3})
+    progress = Registry(registry.path).get_progress('job-1')
+    assert (progress['stage'], progress['engine'], progress['pages_done'], progress['tables_found']) == ('extracting', 'tabula', 2, 3)
+
+    registry.delete_job('job-1')
+    assert registry.get_progress('job-1') is None
+
+def test_identical_jobs_share_one_claim(tmp_path):
+    registry = Registry(str(tmp_path / 'registry.db'))
+    not_failed = lambda job: job['status'] != 'failed'
+    assert registry.claim_job('key', 'job-1', reuse=not_failed)['job_id'] == 'job-1'
+    assert Registry(registry.path).claim_job('key', 'job-2', reuse=not_failed)['job_id'] == 'job-1'
+    assert registry.get_job('job-2') is None
+
+    registry.update_job('job-1', status='failed')
+    assert registry.claim_job('key', 'job-3', reuse=not_failed)['job_id'] == 'job-3'
+    registry.delete_job('job-3')
+    assert registry.claim_job('key', 'job-4', reuse=not_failed)['status'] == 'queued'
+
+def test_shared_jobs_outlive_all_but_the_last_release(tmp_path):
+    registry = Registry(str(tmp_path / 'registry.db'))
+    reuse = lambda job: True
+    registry.claim_job('key', 'job-1', reuse=reuse)
+    assert registry.claim_job('key', 'job-2', reuse=reuse)['refs'] == 2
+    assert registry.release_job('job-1') == 1
+    assert registry.get_job('job-1')['status'] == 'queued'
+    assert registry.release_job('job-1') == 0
+    assert registry.get_job('job-1') is None
+    assert registry.release_job('job-1') is None
+
+def test_jobs_of_an_older_registry_get_a_reference(tmp_path):
+    path = str(tmp_path / 'registry.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (job_id TEXT PRIMARY KEY, status TEXT NOT NULL, output_files TEXT, "
+            "error_message TEXT, engine TEXT, queue_wait_seconds REAL, run_seconds REAL, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO jobs (job_id, status, created_at, updated_at) VALUES ('job-1', 'completed', 0, 0)")
+    conn.close()
+    assert Registry(path).release_job('job-1') == 0
+
+def test_rows_past_the_ttl_are_pruned_with_their_outputs(tmp_path):
+    registry = Registry(str(tmp_path / 'registry.db'), ttl=60)
+    output = tmp_path / 'job-1' / 'statement.csv'
+    output.parent.mkdir()
+    output.write_text('Amount\n1.00\n')
+    registry.create_job('job-1', status='completed', output_files=[str(output)])
+    registry.claim_job('key', 'job-2', reuse=lambda job: True)
+    registry.put_document('doc-1', ExtractedDocument('s.pdf', [], 'abc'))
+    with sqlite3.connect(registry.path) as conn:
+        conn.execute("UPDATE jobs SET updated_at = 0 WHERE job_id = 'job-1'")
+        conn.execute("UPDATE documents SET created_at = 0")
+    conn.close()
+
+    assert [job['job_id'] for job in registry.prune()] == ['job-1']
+    assert registry.get_job('job-1') is None and registry.get_document('doc-1') is None
+    assert not output.parent.exists()
+    assert registry.get_job('job-2') is not None
+
+    # Throttled until the interval has passed, unless forced
+    registry.create_job('job-3')
+    with sqlite3.connect(registry.path) as conn:
+        conn.execute("UPDATE jobs SET updated_at = 0")
+    conn.close()
+    assert registry.prune() == []
+    assert len(registry.prune(force=True)) == 2
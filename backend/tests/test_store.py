@@ -0,0 +1,56 @@
+# backend/tests/test_store.py
+import time
+
+import pandas as pd
+
+from converter.models import ExtractedDocument, ExtractedTable
+from converter.store import DocumentStore
+from converter.table import ColumnarTable
+
+def make_document(name, rows=200):
+    df = pd.DataFrame({'Description': [f"{name} line {i}" for i in range(rows)]})
+    table = ExtractedTable(ColumnarTable.from_dataframe(df), 1, 0, 'pdfplumber', table_id=f"{name}_p1_t0")
+    return ExtractedDocument(f"{name}.pdf", [table])
+
+def test_cold_documents_spill_and_load_back(tmp_path):
+    store = DocumentStore(max_memory_bytes=30000, directory=str(tmp_path))
+    for name in ('a', 'b', 'c'):
+        store.put(name, make_document(name))
+    stats = store.stats()
+    assert stats['spilled'] >= 1
+    assert stats['memory_bytes'] <= 30000
+
+    document, table = store.find_table('a_p1_t0')
+    assert document.filename == 'a.pdf'
+    assert table.data.records(0, 1) == [{'Description': 'a line 0'}]
+    assert store.stats()['loads'] == 1
+
+def test_disk_budget_evicts_oldest(tmp_path):
+    store = DocumentStore(max_memory_bytes=0, max_disk_bytes=1, directory=str(tmp_path))
+    store.put('a', make_document('a'))
+    assert 'a' not in store
+    assert store.stats()['evictions'] == 1
+
+def test_ttl_expires_unused_documents(tmp_path):
+    store = DocumentStore(ttl=0.05, directory=str(tmp_path))
+    store.put('a', make_document('a'))
+    time.sleep(0.1)
+    assert store.get('a') is None
+    assert store.stats()['expirations'] == 1
+
+def test_table_index_follows_deletes_and_evictions(tmp_path):
+    store = DocumentStore(max_memory_bytes=0, max_disk_bytes=0, directory=str(tmp_path))
+    store.put('a', make_document('a'))
+    # Over the memory budget with spilling disabled, so evicted at once
+    assert store.find_table('a_p1_t0') is None
+    assert store.stats()['tables'] == 0
+
+    store = DocumentStore(directory=str(tmp_path))
+    store.put('first', make_document('same'))
+    store.put('second', make_document('same'))
+    assert store.find_table('same_p1_t0')[0] is store.get('second')
+    store.delete('second')
+    assert store.find_table('same_p1_t0')[0] is store.get('first')
+    store.delete('first')
+    assert store.find_table('same_p1_t0') is None
+    assert store.stats()['tables'] == 0
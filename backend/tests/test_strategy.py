@@ -0,0 +1,30 @@
+# backend/tests/test_strategy.py
+import pandas as pd
+from converter.strategy import StrategyRegistry, score_tables
+
+def test_registry_puts_best_engine_first_and_persists(tmp_path):
+    path = str(tmp_path / "strategies.json")
+    registry = StrategyRegistry(path)
+    registry.record("layout", "pdfplumber", 0.1)
+    registry.record("layout", "text_layout", 0.9)
+    assert registry.order_engines("layout", ["pdfplumber", "text_layout", "tabula"]) == ["text_layout", "pdfplumber", "tabula"]
+    assert StrategyRegistry(path).best_engine("layout", ["pdfplumber", "text_layout"]) == "text_layout"
+    assert registry.order_engines("unknown", ["pdfplumber", "tabula"]) == ["pdfplumber", "tabula"]
+
+def test_score_tables_penalises_sparse_and_narrow_tables():
+    clean = pd.DataFrame({'Date': ['01/03'], 'Description': ['Fee'], 'Amount': ['1.00']})
+    narrow = pd.DataFrame({'Text': ['Dear customer', 'Thank you']})
+    assert score_tables([clean]) == 1.0
+    assert score_tables([narrow]) < 0.5
+    assert score_tables([]) == 0.0
+
+def test_processes_sharing_the_file_keep_each_others_results(tmp_path):
+    path = str(tmp_path / "strategies.json")
+    api_process, worker = StrategyRegistry(path), StrategyRegistry(path)
+    api_process.record("layout", "pdfplumber", 0.2)
+    worker.record("layout", "tabula", 0.9)
+    api_process.record("layout", "pdfplumber", 0.4)
+    assert api_process.best_engine("layout", ["pdfplumber", "tabula"]) == "tabula"
+    assert worker.best_engine("layout", ["pdfplumber"]) == "pdfplumber"
+    records = StrategyRegistry(path)._records["layout"]
+    assert (records["pdfplumber"]["runs"], records["tabula"]["runs"]) == (2, 1)
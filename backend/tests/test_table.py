@@ -0,0 +1,33 @@
+# backend/tests/test_table.py
+import pandas as pd
+import pytest
+
+from converter.table import ColumnarTable
+
+def test_round_trip_keeps_columns_and_values():
+    df = pd.DataFrame({'Date': ['01/02', '02/02'], 'Amount': [1.5, 2.0]})
+    table = ColumnarTable.from_dataframe(df)
+    assert (table.num_rows, table.num_columns) == (2, 2)
+    assert table.column('Amount').dtype == float
+    pd.testing.assert_frame_equal(table.to_dataframe(), df)
+
+def test_records_and_preview_are_lazy_views():
+    table = ColumnarTable(['a', 'b'], [pd.Series(range(10)).to_numpy(), pd.Series(['x'] * 10).to_numpy()])
+    assert table.preview(2) == [{'a': 0, 'b': 'x'}, {'a': 1, 'b': 'x'}]
+    assert table.slice(8).records() == [{'a': 8, 'b': 'x'}, {'a': 9, 'b': 'x'}]
+    assert type(table.records()[0]['a']) is int
+
+def test_concat_fills_missing_columns():
+    first = ColumnarTable.from_records([{'a': '1', 'b': '2'}])
+    second = ColumnarTable.from_records([{'b': '3', 'c': '4'}])
+    combined = ColumnarTable.concat([first, second])
+    assert combined.columns == ['a', 'b', 'c']
+    assert combined.records() == [{'a': '1', 'b': '2', 'c': ''}, {'a': '', 'b': '3', 'c': '4'}]
+
+def test_to_arrow_types_numeric_text_columns():
+    pytest.importorskip('pyarrow')
+    table = ColumnarTable.from_records([{'Amount': '1,000.50', 'Ref': 'A1'}, {'Amount': '', 'Ref': '7'}])
+    arrow_table = table.to_arrow()
+    assert str(arrow_table.schema.field('Amount').type) == 'double'
+    assert str(arrow_table.schema.field('Ref').type) == 'string'
+    assert arrow_table.column('Amount').to_pylist() == [1000.5, None]
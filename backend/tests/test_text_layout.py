@@ -0,0 +1,47 @@
+# backend/tests/test_text_layout.py
+from converter.text_layout import table_from_words, tables_from_page
+
+def word(text, x0, top, width=30, height=8):
+    return {'text': text, 'x0': x0, 'x1': x0 + width, 'top': top, 'bottom': top + height}
+
+def statement_words(first_column_x0=10):
+    words = [word('Statement', 10, 0, width=60)]
+    for i, (date, amount) in enumerate([('Date', 'Amount'), ('01/03', '10.00'), ('02/03', '20.00'), ('03/03', '30.00')]):
+        top = 20 + i * 12
+        words.append(word(date, first_column_x0, top))
+        words.append(word(amount, 120, top))
+    return words
+
+class FakePage:
+    page_number = 1
+    lines = []
+    rects = []
+
+    def __init__(self, words):
+        self.words = words
+        self.chars = [{'text': c} for w in words for c in w['text']]
+        self.word_extractions = 0
+
+    def extract_words(self):
+        self.word_extractions += 1
+        return self.words
+
+def test_table_from_words_splits_columns_and_rows():
+    df = table_from_words(statement_words())
+    assert list(df.columns) == ['Date', 'Amount']
+    assert df['Amount'].tolist() == ['10.00', '20.00', '30.00']
+
+def test_table_from_words_rejects_prose():
+    words = [word(f"w{i}", 10 + i * 32, 0) for i in range(6)]
+    assert table_from_words(words) is None
+
+def test_words_starting_off_the_page():
+    df = table_from_words(statement_words(first_column_x0=-2.5))
+    assert list(df.columns) == ['Date', 'Amount']
+    assert df['Date'].tolist() == ['01/03', '02/03', '03/03']
+
+def test_triage_reuses_the_page_words():
+    page = FakePage(statement_words())
+    tables = tables_from_page(page, triage_threshold=0.1)
+    assert len(tables) == 1 and tables[0].engine == 'text_layout'
+    assert page.word_extractions == 1
@@ -0,0 +1,15 @@
+# backend/tests/test_triage.py
+from converter.triage import candidate_pages, format_pages, parse_pages
+
+def test_candidate_pages_uses_threshold():
+    scores = [{'page': 1, 'score': 0.1}, {'page': 2, 'score': 0.8}, {'page': 3, 'score': 0.3}]
+    assert candidate_pages(scores, threshold=0.3) == [2, 3]
+
+def test_format_pages_collapses_ranges():
+    assert format_pages([1, 2, 3, 5, 7, 8]) == "1-3,5,7-8"
+    assert format_pages([4]) == "4"
+    assert format_pages([]) == ""
+
+def test_parse_pages_expands_ranges():
+    assert parse_pages("1-3,5") == {1, 2, 3, 5}
+    assert format_pages(sorted(parse_pages("7-8,4"))) == "4,7-8"
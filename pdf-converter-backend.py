@@ -1,10 +1,9 @@
 import os
 import tempfile
+import time
 from pathlib import Path
 import pandas as pd
 import numpy as np
-import tabula
-import pdfplumber
 import camelot
 import PyPDF2
 from typing import List, Dict, Any, Optional, Union, Tuple
@@ -12,6 +11,18 @@ import cv2
 import pytesseract
 import logging
 
+from converter.cache import ExtractionCache, content_hash, get_extraction_cache
+from converter.column_types import fill_missing, infer_types
+from converter.models import ExtractedTable
+from converter.page_window import DEFAULT_MAX_RSS_BYTES, DEFAULT_PAGE_WINDOW, MemoryCeilingExceeded, RssGuard, iter_page_windows, page_count
+from converter.progress import ProgressReporter
+from converter.racing import DEFAULT_ENGINES, race_engines
+from converter.strategy import MIN_TABLE_QUALITY, get_strategy_registry, layout_fingerprint, score_tables
+from converter.tabula_engine import get_tabula_engine
+from converter.table import ColumnarTable
+from converter.triage import DEFAULT_TRIAGE_THRESHOLD, candidate_pages, format_pages, parse_pages, score_pages
+from converter.xlsx_writer import write_xlsx
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,60 +32,136 @@ class PDFConverter:
     A class to convert PDF files to CSV or XLSX formats.
     """
     
-    def __init__(self, ocr_enabled: bool = False, ocr_language: str = 'eng'):
+    def __init__(
+        self,
+        ocr_enabled: bool = False,
+        ocr_language: str = 'eng',
+        cache: Optional[ExtractionCache] = None,
+        triage_threshold: Optional[float] = DEFAULT_TRIAGE_THRESHOLD,
+        race: bool = False,
+        engine_timeouts: Optional[Dict[str, float]] = None,
+        page_window: int = DEFAULT_PAGE_WINDOW,
+        max_rss_bytes: int = DEFAULT_MAX_RSS_BYTES,
+        progress: Optional[ProgressReporter] = None
+    ):
         """
         Initialize the PDF converter.
         
         Args:
             ocr_enabled: Whether to use OCR for text extraction
             ocr_language: Language for OCR (default: 'eng')
+            cache: Extraction result cache (default: the shared cache)
+            triage_threshold: Minimum page score for a page to be handed to
+                the table engines (None disables page triage)
+            race: Run the engines concurrently and keep the first good
+                result instead of trying them one after another
+            engine_timeouts: Per-engine time limits in seconds when racing
+            page_window: Pages rendered per opening of the document for OCR,
+                and pages per tabula or camelot call
+            max_rss_bytes: Ceiling on the process's resident memory growth
+                while a document is processed (0 disables it)
+            progress: Receives stage, page and table updates as the
+                document is processed (default: tracked, not published)
         """
         self.ocr_enabled = ocr_enabled
         self.ocr_language = ocr_language
+        self.cache = cache or get_extraction_cache()
+        self.triage_threshold = triage_threshold
+        self.race = race
+        self.engine_timeouts = engine_timeouts
+        self.page_window = page_window
+        self.max_rss_bytes = max_rss_bytes
+        self.progress = progress or ProgressReporter()
+        # Per-page triage scores, by PDF path
+        self.page_scores: Dict[str, List[Dict[str, Any]]] = {}
+        # Engine that produced the tables of the last parse_pdf_to_dataframes call
+        self.last_engine: Optional[str] = None
+    
+    def score_pages(self, pdf_path: str) -> List[Dict[str, Any]]:
+        """
+        Score each page of the PDF for how likely it is to contain a table.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Returns:
+            List of per-page score dictionaries, in page order
+        """
+        if pdf_path not in self.page_scores:
+            self.progress.start_stage('triage')
+            scores = score_pages(pdf_path, on_page=self.progress.set_pages)
+            self.page_scores[pdf_path] = scores
+            logger.info(
+                f"Page triage scores for {os.path.basename(pdf_path)}: "
+                + ", ".join(f"p{s['page']}={s['score']}" for s in scores)
+            )
+        return self.page_scores[pdf_path]
+    
+    def triage_pages(self, pdf_path: str) -> str:
+        """
+        Select the pages worth handing to the table engines.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Returns:
+            Page spec of the candidate pages ('all' if triage is disabled or
+            fails, '' if no page qualifies)
+        """
+        if self.triage_threshold is None:
+            return 'all'
+        
+        try:
+            scores = self.score_pages(pdf_path)
+        except Exception as e:
+            logger.warning(f"Page triage failed, using all pages: {str(e)}")
+            return 'all'
+        
+        pages = candidate_pages(scores, self.triage_threshold)
+        if len(pages) == len(scores):
+            return 'all'
+        return format_pages(pages)
     
-    def detect_tables(self, pdf_path: str) -> List[Dict[str, Any]]:
+    def detect_tables(self, pdf_path: str) -> List[ExtractedTable]:
         """
-        Detect tables in the PDF and return their metadata.
+        Detect tables in the PDF and return them with their metadata.
         
         Args:
             pdf_path: Path to the PDF file
             
         Returns:
-            List of dictionaries containing table metadata
+            List of the detected tables
         """
         tables_info = []
         
+        pages = self.triage_pages(pdf_path)
+        if not pages:
+            logger.info("Page triage found no candidate pages")
+            return tables_info
+        
         # Try with tabula first
         try:
-            tabula_tables = tabula.read_pdf(pdf_path, pages='all', multiple_tables=True)
+            started = time.perf_counter()
+            tabula_tables = get_tabula_engine().read_pdf(pdf_path, pages=pages, multiple_tables=True)
+            seconds = time.perf_counter() - started
             if tabula_tables:
                 for i, table in enumerate(tabula_tables):
                     if not table.empty:
-                        tables_info.append({
-                            'page': i + 1,
-                            'rows': len(table),
-                            'columns': len(table.columns),
-                            'extraction_method': 'tabula',
-                            'preview': table.head(3).to_dict()
-                        })
+                        tables_info.append(ExtractedTable(table, i + 1, i, 'tabula', extract_seconds=seconds))
         except Exception as e:
             logger.warning(f"Tabula extraction failed: {str(e)}")
         
         # Try with camelot if no tables found
         if not tables_info:
             try:
-                camelot_tables = camelot.read_pdf(pdf_path, pages='all')
+                started = time.perf_counter()
+                camelot_tables = camelot.read_pdf(pdf_path, pages=pages)
+                seconds = time.perf_counter() - started
                 if camelot_tables:
                     for i, table in enumerate(camelot_tables):
                         df = table.df
                         if not df.empty:
-                            tables_info.append({
-                                'page': table.page,
-                                'rows': len(df),
-                                'columns': len(df.columns),
-                                'extraction_method': 'camelot',
-                                'preview': df.head(3).to_dict()
-                            })
+                            tables_info.append(ExtractedTable(df, int(table.page), i, 'camelot', extract_seconds=seconds))
             except Exception as e:
                 logger.warning(f"Camelot extraction failed: {str(e)}")
         
@@ -86,54 +173,129 @@ class PDFConverter:
         
         Args:
             pdf_path: Path to the PDF file
-            pages: Pages to extract tables from (default: 'all')
+            pages: Pages to extract tables from (default: 'all', narrowed
+                down by page triage)
             
         Returns:
             List of pandas DataFrames containing extracted tables
         """
+        if pages == 'all':
+            pages = self.triage_pages(pdf_path)
+            if not pages:
+                return []
+        
         try:
-            tables = tabula.read_pdf(
-                pdf_path, 
-                pages=pages, 
-                multiple_tables=True,
-                guess=True,
-                lattice=True,
-                stream=True
-            )
-            # Clean up table headers and data
-            for i, table in enumerate(tables):
-                if not table.empty:
-                    # Clean column names - remove newlines and excess whitespace
-                    table.columns = [str(col).strip().replace('\r', ' ').replace('\n', ' ') for col in table.columns]
-                    
-                    # Fill NaN values with empty strings for text columns
-                    for col in table.columns:
-                        if table[col].dtype == 'object':
-                            table[col] = table[col].fillna('')
-                        else:
-                            table[col] = table[col].fillna(0)
-                    
-                    tables[i] = table
-            
-            return tables
+            chunks = self._page_chunks(pdf_path, pages)
+            self.progress.start_stage('extracting', pages_total=sum(map(len, chunks)), engine='tabula')
+            tables = []
+            for chunk in chunks:
+                found = get_tabula_engine().read_pdf(
+                    pdf_path, 
+                    pages=format_pages(chunk), 
+                    multiple_tables=True,
+                    guess=True,
+                    lattice=True,
+                    stream=True
+                )
+                tables.extend(found)
+                self.progress.pages(len(chunk))
+                self.progress.tables(len(found))
+            return self._clean_tabula_tables(tables)
         except Exception as e:
             logger.error(f"Error extracting tables with tabula: {str(e)}")
             return []
     
+    def _page_chunks(self, pdf_path: str, pages: str) -> List[List[int]]:
+        """
+        Split a page spec into runs of at most ``page_window`` pages, so
+        progress can be reported between engine calls.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            pages: Page spec, or 'all'
+            
+        Returns:
+            Lists of page numbers, in page order
+        """
+        if pages == 'all':
+            numbers = list(range(1, page_count(pdf_path) + 1))
+        else:
+            numbers = sorted(parse_pages(pages))
+        window = max(1, self.page_window)
+        return [numbers[i:i + window] for i in range(0, len(numbers), window)]
+    
+    def _clean_tabula_tables(self, tables: List[pd.DataFrame]) -> List[pd.DataFrame]:
+        """Clean up the headers and empty cells of tables read by tabula."""
+        for i, table in enumerate(tables):
+            if not table.empty:
+                # Clean column names - remove newlines and excess whitespace
+                table.columns = [str(col).strip().replace('\r', ' ').replace('\n', ' ') for col in table.columns]
+                
+                # Fill NaN values, 0 in numeric columns and '' in the others
+                tables[i] = fill_missing(table)
+        
+        return tables
+    
+    def race_engines(self, pdf_path: str, fingerprint: Optional[str] = None) -> List[pd.DataFrame]:
+        """
+        Race the table engines on the candidate pages and keep the winner.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            fingerprint: Layout fingerprint the engine scores are recorded under
+            
+        Returns:
+            List of pandas DataFrames from the winning engine
+        """
+        pages = self.triage_pages(pdf_path)
+        if not pages:
+            return []
+        
+        self.progress.start_stage('racing')
+        race = race_engines(
+            pdf_path,
+            engines=DEFAULT_ENGINES,
+            pages=pages,
+            quality_threshold=MIN_TABLE_QUALITY,
+            timeouts=self.engine_timeouts
+        )
+        registry = get_strategy_registry()
+        for engine, result in race['results'].items():
+            if 'score' in result:
+                registry.record(fingerprint, engine, result['score'])
+        
+        self.last_engine = race['engine']
+        if race['engine'] == 'tabula':
+            return self._clean_tabula_tables(race['tables'])
+        return race['tables']
+    
     def extract_tables_with_camelot(self, pdf_path: str, pages: str = 'all') -> List[pd.DataFrame]:
         """
         Extract tables from PDF using camelot.
         
         Args:
             pdf_path: Path to the PDF file
-            pages: Pages to extract tables from (default: 'all')
+            pages: Pages to extract tables from (default: 'all', narrowed
+                down by page triage)
             
         Returns:
             List of pandas DataFrames containing extracted tables
         """
+        if pages == 'all':
+            pages = self.triage_pages(pdf_path)
+            if not pages:
+                return []
+        
         try:
-            tables = camelot.read_pdf(pdf_path, pages=pages, flavor='lattice')
-            return [table.df for table in tables]
+            chunks = self._page_chunks(pdf_path, pages)
+            self.progress.start_stage('extracting', pages_total=sum(map(len, chunks)), engine='camelot')
+            tables = []
+            for chunk in chunks:
+                found = camelot.read_pdf(pdf_path, pages=format_pages(chunk), flavor='lattice')
+                tables.extend(table.df for table in found)
+                self.progress.pages(len(chunk))
+                self.progress.tables(len(found))
+            return tables
         except Exception as e:
             logger.error(f"Error extracting tables with camelot: {str(e)}")
             return []
@@ -167,38 +329,77 @@ class PDFConverter:
             logger.error(f"Error extracting text with OCR: {str(e)}")
             return {}
     
-    def parse_pdf_to_dataframes(self, pdf_path: str) -> List[pd.DataFrame]:
+    def parse_pdf_to_dataframes(self, pdf_path: str, pdf_hash: Optional[str] = None) -> List[pd.DataFrame]:
         """
         Parse PDF and convert to pandas DataFrames.
         
         Args:
             pdf_path: Path to the PDF file
+            pdf_hash: SHA-256 of the PDF if already known (computed during
+                upload ingestion), saving a re-read of the file
             
         Returns:
             List of pandas DataFrames containing extracted data
         """
-        extracted_tables = []
+        # Reuse the result of an earlier parse of the same document
+        if pdf_hash is None:
+            with open(pdf_path, 'rb') as f:
+                pdf_hash = content_hash(f.read())
+        cache_key = self.cache.make_key(pdf_hash, {
+            'engine': ['tabula', 'camelot', 'ocr'],
+            'ocr': self.ocr_enabled,
+            'language': self.ocr_language,
+            'pages': 'all',
+            'triage': self.triage_threshold,
+            'race': self.race
+        })
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.last_engine = cached['engine']
+            self.progress.start_stage('cached', engine=self.last_engine)
+            self.progress.set_tables(len(cached['tables']))
+            return cached['tables']
         
-        # First try tabula
-        tabula_tables = self.extract_tables_with_tabula(pdf_path)
-        if tabula_tables:
-            extracted_tables.extend(tabula_tables)
+        extracted_tables = []
+        self.last_engine = None
+        registry = get_strategy_registry()
+        fingerprint = layout_fingerprint(pdf_path)
         
-        # If no tables found with tabula, try camelot
-        if not extracted_tables:
-            camelot_tables = self.extract_tables_with_camelot(pdf_path)
-            if camelot_tables:
-                extracted_tables.extend(camelot_tables)
+        if self.race:
+            extracted_tables = self.race_engines(pdf_path, fingerprint)
+        else:
+            # Try tabula, then camelot, unless another engine did better on
+            # this layout before. Stop at the first result that isn't junk.
+            engines = {
+                'tabula': self.extract_tables_with_tabula,
+                'camelot': self.extract_tables_with_camelot
+            }
+            best_score = -1.0
+            for engine in registry.order_engines(fingerprint, list(engines)):
+                tables = engines[engine](pdf_path)
+                score = score_tables(tables) if tables else 0.0
+                registry.record(fingerprint, engine, score)
+                if tables and score > best_score:
+                    extracted_tables, best_score = tables, score
+                    self.last_engine = engine
+                if score >= MIN_TABLE_QUALITY:
+                    break
         
         # If still no tables found and OCR is enabled, try OCR
         if not extracted_tables and self.ocr_enabled:
+            self.last_engine = 'ocr'
             try:
-                # Use pdfplumber to get page images
-                with pdfplumber.open(pdf_path) as pdf:
-                    for i, page in enumerate(pdf.pages):
+                # Use pdfplumber to get page images, a window of pages at a time
+                guard = RssGuard(self.max_rss_bytes)
+                self.progress.start_stage('ocr', pages_total=page_count(pdf_path), engine='ocr')
+                # Page images go in a directory of this call's own, so
+                # conversions running side by side never share an image
+                with tempfile.TemporaryDirectory(prefix="fileflip-ocr-") as image_dir:
+                    for page in iter_page_windows(pdf_path, self.page_window, guard=guard):
                         img = page.to_image()
-                        img_path = f"temp_page_{i}.png"
+                        img_path = os.path.join(image_dir, f"page_{page.page_number - 1}.png")
                         img.save(img_path)
+                        del img
                         
                         # Apply OCR
                         text = pytesseract.image_to_string(
@@ -223,14 +424,44 @@ class PDFConverter:
                             
                             if data:
                                 extracted_tables.append(pd.DataFrame(data, columns=header))
+                                self.progress.tables(1)
                         
                         # Remove temporary image file
                         os.remove(img_path)
+                        self.progress.pages()
+            except MemoryCeilingExceeded:
+                raise
             except Exception as e:
                 logger.error(f"Error during OCR processing: {str(e)}")
         
+        self.progress.set_tables(len(extracted_tables))
+        
+        # Only cache successes, failures may be transient
+        if extracted_tables:
+            self.cache.put(cache_key, {'engine': self.last_engine, 'tables': extracted_tables})
+        
         return extracted_tables
     
+    def open_session(
+        self,
+        pdf_path: str,
+        pdf_hash: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> 'ConversionSession':
+        """
+        Open a conversion session that parses the PDF at most once.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            pdf_hash: SHA-256 of the PDF if already known
+            filename: Name the output files are named after (default: the
+                PDF file's name)
+            
+        Returns:
+            A ConversionSession for the PDF
+        """
+        return ConversionSession(self, pdf_path, pdf_hash, filename)
+    
     def convert_to_csv(self, pdf_path: str, output_dir: str = None) -> List[str]:
         """
         Convert PDF to CSV files.
@@ -242,21 +473,115 @@ class PDFConverter:
         Returns:
             List of paths to the generated CSV files
         """
-        dataframes = self.parse_pdf_to_dataframes(pdf_path)
+        return self.open_session(pdf_path).to_csv(output_dir)
+    
+    def convert_to_xlsx(self, pdf_path: str, output_dir: str = None) -> Optional[str]:
+        """
+        Convert PDF to a single XLSX file with multiple sheets.
         
-        if not dataframes:
-            logger.warning("No tables found in the PDF.")
-            return []
+        Args:
+            pdf_path: Path to the PDF file
+            output_dir: Directory to save output file (default: None, uses current directory)
+            
+        Returns:
+            Path to the generated XLSX file or None if no tables were found
+        """
+        return self.open_session(pdf_path).to_xlsx(output_dir)
+
+
+class ConversionSession:
+    """
+    Parses a PDF once and writes any number of output formats from the
+    same DataFrames.
+    """
+    
+    SUPPORTED_FORMATS = ('csv', 'xlsx')
+    
+    def __init__(
+        self,
+        converter: PDFConverter,
+        pdf_path: str,
+        pdf_hash: Optional[str] = None,
+        filename: Optional[str] = None
+    ):
+        """
+        Initialize the conversion session.
         
-        output_paths = []
-        pdf_filename = os.path.basename(pdf_path)
-        pdf_name = os.path.splitext(pdf_filename)[0]
+        Args:
+            converter: The converter used to parse the PDF
+            pdf_path: Path to the PDF file
+            pdf_hash: SHA-256 of the PDF if already known
+            filename: Name the output files are named after, e.g. the
+                uploaded file's when ``pdf_path`` is a temporary file
+                (default: the PDF file's name)
+        """
+        self.converter = converter
+        self.pdf_path = pdf_path
+        self.pdf_hash = pdf_hash
+        self.filename = filename or os.path.basename(pdf_path)
+        self.engine: Optional[str] = None
+        self._dataframes = None
+        self._tables = None
+    
+    @property
+    def dataframes(self) -> List[pd.DataFrame]:
+        """The tables of the PDF, parsed on first access."""
+        if self._dataframes is None:
+            self._dataframes = self.converter.parse_pdf_to_dataframes(self.pdf_path, self.pdf_hash)
+            self.engine = self.converter.last_engine
+        return self._dataframes
+    
+    @property
+    def tables(self) -> List[ColumnarTable]:
+        """The non-empty tables with their column types, inferred on first access."""
+        if self._tables is None:
+            self._tables = [
+                ColumnarTable.from_dataframe(df, infer_types(df))
+                for df in self.dataframes
+                if not df.empty
+            ]
+        return self._tables
+    
+    def detect_tables(self) -> List[ExtractedTable]:
+        """
+        Return the parsed tables with their metadata.
+        
+        Returns:
+            List of the parsed tables
+        """
+        return [
+            ExtractedTable(df, i + 1, i, self.engine)
+            for i, df in enumerate(self.dataframes)
+            if not df.empty
+        ]
+    
+    def _prepare_output(self, output_dir: Optional[str]) -> Tuple[str, str]:
+        """Return the output directory and the base name for output files."""
+        pdf_name = os.path.splitext(self.filename)[0]
         
         # Use output_dir if provided, otherwise use current directory
         save_dir = output_dir if output_dir else os.getcwd()
         os.makedirs(save_dir, exist_ok=True)
+        return save_dir, pdf_name
+    
+    def to_csv(self, output_dir: str = None) -> List[str]:
+        """
+        Write each table to its own CSV file.
+        
+        Args:
+            output_dir: Directory to save output files (default: None, uses current directory)
+            
+        Returns:
+            List of paths to the generated CSV files
+        """
+        if not self.dataframes:
+            logger.warning("No tables found in the PDF.")
+            return []
         
-        for i, df in enumerate(dataframes):
+        output_paths = []
+        save_dir, pdf_name = self._prepare_output(output_dir)
+        
+        for i, df in enumerate(self.dataframes):
             if df.empty:
                 continue
                 
@@ -268,38 +593,55 @@ class PDFConverter:
             
         return output_paths
     
-    def convert_to_xlsx(self, pdf_path: str, output_dir: str = None) -> Optional[str]:
+    def to_xlsx(self, output_dir: str = None) -> Optional[str]:
         """
-        Convert PDF to a single XLSX file with multiple sheets.
+        Write all tables to a single XLSX file with one sheet per table.
+        
+        Rows are streamed into constant-memory sheets, so long statements
+        don't build the whole workbook in memory.
         
         Args:
-            pdf_path: Path to the PDF file
             output_dir: Directory to save output file (default: None, uses current directory)
             
         Returns:
             Path to the generated XLSX file or None if no tables were found
         """
-        dataframes = self.parse_pdf_to_dataframes(pdf_path)
-        
-        if not dataframes:
+        if not self.dataframes:
             logger.warning("No tables found in the PDF.")
             return None
         
-        pdf_filename = os.path.basename(pdf_path)
-        pdf_name = os.path.splitext(pdf_filename)[0]
-        
-        # Use output_dir if provided, otherwise use current directory
-        save_dir = output_dir if output_dir else os.getcwd()
-        os.makedirs(save_dir, exist_ok=True)
+        save_dir, pdf_name = self._prepare_output(output_dir)
         
         output_filename = f"{pdf_name}.xlsx"
         output_path = os.path.join(save_dir, output_filename)
         
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            for i, df in enumerate(dataframes):
-                if df.empty:
-                    continue
-                sheet_name = f"Table {i+1}"
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
+        # Typed columns are written as numbers and dates
+        sheet_names = [f"Table {i+1}" for i, df in enumerate(self.dataframes) if not df.empty]
+        write_xlsx(self.tables, output_path, sheet_names)
         
         return output_path
+    
+    def write(self, output_formats: List[str], output_dir: str = None) -> Dict[str, List[str]]:
+        """
+        Write the parsed tables in every requested format.
+        
+        Args:
+            output_formats: Output formats, any of SUPPORTED_FORMATS
+            output_dir: Directory to save output files (default: None, uses current directory)
+            
+        Returns:
+            Dictionary mapping each format to the paths of its output files
+        """
+        # Parse before the writing stage starts, it reports its own progress
+        self.dataframes
+        self.converter.progress.start_stage('writing')
+        outputs = {}
+        for output_format in output_formats:
+            if output_format == 'csv':
+                outputs['csv'] = self.to_csv(output_dir)
+            elif output_format == 'xlsx':
+                output_file = self.to_xlsx(output_dir)
+                outputs['xlsx'] = [output_file] if output_file else []
+            else:
+                raise ValueError(f"Unsupported output format: {output_format}")
+        return outputs